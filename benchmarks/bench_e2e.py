@@ -0,0 +1,164 @@
+"""End-to-end throughput benchmark of the date flow, fully offline.
+
+Drives `DateManager.get_manager_response` and `DateManager.run_date_simulation` against the
+fake model client, the fake Leonardo server and fake wallets, and reports p50/p99 latency,
+throughput under N concurrent users and memory per active user.
+
+Usage:
+    python benchmarks/bench_e2e.py --users 20 --turns 5 --dates 10 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+# Add the project root to the Python path
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+os.chdir(ROOT)
+
+from autogen_core.models import ChatCompletionClient
+from benchmarks.fakes import FakeChatCompletionClient, FakeLeonardoServer, LatencyDistribution, install_fake_wallets
+from src.agents.date_manager import DateManager
+from src.config import Config
+from src.models.client_registry import ModelClientRegistry
+from src.models.model import SimpleUser
+from src.tools.participant_pool import ParticipantPool
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_stats(name: str, latencies: List[float], wall_time: float) -> Dict[str, float]:
+    return {
+        "name": name,
+        "count": len(latencies),
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "max_s": round(max(latencies), 4) if latencies else float("nan"),
+        "throughput_per_s": round(len(latencies) / wall_time, 3) if wall_time else float("nan"),
+    }
+
+
+async def create_managers(num_users: int, model_client: ChatCompletionClient) -> List[DateManager]:
+    managers = []
+    for user_id in range(num_users):
+        manager = DateManager(user=SimpleUser(id=900000 + user_id, name=f"benchuser{user_id}"), model_client=model_client)
+        await manager.initialize()
+        await manager.create_user_avatar(
+            name=f"benchuser{user_id}",
+            interests=["hiking", "jazz"],
+            personality_traits=["curious", "playful"],
+            conversation_style=["witty"],
+            dislikes=["rudeness"],
+            areas_of_expertise_and_knowledge=["astronomy"],
+            passionate_topics=["space travel"],
+            user_appearance=["short brown hair"],
+        )
+        managers.append(manager)
+    return managers
+
+
+async def bench_chat(managers: List[DateManager], turns: int) -> Dict[str, float]:
+    latencies: List[float] = []
+
+    async def user_session(manager: DateManager):
+        for turn in range(turns):
+            started = time.perf_counter()
+            await manager.get_manager_response(f"{manager.user.name}: message {turn}, who should I date?")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_session(manager) for manager in managers))
+    return latency_stats("manager_chat", latencies, time.perf_counter() - started)
+
+
+async def bench_dates(managers: List[DateManager], dates: int, match_name: str) -> Dict[str, float]:
+    latencies: List[float] = []
+    pipeline_timings: Dict[str, List[float]] = {}
+
+    async def run_date(manager: DateManager):
+        started = time.perf_counter()
+        await manager.run_date_simulation(match_name)
+        latencies.append(time.perf_counter() - started)
+        for stage, duration in manager.last_pipeline_timings.items():
+            pipeline_timings.setdefault(stage, []).append(duration)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_date(managers[i % len(managers)]) for i in range(dates)))
+    stats = latency_stats("date_simulation", latencies, time.perf_counter() - started)
+    stats["post_date_stages_p50_s"] = {stage: round(percentile(values, 50), 4) for stage, values in pipeline_timings.items()}
+    return stats
+
+
+async def main(args: argparse.Namespace):
+    install_fake_wallets()
+    server = await FakeLeonardoServer(generation_time=args.image_time).start()
+    os.environ["LEONARDO_BASE_URL"] = server.base_url
+    os.environ.setdefault("LEONARDO_API_KEY", "fake-key")
+
+    model_client = FakeChatCompletionClient(
+        latency=LatencyDistribution(kind="lognormal", median=args.llm_latency, sigma=args.llm_sigma),
+        latency_per_prompt_token=args.latency_per_token,
+        error_rate=args.error_rate,
+        stall_rate=args.stall_rate,
+        seed=args.seed,
+    )
+    # all agents get their client from the registry, which adds retries, hedging and circuit breaking
+    ModelClientRegistry().register("gpt-4o-mini", model_client)
+    try:
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        managers = await create_managers(args.users, ModelClientRegistry().get_client("gpt-4o-mini"))
+        after, _ = tracemalloc.get_traced_memory()
+        memory_per_user = (after - before) / max(1, args.users)
+
+        results = {
+            "users": args.users,
+            "memory_per_user_kib": round(memory_per_user / 1024, 1),
+            "chat": await bench_chat(managers, args.turns),
+            "dates": await bench_dates(managers, args.dates, args.match),
+        }
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results["memory_after_run_per_user_kib"] = round((current - before) / max(1, args.users) / 1024, 1)
+        results["peak_memory_mib"] = round(peak / 1024 / 1024, 1)
+        results["llm_calls"] = len(model_client.calls)
+        results["participant_pool"] = dict(ParticipantPool().stats)
+        results["injected_errors"] = model_client.errors
+        results["model_calls"] = ModelClientRegistry().stats()
+        print(json.dumps(results, indent=2))
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-u", "--users", type=int, default=10, help="Number of concurrent users")
+    parser.add_argument("-t", "--turns", type=int, default=5, help="Chat turns per user")
+    parser.add_argument("-d", "--dates", type=int, default=5, help="Number of concurrent date simulations")
+    parser.add_argument("--match", type=str, default="Tesla")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Median latency of a model call in seconds")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="Sigma of the lognormal model latency")
+    parser.add_argument("--latency-per-token", type=float, default=0.0, help="Additional latency per prompt token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of model calls failing with a timeout")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Share of model calls stalling for 5 seconds")
+    parser.add_argument("--image-time", type=float, default=1.0, help="Seconds until a fake image generation completes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # keep the benchmark data out of the real storage
+    Config.STORAGE_TYPE = "local"
+    Config.STORAGE_BASE_PATH = tempfile.mkdtemp(prefix="aol-bench-")
+    asyncio.run(main(args))
@@ -0,0 +1,85 @@
+"""Benchmark of the speaker selection cost with the full history against windowed histories.
+
+Runs dates between two characters against the fake model client, whose latency grows with the
+prompt size, and reports the latency and prompt tokens of the `SpeakerSelector` calls per window.
+
+Usage:
+    python benchmarks/bench_selector.py --windows 0,4,6,10 --messages 40 --dates 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import sys
+import tempfile
+from typing import Dict, List
+
+# Add the project root to the Python path
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+os.chdir(ROOT)
+
+from benchmarks.bench_e2e import percentile
+from benchmarks.fakes import FakeChatCompletionClient, LatencyDistribution, install_fake_wallets
+from src.config import Config
+from src.models.telemetry import LLMCallRecord
+from src.tools.date_simulator import DateSimulator, load_participant_catalog
+from src.tools.date_termination import DateTerminationPolicy
+
+
+async def run_dates(window: int, args: argparse.Namespace) -> Dict[str, float]:
+    catalog = load_participant_catalog()
+    model_client = FakeChatCompletionClient(
+        latency=LatencyDistribution(kind="constant", median=args.llm_latency),
+        latency_per_prompt_token=args.latency_per_token,
+        seed=args.seed,
+    )
+    # only the message cap ends the dates, so all windows run the same number of turns
+    policy = DateTerminationPolicy(max_messages=args.messages, end_phrase=None, max_repeated_messages=None)
+    calls: List[LLMCallRecord] = []
+    for _ in range(args.dates):
+        simulator = DateSimulator(model_client=model_client, termination_policy=policy, selector_history_window=window)
+        try:
+            for name in args.pair.split(":"):
+                await simulator.add_participant_from_agent(catalog[name])
+            simulator.set_date_organizer(wallet_address="0x0")
+            await simulator.simulate_date()
+        finally:
+            await simulator.release_participants()
+        calls.extend(record for record in simulator.telemetry.records if record.agent == "SpeakerSelector")
+    latencies = [record.latency for record in calls]
+    prompt_tokens = [record.prompt_tokens for record in calls]
+    return {
+        "window": window or "full",
+        "selections": len(calls),
+        "latency_p50_s": round(percentile(latencies, 50), 4),
+        "latency_p99_s": round(percentile(latencies, 99), 4),
+        "latency_per_date_s": round(sum(latencies) / args.dates, 3),
+        "prompt_tokens_mean": round(sum(prompt_tokens) / max(1, len(prompt_tokens)), 1),
+        "prompt_tokens_max": max(prompt_tokens, default=0),
+        "prompt_tokens_per_date": round(sum(prompt_tokens) / args.dates),
+    }
+
+
+async def main(args: argparse.Namespace):
+    install_fake_wallets()
+    results = [await run_dates(int(window), args) for window in args.windows.split(",")]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-w", "--windows", type=str, default="0,4,6,10", help="Comma separated history windows, 0 for the full history")
+    parser.add_argument("-m", "--messages", type=int, default=40, help="Messages per date")
+    parser.add_argument("-d", "--dates", type=int, default=3, help="Dates per window")
+    parser.add_argument("--pair", type=str, default="Tesla:Eliza")
+    parser.add_argument("--llm-latency", type=float, default=0.01, help="Base latency of a model call in seconds")
+    parser.add_argument("--latency-per-token", type=float, default=0.00002, help="Additional latency per prompt token")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # keep the benchmark data out of the real storage
+    Config.STORAGE_TYPE = "local"
+    Config.STORAGE_BASE_PATH = tempfile.mkdtemp(prefix="aol-bench-")
+    asyncio.run(main(args))
@@ -0,0 +1,393 @@
+"""Offline stand-ins for OpenAI, Leonardo and the wallet providers.
+
+Used by the benchmarks to drive the date flow end to end without any network access.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import secrets
+import time
+import uuid
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+import httpx
+import openai
+from aiohttp import web
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+
+DEFAULT_RESPONSES = [
+    "That sounds wonderful, tell me more about it!",
+    "Ha! I did NOT expect that. What happened next?",
+    "I have always been fascinated by the way people find joy in small things.",
+    "Let's order something to drink, the view here is amazing.",
+    "You know, that reminds me of something I experienced a long time ago.",
+    "A street musician starts playing a soft melody as the sun sets over the city.",
+]
+
+SELECTOR_PATTERN = re.compile(r"select the next role from (.+?) to play", re.IGNORECASE)
+
+
+class LatencyDistribution:
+    """Samples simulated latencies in seconds.
+
+    Supported kinds are `constant`, `uniform` (between `low` and `high`) and `lognormal`
+    (with the given `median` and `sigma`, which produces a realistic long tail).
+    """
+
+    def __init__(self, kind: str = "lognormal", median: float = 0.05, sigma: float = 0.5, low: float = 0.0, high: float = 0.1):
+        if kind not in ("constant", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.median = median
+        self.sigma = sigma
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            return self.median
+        if self.kind == "uniform":
+            return rng.uniform(self.low, self.high)
+        return rng.lognormvariate(math.log(self.median), self.sigma) if self.median > 0 else 0.0
+
+
+def _message_text(message: LLMMessage) -> str:
+    content = getattr(message, "content", "")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(str(getattr(item, "content", item)) for item in content)
+    return str(content)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used instead of a tokenizer."""
+    return max(1, len(text) // 4)
+
+
+class FakeChatCompletionClient(ChatCompletionClient):
+    """A local `ChatCompletionClient` returning scripted or random responses after a simulated latency.
+
+    Args:
+        responses: Responses returned in order (cycling), or chosen at random when `randomize` is set.
+        responder: Optional callable that gets the messages and returns the response text, takes precedence.
+        latency: Distribution of the base latency of every call.
+        latency_per_prompt_token: Additional latency per prompt token, to model the cost of long prompts.
+        error_rate: Share of calls failing with a timeout, to model provider hiccups.
+        stall_rate: Share of calls taking `stall_latency` seconds longer, to model tail latency.
+        seed: Seed for the random number generator, for reproducible runs.
+
+    Speaker selection prompts of the `SelectorGroupChat` are detected and answered with one of the
+    candidate names, so group chats run as they would against a real model.
+    """
+
+    def __init__(self, responses: Optional[List[str]] = None, responder: Optional[Callable[[Sequence[LLMMessage]], str]] = None,
+                 latency: Optional[LatencyDistribution] = None, latency_per_prompt_token: float = 0.0,
+                 randomize: bool = True, seed: Optional[int] = None, model: str = "fake-gpt",
+                 error_rate: float = 0.0, stall_rate: float = 0.0, stall_latency: float = 5.0):
+        self.responses = responses or DEFAULT_RESPONSES
+        self.responder = responder
+        self.latency = latency or LatencyDistribution()
+        self.latency_per_prompt_token = latency_per_prompt_token
+        self.randomize = randomize
+        self.model = model
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_latency = stall_latency
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._next_response = 0
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self.calls: List[Dict[str, Any]] = []
+
+    def _respond(self, messages: Sequence[LLMMessage]) -> str:
+        if self.responder is not None:
+            return self.responder(messages)
+        last = _message_text(messages[-1]) if messages else ""
+        match = SELECTOR_PATTERN.search(last)
+        if match:
+            candidates = re.findall(r"[A-Za-z_][A-Za-z0-9_]*", match.group(1))
+            if candidates:
+                return self._rng.choice(candidates)
+        if self.randomize:
+            return self._rng.choice(self.responses)
+        response = self.responses[self._next_response % len(self.responses)]
+        self._next_response += 1
+        return response
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        started = time.perf_counter()
+        prompt_tokens = self.count_tokens(messages)
+        latency = self.latency.sample(self._rng) + prompt_tokens * self.latency_per_prompt_token
+        if self._rng.random() < self.stall_rate:
+            latency += self.stall_latency
+        await asyncio.sleep(latency)
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://fake-openai.local/v1/chat/completions"))
+        content = self._respond(messages)
+        usage = RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=estimate_tokens(content))
+        self._actual_usage = usage
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + usage.prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + usage.completion_tokens,
+        )
+        self.calls.append({"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens,
+                           "latency": time.perf_counter() - started})
+        return CreateResult(finish_reason="stop", content=content, usage=usage, cached=False)
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+        result = await self.create(messages, **kwargs)
+        for word in result.content.split(" "):
+            yield word + " "
+        yield result
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._actual_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return sum(estimate_tokens(_message_text(message)) for message in messages)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return 128000 - self.count_tokens(messages)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return ModelCapabilities(vision=False, function_calling=True, json_output=False)  # type: ignore
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return ModelInfo(vision=False, function_calling=True, json_output=False, family="unknown", structured_output=False)  # type: ignore
+
+
+class FakeLeonardoServer:
+    """A local HTTP server implementing the Leonardo generation endpoints used by `LeonardoImageTool`.
+
+    Generations report `PENDING` until `generation_time` seconds have passed, then `COMPLETE`.
+    """
+
+    def __init__(self, generation_time: float = 1.0, host: str = "127.0.0.1", port: int = 0):
+        self.generation_time = generation_time
+        self.host = host
+        self.port = port
+        self.generations: Dict[str, float] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/rest/v1"
+
+    async def _create_generation(self, request: web.Request) -> web.Response:
+        await request.json()
+        generation_id = str(uuid.uuid4())
+        self.generations[generation_id] = time.monotonic()
+        return web.json_response({"sdGenerationJob": {"generationId": generation_id}})
+
+    async def _get_generation(self, request: web.Request) -> web.Response:
+        generation_id = request.match_info["generation_id"]
+        if generation_id not in self.generations:
+            return web.json_response({"error": "not found"}, status=404)
+        done = time.monotonic() - self.generations[generation_id] >= self.generation_time
+        images = [{"url": f"http://{self.host}:{self.port}/images/{generation_id}.png"}] if done else []
+        return web.json_response({"generations_by_pk": {
+            "status": "COMPLETE" if done else "PENDING",
+            "generated_images": images,
+        }})
+
+    async def start(self) -> "FakeLeonardoServer":
+        app = web.Application()
+        app.router.add_post("/api/rest/v1/generations", self._create_generation)
+        app.router.add_get("/api/rest/v1/generations/{generation_id}", self._get_generation)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class FakeWalletExport:
+    def __init__(self, data: Dict[str, str]):
+        self._data = data
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(self._data)
+
+
+class FakeAddress:
+    def __init__(self, address_id: str):
+        self.address_id = address_id
+
+
+class FakeCdpWallet:
+    def __init__(self, network_id: str, wallet_data: Optional[Dict[str, str]] = None):
+        wallet_data = wallet_data or {"wallet_id": str(uuid.uuid4()), "seed": secrets.token_hex(32), "network_id": network_id}
+        self._data = wallet_data
+        self.default_address = FakeAddress("0x" + wallet_data["seed"][:40])
+
+    def export_data(self) -> FakeWalletExport:
+        return FakeWalletExport(self._data)
+
+
+class FakeCdpAgentkitWrapper:
+    """Replaces `CdpAgentkitWrapper`, creates wallets locally instead of through the CDP API."""
+
+    def __init__(self, network_id: str = "base-sepolia", cdp_wallet_data: Optional[str] = None, **kwargs: Any):
+        self.network_id = network_id
+        self.wallet = FakeCdpWallet(network_id, json.loads(cdp_wallet_data) if cdp_wallet_data else None)
+
+
+class FakeStarknetToolkit:
+    """Replaces `StarknetToolkit` with in-memory balances and simulated chain latency."""
+
+    def __init__(self, seed: int | str, deployed: bool = False, on_deployed: Optional[Callable[[], Awaitable[None]]] = None,
+                 latency: Optional[LatencyDistribution] = None, *args: Any, **kwargs: Any):
+        self._seed = seed if isinstance(seed, str) else hex(seed)
+        self.latency = latency or LatencyDistribution(kind="constant", median=0.01)
+        self.balances = {"strk": 100.0, "usdc": 100.0}
+        self._account_deployed = deployed
+        self._on_deployed = on_deployed
+        self._rng = random.Random(str(seed))
+
+    @property
+    def deployed(self) -> bool:
+        return self._account_deployed
+
+    @deployed.setter
+    def deployed(self, deployed: bool):
+        self._account_deployed = deployed
+
+    async def _chain_call(self):
+        await asyncio.sleep(self.latency.sample(self._rng))
+
+    def _tx_hash(self) -> str:
+        return "0x" + secrets.token_hex(32)
+
+    async def setup_account_if_needed(self, funder_seed: Optional[int] = None):
+        if not self._account_deployed:
+            await self._chain_call()
+            self._account_deployed = True
+            if self._on_deployed is not None:
+                await self._on_deployed()
+        return self
+
+    async def is_in_use(self) -> bool:
+        return self._account_deployed
+
+    async def use_account(self, seed: int | str):
+        self._seed = seed if isinstance(seed, str) else hex(seed)
+        self._account_deployed = True
+        if self._on_deployed is not None:
+            await self._on_deployed()
+
+    def get_address(self) -> str:
+        return "0x" + self._seed.removeprefix("0x").rjust(64, "0")[:64]
+
+    async def get_wallet_info(self) -> str:
+        return f"Wallet Address: {self.get_address()} on network starknet-fake"
+
+    async def get_usdc_balance(self) -> str:
+        await self._chain_call()
+        return f"Wallet Address: {self.get_address()}\nUSDC Balance: {self.balances['usdc']} USDC"
+
+    async def get_strk_balance(self) -> str:
+        await self._chain_call()
+        return f"Wallet Address: {self.get_address()}\nSTRK Balance: {self.balances['strk']} STRK"
+
+    async def _transfer(self, asset: str, recipient: str, amount: float) -> str:
+        await self._chain_call()
+        if self.balances[asset] < amount:
+            return f"You do not have enough {asset.upper()} to transfer."
+        self.balances[asset] -= amount
+        return f"Transferred {amount} {asset.upper()} to {recipient}\nTransaction Hash: {self._tx_hash()}"
+
+    async def transfer_usdc(self, recipient: str, amount: float) -> str:
+        return await self._transfer("usdc", recipient, amount)
+
+    async def transfer_strk(self, recipient: str, amount: float) -> str:
+        return await self._transfer("strk", recipient, amount)
+
+    async def mint_nft(self, recipient: str, token_id: int) -> str:
+        await self._chain_call()
+        return f"Minted NFT with token ID: {token_id}\nTransaction Hash: {self._tx_hash()}"
+
+    def get_tools(self, include_mint_nft: bool = False) -> list:
+        from src.tools.starknet_toolkit import GetWalletTool, GetSTRKBalanceTool, TransferSTRKTool, MintNFTTool
+        tools = [GetWalletTool(self), GetSTRKBalanceTool(self), TransferSTRKTool(self)]
+        if include_mint_nft:
+            tools.append(MintNFTTool(self))
+        return tools
+
+
+class FakeTransaction:
+    def __init__(self, hash: int):
+        self.hash = hash
+
+
+class FakeStarknetChain:
+    """Replaces the chain calls of the mint queue and the account pool with in-memory token owners and simulated latency."""
+
+    def __init__(self, latency: Optional[LatencyDistribution] = None):
+        self.latency = latency or LatencyDistribution(kind="constant", median=0.01)
+        self.owners: Dict[int, int] = {}
+        self._rng = random.Random("starknet-fake")
+
+    async def _chain_call(self):
+        await asyncio.sleep(self.latency.sample(self._rng))
+
+    async def execute_calls(self, seed: int, calls: list, wait: bool = True) -> FakeTransaction:
+        from starknet_py.hash.selector import get_selector_from_name
+
+        await self._chain_call()
+        for call in calls:
+            if call.selector == get_selector_from_name("safe_mint"):
+                recipient, low, high = call.calldata[:3]
+                self.owners[low + high * 2 ** 128] = recipient
+        return FakeTransaction(int(secrets.token_hex(32), 16))
+
+    async def wait_for_transaction(self, tx_hash: int, timeout: Optional[float] = None):
+        from src.tools.starknet_tx import TransactionConfirmation
+
+        started = time.perf_counter()
+        await self._chain_call()
+        return TransactionConfirmation(tx_hash=hex(tx_hash), status="ACCEPTED_ON_L2", latency=time.perf_counter() - started)
+
+    async def get_nft_owner(self, token_id: int, token_address: Optional[int] = None) -> Optional[int]:
+        await self._chain_call()
+        return self.owners.get(token_id)
+
+    async def fund_and_deploy_account(self, seed: int | str, funder_seed: int):
+        # funding and deploying, two transactions
+        await self._chain_call()
+        await self._chain_call()
+
+
+def install_fake_wallets() -> FakeStarknetChain:
+    """Route all wallets of `AgentWithWallet`, the Starknet mints of the mint queue and the account pool through the fake providers."""
+    from src.models import agent_with_wallet
+    from src.tools import mint_queue, starknet_accounts
+
+    os.environ["NETWORK_ID"] = "starknet-fake"
+    agent_with_wallet.CdpAgentkitWrapper = FakeCdpAgentkitWrapper
+    agent_with_wallet.StarknetToolkit = FakeStarknetToolkit
+    chain = FakeStarknetChain()
+    mint_queue.execute_calls = chain.execute_calls
+    mint_queue.wait_for_transaction = chain.wait_for_transaction
+    mint_queue.get_nft_owner = chain.get_nft_owner
+    starknet_accounts.fund_and_deploy_account = chain.fund_and_deploy_account
+    return chain
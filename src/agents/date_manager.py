@@ -1,20 +1,30 @@
 import asyncio
 import logging
-from typing import Callable, List, Optional, Dict
+from typing import Awaitable, Callable, List, Optional, Dict
 from autogen_agentchat.messages import TextMessage
 from autogen_core import CancellationToken
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-import os
+from autogen_core.models import ChatCompletionClient
 import pathlib
 import dotenv
 import json
 
+from src.config import Config
 from src.models.model import Agent, AgentRole, UserProfile, SimpleUser
 from src.models.agent_with_wallet import AgentWithWallet, WalletProvider
+from src.models.client_registry import ModelClientRegistry
+from src.models.context import ContextPolicy, create_model_context
+from src.models.memory import BM25Memory
+from src.models.telemetry import AgentUsage, TelemetryClient, UsageRecorder, aggregate_usage
 from src.tools.date_simulator import DateSimulator
-from autogen_core.memory import ListMemory, MemoryContent, MemoryMimeType
+from src.tools.date_events import DateEvent
+from src.tools.balance_cache import BalanceCache
+from src.tools.mint_queue import MintJob, MintProvider, MintQueue, MintStatus
+from src.tools.starknet_accounts import StarknetAccountPool
+from src.tools.starknet_toolkit import date_memory_link
+from autogen_core.memory import MemoryContent, MemoryMimeType
 from src.tools.leonardo_image import LeonardoImageTool, LeonardoRequest
 from src.agents.prompt_generator import PromptGenerator
+from src.agents.pipeline import StagePipeline
 from src.server.token_registry import TokenRegistry
 from src.models.user_agent import UserAgentWithWallet
 from src.storage.manager import StorageManager
@@ -22,15 +32,26 @@ from src.storage.manager import StorageManager
 dotenv.load_dotenv()
 
 
+def _legacy_profile(content: MemoryContent) -> Optional[UserProfile]:
+    """The profile of a memory item stored without a key, None for any other item."""
+    if (content.metadata or {}).get("key") is not None or content.mime_type != MemoryMimeType.JSON:
+        return None
+    try:
+        if isinstance(content.content, str):
+            return UserProfile.model_validate_json(content.content)
+        return UserProfile.model_validate(content.content)
+    except ValueError:
+        return None
+
 
 class DateManager:
-    def __init__(self, model_name: str = "gpt-4o-mini", user: Optional[SimpleUser] = None):
+    def __init__(self, model_name: str = "gpt-4o-mini", user: Optional[SimpleUser] = None, model_client: Optional[ChatCompletionClient] = None):
         self.model_name = model_name
         self.user = user
-        self.model_client = OpenAIChatCompletionClient(
-            model=model_name,
-            api_key=os.environ.get("OPENAI_API_KEY"),
-        )
+        self.model_client = model_client or ModelClientRegistry().get_client(model_name)
+        # model usage of the manager agent, dates record their own usage
+        self.telemetry = UsageRecorder(max_records=1000)
+        self.last_turn_usage: Optional[AgentUsage] = None
         
         # Create states directory if it doesn't exist
         self.states_dir = pathlib.Path("states")
@@ -47,14 +68,21 @@ class DateManager:
         self.user_agent: Optional[UserAgentWithWallet] = None  # Will be initialized in initialize()
         self.manager_agent: Optional[AgentWithWallet] = None  # Will be initialized in initialize()
             
-        # Create memory for storing user profile
-        self.memory = ListMemory()
-        self.prompt_generator = PromptGenerator(self.model_client)
+        # Memory for the user profile, date results and summaries of earlier conversation,
+        # only the relevant items are added to each model call
+        self.memory = BM25Memory(name=f"date_manager_{user.id if user else 'default'}", top_k=Config.MANAGER_MEMORY_TOP_K)
+        self.prompt_generator = PromptGenerator(TelemetryClient(self.model_client, "PromptGenerator", self.telemetry, model=model_name))
         self.token_registry = TokenRegistry()
         self.image_tool = LeonardoImageTool()
         
         self.simulator: Optional[DateSimulator] = None
         self.date_started_callback: Optional[Callable[[], None]] = None
+        # called with every event of a running date, e.g. to forward turns to the user as they happen
+        self.date_event_callback: Optional[Callable[[DateEvent], Awaitable[None]]] = None
+        # called with a message for the user once a queued NFT mint is confirmed or failed
+        self.mint_callback: Optional[Callable[[str], Awaitable[None]]] = None
+        self.mint_queue = MintQueue()
+        self.last_pipeline_timings: Dict[str, float] = {}
         self.storage_manager = StorageManager()
     
     async def initialize(self):
@@ -64,7 +92,7 @@ class DateManager:
         
         if self.user:
             logging.info(f"Loading user avatar for {self.user.name} ({self.user.id})")
-            self.user_agent = await UserAgentWithWallet.load_or_create(self.user)
+            self.user_agent = await UserAgentWithWallet.load_or_create(self.user, model_client=self.model_client)
             logging.info("Created user agent, initializing...")
             await self.user_agent.initialize()
             logging.info("User agent initialized")
@@ -73,6 +101,7 @@ class DateManager:
             self.manager_agent = await AgentWithWallet.from_json(
                 path=pathlib.Path("agents/date_manager.json"),
                 system_message=self.manager_template,
+                model_client=TelemetryClient(self.model_client, "DateManager", self.telemetry, model=self.model_name),
                 tools=[self.image_tool, 
                        self.create_user_avatar, 
                        self.list_available_participants, 
@@ -81,8 +110,21 @@ class DateManager:
                        self.get_user_avatar_balance,
                        self.mint_date_nft],
                 reflect_on_tool_use=True,
-                memory=[self.memory]
+                memory=[self.memory],
+                model_context=create_model_context(
+                    ContextPolicy.for_manager(),
+                    TelemetryClient(self.model_client, "ContextSummarizer", self.telemetry, model=self.model_name),
+                    self.memory,
+                ),
+            )
+            await self.mint_queue.start(
+                starknet_seed=self.manager_agent.wallet_data.seed if self.manager_agent.wallet_provider == WalletProvider.STARKNET else None,
+                cdp_minter=self._mint_cdp if self.manager_agent.wallet_provider == WalletProvider.CDP else None,
             )
+            self.mint_queue.subscribe(self.user.id, self._on_mint_finished)
+            if self.manager_agent.wallet_provider == WalletProvider.STARKNET:
+                # the manager funds the accounts of new users
+                await StarknetAccountPool().start(self.manager_agent.wallet_data.seed)
             logging.info("Manager agent created, initializing memory...")
             await self.init_memory()
             logging.info("Date manager initialization complete")
@@ -97,18 +139,10 @@ class DateManager:
         # Get state from manager agent
         manager_state = await self.manager_agent.save_state()
         
-        # Get memory contents - ListMemory has a contents property, not get_contents()
-        memory_contents = []
-        for content in self.memory.content:
-            memory_contents.append({
-                "content": content.content,
-                "mime_type": content.mime_type.value
-            })
-        
         # Combine states
         state = {
             "manager_state": manager_state,
-            "memory_contents": memory_contents
+            "memory_contents": self.memory.dump_contents()
         }
         
         # Save to file
@@ -132,29 +166,14 @@ class DateManager:
                 
             # Load memory contents    
             if "memory_contents" in state:
-                for content in state["memory_contents"]:
-                    try:
-                        mime_type = content.get("mime_type")
-                        # Convert string mime type to enum if needed
-                        if isinstance(mime_type, str):
-                            mime_type = MemoryMimeType(mime_type)
-                        await self.memory.add(MemoryContent(
-                            content=content["content"],
-                            mime_type=mime_type
-                        ))
-                    except Exception as e:
-                        print(f"Error loading memory content: {e}")
+                try:
+                    await self.memory.load_contents(state["memory_contents"])
+                except Exception as e:
+                    print(f"Error loading memory content: {e}")
             return True
                 
         except Exception as e:
-            print(f"Error loading state: {e}")
-            # Save the problematic state file for debugging
-            error_path = state_path.with_suffix('.error')
-            try:
-                state_path.rename(error_path)
-                print(f"Moved problematic state to: {error_path}")
-            except Exception as rename_error:
-                print(f"Could not save problematic state: {rename_error}")
+            logging.error(f"Error loading state of user {self.user.id}: {e}", exc_info=True)
             return False
     
     async def init_memory(self):
@@ -164,24 +183,33 @@ class DateManager:
         if await self._load_state():
             print("Loaded state")
             logging.info("Loaded state")
+            await self._migrate_profile()
             return
             
         if self.user_agent and self.user_agent.agent_data.user_profile:
-            # Create the profile JSON
-            profile_json = json.dumps(self.user_agent.agent_data.user_profile.model_dump(), indent=2)
-            
-            # Query for the exact profile content
-            query_result = await self.memory.query(profile_json)
+            # the profile replaces a stored profile and is added to every model call
+            await self._remember_profile(self.user_agent.agent_data.user_profile)
+            await self.save_state()
             
-            # Only add if profile doesn't exist (check query_result.results)
-            if not query_result.results:
-                await self.memory.add(
-                    MemoryContent(
-                        content=profile_json,
-                        mime_type=MemoryMimeType.JSON
-                    )
-                )
-                await self._save_state()
+    async def _migrate_profile(self):
+        """Pin the profile in a state stored before profiles were kept under a key, they were plain JSON items then."""
+        if any((content.metadata or {}).get("key") == "user_profile" for content in self.memory.content):
+            return
+        legacy = [profile for profile in map(_legacy_profile, self.memory.content) if profile is not None]
+        profile = self.user_agent.agent_data.user_profile if self.user_agent else None
+        if profile is None and not legacy:
+            return
+        self.memory.remove_where(lambda content: _legacy_profile(content) is not None)
+        await self._remember_profile(profile or legacy[-1])
+        await self.save_state()
+        logging.info(f"Migrated the stored profile of user {self.user.id}")
+
+    async def _remember_profile(self, profile: UserProfile):
+        await self.memory.add(MemoryContent(
+            content=json.dumps(profile.model_dump(), indent=2),
+            mime_type=MemoryMimeType.JSON,
+            metadata={"key": "user_profile", "pinned": True},
+        ))
     
     def _load_available_participants(self) -> Dict[str, Agent]:
         """Load all available participant agents from the agents folder."""
@@ -214,9 +242,7 @@ class DateManager:
         if self.user_agent is None:
             return "User avatar not found"
         if self.user_agent.wallet_provider == WalletProvider.CDP:
-            for tool in self.user_agent.cdp_toolkit.get_tools():
-                if tool.name == "get_balance":
-                    return await tool.arun({"asset_id": asset_id})
+            return await self.user_agent.get_cdp_balance(asset_id)
         elif self.user_agent.wallet_provider == WalletProvider.STARKNET:
             return await self.user_agent.starknet_toolkit.get_strk_balance()
         return "No balance tool found"
@@ -243,9 +269,7 @@ class DateManager:
         match_agent = self.available_participants[match_name]
         # match_prompt = match_agent.get_full_system_prompt(num_examples=4)
         
-        self.simulator = DateSimulator(max_messages=20)
-        self.simulator.model_name = self.model_name
-        self.simulator.initialize_model_client()
+        self.simulator = DateSimulator(model_name=self.model_name, model_client=self.model_client)
         
         # Create date organizer from template
         self.simulator.set_date_organizer(self.organizer_template, self.manager_agent.get_address())
@@ -254,25 +278,52 @@ class DateManager:
         #await self.simulator.add_participant(self.user_profile.name, user_prompt)
         #await self.simulator.add_participant(match_name, match_prompt)
         
-        self.simulator.participants[self.user_agent.name] = self.user_agent
+        self.simulator.add_existing_participant(self.user_agent)
         await self.simulator.add_participant_from_agent(match_agent)
         
         # Set the summarizer from template
         self.simulator.set_summarizer(self.summarizer_template)
         
         # Run the simulation
-        result = await self.simulator.simulate_date(scene_instruction)
-        conversation = self.simulator._format_conversation_history_with_tool_calls(result.messages)
-        summary = await self.simulator.summarize_date(result)
-        
-        # After the date, mint an NFT
-        participants = [self.user_agent.name, match_name]
         try:
-            nft_result = await self._mint_date_nft_from_conversation(conversation, participants)
-        except Exception as e:
-            nft_result = f"Error minting NFT: {str(e)}"
+            result = await self.simulator.simulate_date(scene_instruction, on_event=self.date_event_callback)
+        finally:
+            await self.simulator.release_participants()
+        simulator = self.simulator
+        conversation = simulator._format_conversation_history_with_tool_calls(result.messages)
+        participants = [self.user_agent.name, match_name]
+        
+        async def summarize() -> Optional[str]:
+            # a failed summary must not cost the transcript, it is saved without one
+            try:
+                return await simulator.summarize_date(result)
+            except Exception as e:
+                logging.error(f"Summarizing the date of {self.user_agent.name} with {match_name} failed: {e}")
+                return None
+
+        # Post-date work: the summary and the image prompt run concurrently, the transcript is saved
+        # once the summary is done, the image and the NFT mint follow as soon as their inputs are ready
+        pipeline = StagePipeline(name="post_date")
+        pipeline.add_stage("summary", summarize)
+        pipeline.add_stage("image_prompt", lambda: self._generate_image_prompt(conversation))
+        pipeline.add_stage("save_conversation", lambda summary: simulator.save_conversation(result, summary), depends_on=["summary"])
+        pipeline.add_stage("image", lambda image_prompt: self._generate_date_image(image_prompt), depends_on=["image_prompt"])
+        pipeline.add_stage("mint", lambda image_prompt, image: self._mint_date_image(image_prompt, image, participants), depends_on=["image_prompt", "image"])
+        results = await pipeline.run()
+        self.last_pipeline_timings = dict(pipeline.timings)
+        if results.get("summary"):
+            await self.memory.add(MemoryContent(
+                content=f"Date of {self.user_agent.name} with {match_name}: {results['summary']}",
+                mime_type=MemoryMimeType.TEXT,
+            ))
         
-        await self.simulator.save_conversation(result, summary)
+        if "mint" in results:
+            nft_result = results["mint"]
+        elif "image" in pipeline.errors or "image_prompt" in pipeline.errors:
+            error = pipeline.errors.get("image_prompt") or pipeline.errors["image"]
+            nft_result = f"Error generating image: {str(error)}"
+        else:
+            nft_result = f"Error minting NFT: {str(pipeline.errors.get('mint'))}"
         return f"{conversation}\n\n{nft_result}"
         
     async def create_user_avatar(self, name: str, interests: List[str], personality_traits: List[str], conversation_style: List[str], dislikes: List[str], areas_of_expertise_and_knowledge: List[str], passionate_topics: List[str], user_appearance: List[str]):
@@ -296,25 +347,49 @@ class DateManager:
             user_agent.user_profile.passionate_topics = passionate_topics
             user_agent.user_profile.appearance = user_appearance
         await self.storage_manager.save_user_agent(self.user.id, user_agent.model_dump(mode="json"))
+        await self._remember_profile(user_agent.user_profile)
         
         if self.user_agent.wallet_provider == WalletProvider.STARKNET:
             funder_seed = self.manager_agent.wallet_data.seed
             if isinstance(funder_seed, str):
                 funder_seed = int(funder_seed, 16)
+            await self._bind_provisioned_account()
             await self.user_agent.starknet_toolkit.setup_account_if_needed(funder_seed)
             return f"Updated profile for {user_agent.user_profile.name} and deployed account {self.user_agent.get_address()}"
 
         return f"Updated profile for {user_agent.user_profile.name}"
         
+    async def _bind_provisioned_account(self):
+        """Give the user a ready account from the pool instead of funding and deploying theirs now"""
+        toolkit = self.user_agent.starknet_toolkit
+        if toolkit.deployed:
+            return
+        pool = StarknetAccountPool()
+        seed = await pool.take()
+        if seed is None:
+            return
+        try:
+            # funds may already have been sent to the current account
+            if await toolkit.is_in_use():
+                await pool.give_back(seed)
+                return
+            await self.user_agent.bind_starknet_account(seed)
+        except Exception as e:
+            logging.error(f"Failed to bind a provisioned Starknet account: {e}")
+            await pool.give_back(seed)
+
     async def get_manager_response(self, user_input: str) -> str:
         """Get a response from the manager agent."""
         logging.info(f"Getting manager response for input: {user_input[:100]}...")
+        num_recorded = self.telemetry.num_recorded
         try:
             response = await self.manager_agent.on_messages(
                 [TextMessage(content=user_input, source="user")],
                 cancellation_token=CancellationToken(),
             )
-            logging.info("Got response from manager agent")
+            self.last_turn_usage = aggregate_usage(self.telemetry.calls_since(num_recorded))
+            logging.info(f"Got response from manager agent, {self.last_turn_usage.calls} model calls, "
+                         f"{self.last_turn_usage.prompt_tokens + self.last_turn_usage.completion_tokens} tokens in {self.last_turn_usage.total_latency:.2f}s")
             return response.chat_message.content
         except Exception as e:
             logging.error(f"Error getting manager response: {e}", exc_info=True)
@@ -347,22 +422,29 @@ class DateManager:
 
     async def mint_date_nft(self, prompt: str, participants: list[str]) -> str:
         """Generate an image and mint an NFT for a date. Give a detailed prompt describing the image, setting and participants."""
-        
+        prompt = self._fix_prompt_names(prompt)
+        image_url = await self._generate_date_image(prompt)
+        return await self._mint_date_image(prompt, image_url, participants)
+
+    @staticmethod
+    def _fix_prompt_names(prompt: str) -> str:
         prompt = prompt.replace("Bruce", "Bruce Lee")
         prompt = prompt.replace("Arnold", "Arnold Schwarzenegger")
         prompt = prompt.replace("Trump", "Donald Trump")
         prompt = prompt.replace("Tesla", "Nikola Tesla")
-        
-        # Generate the image using Leonardo
+        return prompt
+
+    async def _generate_date_image(self, prompt: str) -> str:
+        """Generate the date image using Leonardo and return its URL."""
         image_request = LeonardoRequest(prompt=prompt)
         image_response = await self.image_tool.run(image_request, CancellationToken())
-        logging.warning(f"Image generated with prompt: {prompt}\nImage URL: {image_response.urls[0]}")
         if not image_response.urls:
-            return "Failed to generate image"
-            
-        image_url = image_response.urls[0]
-        # return f"Image taken during the date: {prompt}\nImage: {image_url}"
-        
+            raise RuntimeError("Failed to generate image")
+        logging.warning(f"Image generated with prompt: {prompt}\nImage URL: {image_response.urls[0]}")
+        return image_response.urls[0]
+
+    async def _mint_date_image(self, prompt: str, image_url: str, participants: list[str]) -> str:
+        """Register the date image as a token and queue minting it to the user's avatar."""
         # Register the token
         metadata = await self.token_registry.register_token(
             image_url=image_url,
@@ -370,33 +452,61 @@ class DateManager:
             participants=participants
         )
         logging.info(f"Token registered: {metadata}")
-        # Mint the NFT using CDP toolkit
-        if self.user_agent.wallet_provider == WalletProvider.CDP:
-            for tool in self.manager_agent.cdp_toolkit.get_tools():
-                if tool.name == "mint_nft":
-                    result = await tool.arun({
-                        "contract_address": "0xb598fFa84C2608cC93b203772A6A2683a84aC959",
-                        "destination": await self.get_user_avatar_wallet()
-                    })
-                    logging.info(f"NFT minted: {result}")
-                    result_msg = f"Image taken during the date: {prompt}\nImage: {image_url}\nNFT minted successfully {result}"
-                    if result.startswith("Minted NFT from contract"):
-                        result_msg += f"\nOpensea: https://testnets.opensea.io/assets/base_sepolia/0xb598ffa84c2608cc93b203772a6a2683a84ac959/{metadata.token_id}"
-                    return result_msg
-        elif self.user_agent.wallet_provider == WalletProvider.STARKNET:
-            result = await self.manager_agent.starknet_toolkit.mint_nft(self.user_agent.get_address(), metadata.token_id)
-            return f"Image taken during the date: {prompt}\nImage: {image_url}\nNFT minted successfully\n {result}"
-        
-        return f"Failed to mint NFT, but image was generated: {image_url}"
+        if self.user_agent.wallet_provider == WalletProvider.CDP and self.manager_agent.wallet_provider == WalletProvider.CDP:
+            provider = MintProvider.CDP
+        elif self.user_agent.wallet_provider == WalletProvider.STARKNET and self.manager_agent.wallet_provider == WalletProvider.STARKNET:
+            provider = MintProvider.STARKNET
+        else:
+            return f"Failed to mint NFT, but image was generated: {image_url}"
+        # the chain is slow, the mint is confirmed to the user through the mint callback
+        await self.mint_queue.enqueue(MintJob(
+            provider=provider,
+            token_id=metadata.token_id,
+            recipient=await self.get_user_avatar_wallet(),
+            user_id=self.user.id if self.user else None,
+            prompt=prompt,
+            image_url=image_url,
+        ))
+        return f"Image taken during the date: {prompt}\nImage: {image_url}\nNFT #{metadata.token_id} is minting, you will be notified once it is confirmed"
+
+    async def _mint_cdp(self, job: MintJob) -> str:
+        """Mint a queued date memory with the CDP wallet of the manager."""
+        for tool in self.manager_agent.cdp_toolkit.get_tools():
+            if tool.name == "mint_nft":
+                result = await tool.arun({
+                    "contract_address": "0xb598fFa84C2608cC93b203772A6A2683a84aC959",
+                    "destination": job.recipient
+                })
+                logging.info(f"NFT minted: {result}")
+                # the manager paid gas
+                BalanceCache().invalidate(self.manager_agent.get_address())
+                if not result.startswith("Minted NFT from contract"):
+                    raise RuntimeError(result)
+                return result
+        raise RuntimeError("The manager wallet has no mint_nft tool")
 
-    async def _mint_date_nft_from_conversation(self, conversation: str, participants: list[str]) -> str:
-        """Generate an image and mint an NFT for a date."""
-        # Generate a prompt for the image
-        path = UserAgentWithWallet.get_user_agent_path(self.user.id)
-        user_agent = Agent.load(path)
+    async def _on_mint_finished(self, job: MintJob):
+        """Tell the user that a queued mint is confirmed or failed."""
+        if job.status == MintStatus.CONFIRMED:
+            if job.provider == MintProvider.CDP:
+                link = f"https://testnets.opensea.io/assets/base_sepolia/0xb598ffa84c2608cc93b203772a6a2683a84ac959/{job.token_id}"
+            else:
+                link = date_memory_link(job.token_id)
+            message = f"Your date memory NFT #{job.token_id} was minted successfully\n{job.result}\nView NFT on {link}"
+        else:
+            message = f"Minting your date memory NFT #{job.token_id} failed: {job.error}\nImage: {job.image_url}"
+        await self.memory.add(MemoryContent(content=message, mime_type=MemoryMimeType.TEXT))
+        if self.mint_callback is not None:
+            await self.mint_callback(message)
+
+    async def _generate_image_prompt(self, conversation: str) -> str:
+        """Generate a prompt for the date image from the conversation."""
+        user_agent_data = await self.storage_manager.load_user_agent(self.user.id)
+        if user_agent_data is None:
+            raise ValueError("User avatar not found")
+        user_agent = Agent.model_validate(user_agent_data)
         prompt = await self.prompt_generator.generate_prompt(conversation, user_agent.user_profile)
-        
-        return await self.mint_date_nft(prompt, participants)
+        return self._fix_prompt_names(prompt)
 
 async def main():
     manager = DateManager()
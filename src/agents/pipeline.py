@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+class PipelineStage:
+    def __init__(self, name: str, func: Callable[..., Awaitable[Any]], depends_on: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+
+class StagePipeline:
+    """A small dependency-aware async pipeline.
+
+    Every stage is started as soon as all of its dependencies have finished and
+    receives their results as keyword arguments. Independent stages run concurrently.
+    If a stage fails, the stages depending on it are skipped and the error is stored
+    in `errors`; the remaining stages still run.
+    """
+
+    def __init__(self, name: str = "pipeline"):
+        self.name = name
+        self.stages: Dict[str, PipelineStage] = {}
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, BaseException] = {}
+
+    def add_stage(self, name: str, func: Callable[..., Awaitable[Any]], depends_on: Sequence[str] = ()) -> "StagePipeline":
+        """Add a stage, `func` is called with the results of `depends_on` as keyword arguments."""
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} already exists")
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dependency!r}")
+        self.stages[name] = PipelineStage(name, func, depends_on)
+        return self
+
+    async def run(self) -> Dict[str, Any]:
+        """Run all stages and return the results of the successful ones by stage name."""
+        self.timings = {}
+        self.errors = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        started = time.perf_counter()
+
+        async def run_stage(stage: PipelineStage) -> Any:
+            kwargs = {}
+            for dependency in stage.depends_on:
+                try:
+                    kwargs[dependency] = await tasks[dependency]
+                except Exception as e:
+                    raise RuntimeError(f"Skipped because stage {dependency!r} failed") from e
+            stage_start = time.perf_counter()
+            try:
+                return await stage.func(**kwargs)
+            finally:
+                self.timings[stage.name] = time.perf_counter() - stage_start
+
+        # stages can only depend on earlier stages, so insertion order is a valid topological order
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage), name=f"{self.name}:{stage.name}")
+
+        results = {}
+        for name, task in tasks.items():
+            try:
+                results[name] = await task
+            except Exception as e:
+                self.errors[name] = e
+                logging.error(f"{self.name}: stage {name!r} failed: {e}")
+        self.timings["total"] = time.perf_counter() - started
+        logging.info(f"{self.name} timings: {self.format_timings()}")
+        return results
+
+    def format_timings(self, stages: Optional[List[str]] = None) -> str:
+        stages = stages or list(self.timings.keys())
+        return ", ".join(f"{name}: {self.timings[name]:.2f}s" for name in stages if name in self.timings)
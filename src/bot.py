@@ -37,6 +37,12 @@ logger.addHandler(logging.StreamHandler())
 
 #import after initializing the logger
 from src.agents.date_manager import DateManager
+from src.models.client_registry import ModelClientRegistry
+from src.tools.starknet_rpc import close_rpc_clients
+from src.tools.mint_queue import MintQueue
+from src.tools.starknet_tx import TransactionTracker
+from src.tools.starknet_accounts import StarknetAccountPool
+from src.tools.tool_executor import ToolExecutor
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -123,6 +129,7 @@ async def on_message(message: discord.Message):
             date_manager.date_started_callback = lambda: asyncio.create_task(
                 message.channel.send("Great, I am organizing the date for you. I'll let you know how it went in a bit.")
             )
+            date_manager.mint_callback = lambda text: message.channel.send(text, suppress_embeds=True)
             
             logger.info("Getting manager response...")
             # Get response from date manager
@@ -168,6 +175,14 @@ async def cleanup():
     # Save all states
     await save_all_states()
     
+    # Close the shared model clients and their connection pool
+    await ModelClientRegistry().close()
+    await MintQueue().close()
+    await TransactionTracker().close()
+    await ToolExecutor().close()
+    await StarknetAccountPool().close()
+    await close_rpc_clients()
+    
     # Close the Discord connection
     if not client.is_closed():
         await client.close()
@@ -19,11 +19,98 @@ class Config:
     # Storage paths
     WALLETS_PATH: str = 'wallets'  # Directory for wallet JSON files
     TOKEN_REGISTRY_PATH: str = 'registry/tokens.json'
+    TOKEN_METADATA_PATH: str = 'registry/token_metadata.json'
+    MINT_QUEUE_PATH: str = 'registry/mint_queue.json'
+    STARKNET_ACCOUNT_POOL_PATH: str = 'registry/starknet_accounts.json'
+    DATE_USAGE_PATH: str = 'registry/date_usage.json'
     AGENT_STATES_PATH: str = 'states'
     USER_AGENTS_PATH: str = 'agents/users'
     CONVERSATIONS_PATH: str = 'conversations'
     PROMPTS_PATH: str = 'prompts'
     
+    # Model context settings, strategy is one of 'unbounded', 'window', 'token_budget' or 'summarize'
+    MANAGER_CONTEXT_STRATEGY: str = os.getenv('MANAGER_CONTEXT_STRATEGY', 'summarize')
+    MANAGER_CONTEXT_WINDOW: int = int(os.getenv('MANAGER_CONTEXT_WINDOW', '30'))
+    MANAGER_CONTEXT_TOKEN_BUDGET: Optional[int] = int(os.getenv('MANAGER_CONTEXT_TOKEN_BUDGET', '12000')) or None
+    # Number of memory items of the date manager added to a model call, besides the user profile
+    MANAGER_MEMORY_TOP_K: int = int(os.getenv('MANAGER_MEMORY_TOP_K', '5'))
+    PARTICIPANT_CONTEXT_STRATEGY: str = os.getenv('PARTICIPANT_CONTEXT_STRATEGY', 'window')
+    PARTICIPANT_CONTEXT_WINDOW: int = int(os.getenv('PARTICIPANT_CONTEXT_WINDOW', '40'))
+    PARTICIPANT_CONTEXT_TOKEN_BUDGET: Optional[int] = int(os.getenv('PARTICIPANT_CONTEXT_TOKEN_BUDGET', '0')) or None
+    
+    # Date simulation settings, a date ends as soon as any of the enabled conditions is met
+    DATE_MAX_MESSAGES: int = int(os.getenv('DATE_MAX_MESSAGES', '20'))
+    DATE_END_PHRASE: Optional[str] = os.getenv('DATE_END_PHRASE', 'END OF DATE') or None
+    DATE_MAX_TOTAL_TOKENS: Optional[int] = int(os.getenv('DATE_MAX_TOTAL_TOKENS', '0')) or None
+    DATE_TIMEOUT_SECONDS: Optional[float] = float(os.getenv('DATE_TIMEOUT_SECONDS', '0')) or None
+    DATE_MAX_REPEATED_MESSAGES: Optional[int] = int(os.getenv('DATE_MAX_REPEATED_MESSAGES', '3')) or None
+    
+    # The speaker selector sees the first SELECTOR_HISTORY_HEAD messages of a date (the task and the scene)
+    # and the last SELECTOR_HISTORY_WINDOW messages, 0 shows it the full history
+    SELECTOR_HISTORY_WINDOW: int = int(os.getenv('SELECTOR_HISTORY_WINDOW', '6'))
+    SELECTOR_HISTORY_HEAD: int = int(os.getenv('SELECTOR_HISTORY_HEAD', '2'))
+    
+    # Seconds a fetched wallet balance is reused, transfers and mints through our tools invalidate it, 0 disables caching
+    BALANCE_CACHE_TTL: float = float(os.getenv('BALANCE_CACHE_TTL', '15'))
+    BALANCE_CACHE_MAX_ENTRIES: int = int(os.getenv('BALANCE_CACHE_MAX_ENTRIES', '10000'))
+    
+    # Synchronous wallet tools run on their own thread pool, so slow wallet calls do not hold up file I/O.
+    # Calls beyond TOOL_EXECUTOR_MAX_QUEUE waiting calls are rejected. Read-only tools time out after
+    # TOOL_TIMEOUT seconds of running, TOOL_TIMEOUTS overrides it per tool as comma separated name=seconds
+    # pairs, 0 disables the timeout. Tools that move funds never time out
+    TOOL_EXECUTOR_WORKERS: int = int(os.getenv('TOOL_EXECUTOR_WORKERS', '8'))
+    TOOL_EXECUTOR_MAX_QUEUE: int = int(os.getenv('TOOL_EXECUTOR_MAX_QUEUE', '64'))
+    TOOL_TIMEOUT: float = float(os.getenv('TOOL_TIMEOUT', '60'))
+    TOOL_TIMEOUTS: dict = {
+        name.strip(): float(seconds)
+        for name, seconds in (pair.split('=', 1) for pair in os.getenv('TOOL_TIMEOUTS', '').split(',') if '=' in pair)
+    }
+    
+    # Maximum number of hydrated wallets of agents kept in memory
+    WALLET_SESSION_CACHE_SIZE: int = int(os.getenv('WALLET_SESSION_CACHE_SIZE', '256'))
+    
+    # Maximum number of idle agents per character kept in the participant pool
+    PARTICIPANT_POOL_MAX_IDLE: int = int(os.getenv('PARTICIPANT_POOL_MAX_IDLE', '4'))
+    
+    # NFT mints run in the background, Starknet mints within MINT_BATCH_WINDOW seconds of each other
+    # are sent as one multicall transaction, failed mints are retried with backoff
+    MINT_BATCH_WINDOW: float = float(os.getenv('MINT_BATCH_WINDOW', '2'))
+    MINT_BATCH_MAX: int = int(os.getenv('MINT_BATCH_MAX', '10'))
+    MINT_MAX_ATTEMPTS: int = int(os.getenv('MINT_MAX_ATTEMPTS', '5'))
+    MINT_RETRY_BASE_DELAY: float = float(os.getenv('MINT_RETRY_BASE_DELAY', '5'))
+    MINT_RETRY_MAX_DELAY: float = float(os.getenv('MINT_RETRY_MAX_DELAY', '300'))
+    # number of finished mints kept in the queue for status lookups
+    MINT_QUEUE_MAX_FINISHED: int = int(os.getenv('MINT_QUEUE_MAX_FINISHED', '500'))
+    
+    # Funded and deployed Starknet accounts kept ready for new users, 0 funds and deploys them at onboarding
+    STARKNET_ACCOUNT_POOL_SIZE: int = int(os.getenv('STARKNET_ACCOUNT_POOL_SIZE', '3'))
+    STARKNET_ACCOUNT_POOL_RETRY_DELAY: float = float(os.getenv('STARKNET_ACCOUNT_POOL_RETRY_DELAY', '60'))
+    
+    # Model client settings
+    LLM_MAX_CONNECTIONS: int = int(os.getenv('LLM_MAX_CONNECTIONS', '64'))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '60'))
+    LLM_REQUEST_TIMEOUT: float = float(os.getenv('LLM_REQUEST_TIMEOUT', '120'))
+    LLM_DEFAULT_CONCURRENCY: int = int(os.getenv('LLM_DEFAULT_CONCURRENCY', '32'))
+    # per model concurrency limits, e.g. "gpt-4o-mini=64,gpt-4o=16"
+    LLM_CONCURRENCY_LIMITS: str = os.getenv('LLM_CONCURRENCY_LIMITS', '')
+    
+    # Retries with jittered backoff, hedged requests (0 disables hedging) and circuit breaking of model calls
+    LLM_MAX_RETRIES: int = int(os.getenv('LLM_MAX_RETRIES', '3'))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+    LLM_HEDGE_AFTER: Optional[float] = float(os.getenv('LLM_HEDGE_AFTER', '0')) or None
+    LLM_CIRCUIT_FAILURES: int = int(os.getenv('LLM_CIRCUIT_FAILURES', '5'))
+    LLM_CIRCUIT_RESET_TIMEOUT: float = float(os.getenv('LLM_CIRCUIT_RESET_TIMEOUT', '30'))
+    
+    @classmethod
+    def get_llm_concurrency_limit(cls, model: str) -> int:
+        """Get the maximum number of in-flight requests for a model"""
+        for limit in cls.LLM_CONCURRENCY_LIMITS.split(','):
+            name, _, value = limit.partition('=')
+            if name.strip() == model and value.strip():
+                return int(value)
+        return cls.LLM_DEFAULT_CONCURRENCY
+    
     @classmethod
     def get_wallet_path(cls, agent_id: str) -> str:
         """Get the path for a wallet JSON file"""
@@ -41,6 +128,10 @@ class Config:
     def get_conversation_path(cls, conversation_id: int, participants: list[str]) -> str:
         return f"{cls.CONVERSATIONS_PATH}/{conversation_id}_{'_'.join(participants)}.md"
     
+    @classmethod
+    def get_conversation_usage_path(cls, conversation_id: int, participants: list[str]) -> str:
+        return f"{cls.CONVERSATIONS_PATH}/{conversation_id}_{'_'.join(participants)}.usage.json"
+    
     @classmethod
     def get_prompt_path(cls, prompt_name: str) -> str:
         return f"{cls.PROMPTS_PATH}/{prompt_name}.txt" 
\ No newline at end of file
@@ -5,15 +5,20 @@ import uuid
 import json
 import hashlib
 import dotenv
+from typing import Optional
 from autogen_agentchat.agents import AssistantAgent
+from autogen_core import CancellationToken
 from autogen_core.models import ChatCompletionClient
-from autogen_ext.models.openai import OpenAIChatCompletionClient
 from cdp_langchain.agent_toolkits import CdpToolkit
 from cdp_langchain.utils.cdp_agentkit_wrapper import CdpAgentkitWrapper
 
+from src.models.client_registry import ModelClientRegistry
+from src.models.llm_client import SwitchableChatCompletionClient
 from src.models.model import Agent, ModelProvider, AgentRole
-from src.server.wallet_store import WalletStore, WalletData
+from src.server.wallet_store import WalletSessionCache, WalletStore, WalletData
+from src.tools.balance_cache import BalanceCache
 from src.tools.cdp_landchain_adapter import CDPLangChainToolAdapter
+from src.tools.tool_executor import ToolExecutor
 import enum
 
 from src.tools.starknet_toolkit import StarknetToolkit
@@ -26,63 +31,116 @@ class WalletProvider(enum.Enum):
 	
 dotenv.load_dotenv(override=True)
 
+
+def get_wallet_provider(network_id: str) -> WalletProvider:
+    return WalletProvider.STARKNET if "starknet" in network_id else WalletProvider.CDP
+
+
+class WalletSession:
+    """The wallet data of an agent, with the CDP agentkit hydrated from it if the agent uses CDP.
+
+    `created` is set for a new wallet, which is saved when the agent is initialized.
+    """
+
+    def __init__(self, wallet_data: WalletData, cdp_agentkit: Optional[CdpAgentkitWrapper] = None, created: bool = False):
+        self.wallet_data = wallet_data
+        self.cdp_agentkit = cdp_agentkit
+        self.created = created
+        # the CDP toolkit and its wrapped tools, built once per session
+        self.cdp_toolkit: Optional[CdpToolkit] = None
+        self.cdp_tools: Optional[list] = None
+
+
+def _hydrate_wallet(wallet_data: Optional[WalletData], wallet_provider: WalletProvider) -> WalletSession:
+    """Create or hydrate the CDP wallet, the CDP SDK does this with blocking API calls."""
+    if wallet_data is not None and wallet_provider == WalletProvider.STARKNET:
+        # the Starknet account is derived from the seed, no CDP wallet is needed
+        return WalletSession(wallet_data)
+    cdp_agentkit = CdpAgentkitWrapper(
+        network_id="base-sepolia",
+        cdp_wallet_data=json.dumps(wallet_data.to_dict()) if wallet_data else None
+    )
+    if wallet_data is None:
+        return WalletSession(WalletData.from_dict(cdp_agentkit.wallet.export_data().to_dict()), cdp_agentkit, created=True)
+    return WalletSession(wallet_data, cdp_agentkit)
+
+
+async def load_wallet_session(agent_id: uuid.UUID, wallet_provider: WalletProvider) -> WalletSession:
+    """Load the wallet of the agent without blocking the event loop, a new wallet is created if it has none yet.
+
+    Sessions of stored wallets are cached, a new wallet is cached once it is saved.
+    """
+    async def load() -> WalletSession:
+        wallet_data = await WalletStore().load_wallet(str(agent_id))
+        return await ToolExecutor().run("hydrate_wallet", _hydrate_wallet, wallet_data, wallet_provider)
+
+    return await WalletSessionCache().get_or_load(str(agent_id), load, cache=lambda session: not session.created)
+
+
 class AgentWithWallet(AssistantAgent):
-    def __init__(self, name: str, system_message: str, model_client: ChatCompletionClient, agent_id: str | uuid.UUID | None = None, agent_role: AgentRole = AgentRole.ASSISTANT, wallet_provider: WalletProvider = WalletProvider.CDP, **kwargs):
-        if agent_id is None:
-            # Create deterministic UUID based on hash of name and system message
-            combined = f"{name}{system_message}".encode()
-            hash_value = hashlib.md5(combined).hexdigest()
-            self.agent_id = uuid.UUID(hash_value)
-        elif isinstance(agent_id, str):
-            self.agent_id = uuid.UUID(agent_id)
-        else:
-            self.agent_id = agent_id
+    def __init__(self, name: str, system_message: str, model_client: ChatCompletionClient, agent_id: str | uuid.UUID | None = None, agent_role: AgentRole = AgentRole.ASSISTANT, wallet_provider: WalletProvider = WalletProvider.CDP, wallet_session: Optional[WalletSession] = None, **kwargs):
+        """Use `create` to build the agent inside an event loop, it loads the wallet without blocking the loop."""
+        self.agent_id = self.resolve_agent_id(name, system_message, agent_id)
             
         self.agent_role = agent_role
         self.network_id = os.environ.get("NETWORK_ID", "base-sepolia")
-        if "starknet" in self.network_id:
-            self.wallet_provider = WalletProvider.STARKNET
-            print('USING STARKNET')
-        else:
-            self.wallet_provider = WalletProvider.CDP
-            print('USING CDP')
+        self.wallet_provider = get_wallet_provider(self.network_id)
+        print(f'USING {self.wallet_provider.name}')
         
         self.storage_manager = StorageManager()
         self.wallet_store = WalletStore()
         
-        # Load wallet data synchronously for initialization
-        self.wallet_data = self.wallet_store.load_wallet_sync(str(self.agent_id))
-        # Initialize CDP agentkit
-        if self.wallet_data is None:
-            # only create wallet if it doesn't exist yet
-            self.cdp_agentkit = CdpAgentkitWrapper(
-                network_id="base-sepolia",
-                cdp_wallet_data=json.dumps(self.wallet_data.to_dict()) if self.wallet_data else None
-            )
-            self.wallet_data = WalletData.from_dict(self.cdp_agentkit.wallet.export_data().to_dict())
+        if wallet_session is None:
+            # blocking, only for use outside of an event loop
+            wallet_session = _hydrate_wallet(self.wallet_store.load_wallet_sync(str(self.agent_id)), self.wallet_provider)
+        self.wallet_session = wallet_session
+        self.wallet_data = wallet_session.wallet_data
+        self.cdp_agentkit = wallet_session.cdp_agentkit
+        self._wallet_created = wallet_session.created
+        self.starknet_toolkit = None
+        self._balance_tool = None
         
         # Initialize tools list
         tools = kwargs.pop("tools", [])
         
         # Initialize appropriate toolkit and tools
         if self.wallet_provider == WalletProvider.CDP:
-            self.cdp_toolkit = CdpToolkit.from_cdp_agentkit_wrapper(self.cdp_agentkit)
-            wallet_tools = [CDPLangChainToolAdapter(tool) for tool in self.cdp_toolkit.get_tools()]
+            if wallet_session.cdp_tools is None:
+                wallet_session.cdp_toolkit = CdpToolkit.from_cdp_agentkit_wrapper(self.cdp_agentkit)
+                wallet_session.cdp_tools = [CDPLangChainToolAdapter(tool) for tool in wallet_session.cdp_toolkit.get_tools()]
+            self.cdp_toolkit = wallet_session.cdp_toolkit
+            wallet_tools = wallet_session.cdp_tools
             limited_tools = []
             transfer_tool = None
             for tool in wallet_tools:
                 if tool.name == 'transfer':
                     transfer_tool = tool
-                elif tool.name in ["get_balance", "get_wallet_details"]:
+                elif tool.name == "get_balance":
+                    self._balance_tool = tool
+                    async def get_balance(asset_id: str) -> str:
+                        """Get balance for all addresses in the wallet for a given asset, e.g. "eth", "usdc" or a contract address"""
+                        return await self.get_cdp_balance(asset_id)
+                    limited_tools.append(get_balance)
+                elif tool.name == "get_wallet_details":
                     limited_tools.append(tool)
             tools.extend(limited_tools)
             if transfer_tool:
-                def transfer_usdc(amount: str, destination: str):
+                async def transfer_usdc(amount: str, destination: str, cancellation_token: CancellationToken):
                     """Transfers amount of USDC to a given wallet address in hexadecimal format"""
-                    return transfer_tool._langchain_tool({"amount": amount, "asset_id": "usdc", "destination": destination})
+                    # no timeout, a transfer we stopped waiting for would still go through and be retried
+                    try:
+                        return await ToolExecutor().run(
+                            transfer_tool.name, transfer_tool._langchain_tool,
+                            {"amount": amount, "asset_id": "usdc", "destination": destination},
+                            cancellation_token=cancellation_token,
+                        )
+                    finally:
+                        # a failed or cancelled transfer may have been sent too, the sender also pays gas
+                        BalanceCache().invalidate(self.get_address())
+                        BalanceCache().invalidate(destination, "usdc")
                 tools.append(transfer_usdc)
         elif self.wallet_provider == WalletProvider.STARKNET and self.wallet_data:
-            self.starknet_toolkit = StarknetToolkit(self.wallet_data.seed)
+            self.starknet_toolkit = StarknetToolkit(self.wallet_data.seed, on_deployed=self._store_starknet_deployed)
             tools.extend(self.starknet_toolkit.get_tools())
         
         self.agent_data = Agent(
@@ -96,6 +154,11 @@ class AgentWithWallet(AssistantAgent):
             system_prompt=system_message
         )
         
+        # the client can be switched later, e.g. to count the calls of a date on the client of the date
+        if not isinstance(model_client, SwitchableChatCompletionClient):
+            model_client = SwitchableChatCompletionClient(model_client)
+        self._model_client_switch = model_client
+        
         super().__init__(
             name=name,
             system_message=system_message,
@@ -104,15 +167,84 @@ class AgentWithWallet(AssistantAgent):
             **kwargs
         )
         
+    def swap_model_client(self, model_client: ChatCompletionClient) -> ChatCompletionClient:
+        """Send the model calls of the agent to `model_client` and return the previous client.
+
+        A model context built with the same `SwitchableChatCompletionClient` follows along.
+        """
+        return self._model_client_switch.switch(model_client)
+
+    @classmethod
+    def resolve_agent_id(cls, name: str, system_message: str, agent_id: str | uuid.UUID | None = None, **kwargs) -> uuid.UUID:
+        if agent_id is None:
+            # Create deterministic UUID based on hash of name and system message
+            combined = f"{name}{system_message}".encode()
+            hash_value = hashlib.md5(combined).hexdigest()
+            return uuid.UUID(hash_value)
+        elif isinstance(agent_id, str):
+            return uuid.UUID(agent_id)
+        return agent_id
+
+    @classmethod
+    async def create(cls, name: str, system_message: str, model_client: ChatCompletionClient, agent_id: str | uuid.UUID | None = None, **kwargs):
+        """Build and initialize the agent, the wallet is loaded and hydrated without blocking the event loop."""
+        resolved_id = cls.resolve_agent_id(name, system_message, agent_id, **kwargs)
+        wallet_provider = get_wallet_provider(os.environ.get("NETWORK_ID", "base-sepolia"))
+        wallet_session = await load_wallet_session(resolved_id, wallet_provider)
+        instance = cls(
+            name=name,
+            system_message=system_message,
+            model_client=model_client,
+            agent_id=resolved_id,
+            wallet_session=wallet_session,
+            **kwargs
+        )
+        await instance.initialize()
+        return instance
+        
     async def initialize(self):
         """Initialize remaining async operations"""
-        # Save wallet if it doesn't exist
-        if self.wallet_data is None and self.cdp_agentkit.wallet:
+        # Save the wallet if it was just created
+        if self._wallet_created and self.cdp_agentkit and self.cdp_agentkit.wallet:
             await self.wallet_store.save_wallet(str(self.agent_id), self.cdp_agentkit.wallet)
+            self._wallet_created = False
+            self.wallet_session.created = False
+            WalletSessionCache().put(str(self.agent_id), self.wallet_session)
             logging.info(f"Agent {self.name!r} with ID {self.agent_id} created, wallet: {self.cdp_agentkit.wallet.default_address.address_id}")
         
+        if self.wallet_provider == WalletProvider.STARKNET and self.starknet_toolkit:
+            stored = await self.storage_manager.load_user_agent(self._agent_storage_key())
+            if stored and self.network_id in stored.get("starknet_deployed_networks", []):
+                self.agent_data.starknet_deployed_networks.append(self.network_id)
+                self.starknet_toolkit.deployed = True
+        
         await self.storage_manager.save_user_agent(self.agent_id, self.agent_data.model_dump(mode="json"))
         
+    def _agent_storage_key(self):
+        """Key of the stored agent data"""
+        return self.agent_id
+
+    async def _store_starknet_deployed(self):
+        """Store that the Starknet account is deployed on the network, so new instances skip the on-chain check"""
+        if self.network_id not in self.agent_data.starknet_deployed_networks:
+            self.agent_data.starknet_deployed_networks.append(self.network_id)
+        stored = await self.storage_manager.load_user_agent(self._agent_storage_key())
+        agent = Agent.model_validate(stored) if stored else self.agent_data
+        if self.network_id not in agent.starknet_deployed_networks:
+            agent.starknet_deployed_networks.append(self.network_id)
+        await self.storage_manager.save_user_agent(self._agent_storage_key(), agent.model_dump(mode="json"))
+
+    async def bind_starknet_account(self, seed: str):
+        """Switch the agent to a funded and deployed Starknet account and store its seed as the wallet seed"""
+        if self.wallet_provider != WalletProvider.STARKNET or self.starknet_toolkit is None:
+            raise ValueError("The agent has no Starknet wallet")
+        wallet_data = WalletData(self.wallet_data.wallet_id, seed, self.wallet_data.network_id)
+        await self.wallet_store.save_wallet_data(str(self.agent_id), wallet_data)
+        self.wallet_data = wallet_data
+        self.wallet_session.wallet_data = wallet_data
+        await self.starknet_toolkit.use_account(seed)
+        logging.info(f"Agent {self.name!r} was given the provisioned Starknet account {self.get_address()}")
+
     def _save_agent(self, name: str, system_message: str):
         for agent_file in pathlib.Path(".").glob("agents/**/*.json"):
             agent = Agent.model_validate_json(agent_file.read_text())
@@ -132,28 +264,21 @@ class AgentWithWallet(AssistantAgent):
 
     @classmethod
     async def from_agent(cls, agent: Agent, **kwargs):
-        if agent.model_provider.provider == "openai":
-            model_client = OpenAIChatCompletionClient(
-                model=agent.model_provider.model,
-                api_key=os.environ.get("OPENAI_API_KEY"),
-            )
-        else:
-            raise ValueError(f"Unsupported model provider: {agent.model_provider.provider}")
+        model_client = kwargs.pop("model_client", None)
+        if model_client is None:
+            model_client = ModelClientRegistry().get_client(agent.model_provider.model, agent.model_provider.provider)
         
         name = kwargs.pop("name", agent.name)
         system_message = kwargs.pop("system_message", agent.get_full_system_prompt())
-        model_client = kwargs.pop("model_client", model_client)
         agent_id = kwargs.pop("agent_id", agent.id)
         
-        instance = cls(
+        return await cls.create(
             name=name,
             system_message=system_message,
             model_client=model_client,
             agent_id=agent_id,
             **kwargs
         )
-        await instance.initialize()
-        return instance
     
     @classmethod
     async def from_json(cls, path: str, **kwargs):
@@ -161,6 +286,16 @@ class AgentWithWallet(AssistantAgent):
             agent = Agent.model_validate_json(f.read())
         return await cls.from_agent(agent, **kwargs)
 
+    async def get_cdp_balance(self, asset_id: str) -> str:
+        """Get the balance of the CDP wallet for the asset, recent balances are served from the balance cache"""
+        tool = self._balance_tool
+        if tool is None:
+            raise ValueError("The wallet has no balance tool")
+        return await BalanceCache().get_or_fetch(
+            self.get_address(), asset_id,
+            lambda: tool.run_json({"asset_id": asset_id}, CancellationToken()),
+        )
+
     def get_wallet(self):
         return self.cdp_agentkit.wallet if self.cdp_agentkit else None
     
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+import httpx
+from autogen_core.models import ChatCompletionClient
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from src.config import Config
+from src.models.llm_client import CircuitBreaker, ConcurrencyLimitedClient, ModelCallStats, ResilientChatCompletionClient
+
+
+class ModelClientRegistry:
+    """Process-wide registry of model clients keyed by provider and model.
+
+    All OpenAI clients share one keep-alive HTTP connection pool, so TLS connections are reused
+    across agents and date simulations. `get_client` returns a lightweight wrapper per caller that
+    counts its own usage, retries and hedges failed or slow calls, and applies the per-model
+    concurrency limit and circuit breaker. Call `close` on shutdown.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ModelClientRegistry, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._clients: Dict[Tuple[str, str], ChatCompletionClient] = {}
+        self._semaphores: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._stats: Dict[Tuple[str, str], ModelCallStats] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._initialized = True
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=Config.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+                    keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(Config.LLM_REQUEST_TIMEOUT, connect=10.0),
+            )
+        return self._http_client
+
+    def _create_client(self, provider: str, model: str) -> ChatCompletionClient:
+        if provider == "openai":
+            return OpenAIChatCompletionClient(
+                model=model,
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                http_client=self._get_http_client(),
+                # retries are done by ResilientChatCompletionClient
+                max_retries=0,
+            )
+        raise ValueError(f"Unsupported model provider: {provider}")
+
+    def register(self, model: str, client: ChatCompletionClient, provider: str = "openai"):
+        """Register a client for a model, e.g. to use a local stand-in instead of the provider."""
+        self._clients[(provider, model)] = client
+
+    def get_client(self, model: str, provider: str = "openai") -> ChatCompletionClient:
+        """Get a client for the model that shares the connection pool and concurrency limit of the model."""
+        key = (provider, model)
+        if key not in self._clients:
+            self._clients[key] = self._create_client(provider, model)
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(Config.get_llm_concurrency_limit(model))
+            self._breakers[key] = CircuitBreaker(
+                f"{provider}/{model}",
+                failure_threshold=Config.LLM_CIRCUIT_FAILURES,
+                reset_timeout=Config.LLM_CIRCUIT_RESET_TIMEOUT,
+            )
+            self._stats[key] = ModelCallStats()
+        # every attempt, including retries and hedged requests, takes a slot of the concurrency limit
+        return ResilientChatCompletionClient(
+            ConcurrencyLimitedClient(self._clients[key], self._semaphores[key]),
+            max_retries=Config.LLM_MAX_RETRIES,
+            base_delay=Config.LLM_RETRY_BASE_DELAY,
+            max_delay=Config.LLM_RETRY_MAX_DELAY,
+            hedge_after=Config.LLM_HEDGE_AFTER,
+            breaker=self._breakers[key],
+            stats=self._stats[key],
+        )
+    
+    def stats(self) -> Dict[str, dict]:
+        """Call counters and circuit state per model."""
+        return {
+            f"{provider}/{model}": {**stats.as_dict(), "circuit": self._breakers[(provider, model)].state}
+            for (provider, model), stats in self._stats.items()
+        }
+
+    async def close(self):
+        """Close all clients and the shared connection pool."""
+        for (provider, model), client in list(self._clients.items()):
+            try:
+                await client.close()
+            except Exception as e:
+                logging.error(f"Error closing model client {provider}/{model}: {e}")
+        self._clients.clear()
+        self._semaphores.clear()
+        self._breakers.clear()
+        self._stats.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
@@ -0,0 +1,158 @@
+import logging
+from typing import List, Literal, Optional
+
+from autogen_core.memory import Memory, MemoryContent, MemoryMimeType
+from autogen_core.model_context import ChatCompletionContext, UnboundedChatCompletionContext
+from autogen_core.models import (
+    AssistantMessage,
+    ChatCompletionClient,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+from pydantic import BaseModel
+
+from src.config import Config
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the following part of a conversation between a user and their date manager. "
+    "Keep all facts about the user, their preferences, decisions, dates that happened and open requests. "
+    "Be concise and only respond with the summary."
+)
+
+
+class ContextPolicy(BaseModel):
+    """Controls how much chat history an agent sends to the model on each call.
+
+    strategy:
+        unbounded: keep the full history (the autogen default)
+        window: keep the last `window_size` messages
+        token_budget: keep the most recent messages fitting into `token_budget` tokens
+        summarize: like window and token_budget, but older messages are summarized into memory instead of dropped
+    """
+    strategy: Literal["unbounded", "window", "token_budget", "summarize"] = "window"
+    window_size: int = 30
+    token_budget: Optional[int] = None
+    # older messages are trimmed in batches, so summarization only runs every `trim_batch` messages
+    trim_batch: int = 10
+
+    @classmethod
+    def for_manager(cls) -> "ContextPolicy":
+        return cls(
+            strategy=Config.MANAGER_CONTEXT_STRATEGY,
+            window_size=Config.MANAGER_CONTEXT_WINDOW,
+            token_budget=Config.MANAGER_CONTEXT_TOKEN_BUDGET,
+        )
+
+    @classmethod
+    def for_participant(cls) -> "ContextPolicy":
+        return cls(
+            strategy=Config.PARTICIPANT_CONTEXT_STRATEGY,
+            window_size=Config.PARTICIPANT_CONTEXT_WINDOW,
+            token_budget=Config.PARTICIPANT_CONTEXT_TOKEN_BUDGET,
+        )
+
+
+def _format_message(message: LLMMessage) -> str:
+    if isinstance(message, UserMessage):
+        return f"{message.source}: {message.content}"
+    if isinstance(message, AssistantMessage):
+        if isinstance(message.content, str):
+            return f"{message.source}: {message.content}"
+        return f"{message.source} called: {', '.join(call.name for call in message.content)}"
+    if isinstance(message, FunctionExecutionResultMessage):
+        return "Tool results: " + "; ".join(result.content[:200] for result in message.content)
+    return ""
+
+
+class BoundedChatCompletionContext(ChatCompletionContext):
+    """A chat completion context that keeps the history bounded.
+
+    Once the history exceeds `window_size` messages (plus `trim_batch` slack) or `token_budget`
+    tokens, the oldest messages are removed from the context, so the saved state stays bounded too.
+    If `summarize` is set, the removed messages are first summarized with `model_client` and the
+    summary is added to `memory`, which injects it into later model calls.
+    """
+
+    def __init__(self, window_size: Optional[int] = None, token_budget: Optional[int] = None, trim_batch: int = 10,
+                 model_client: Optional[ChatCompletionClient] = None, memory: Optional[Memory] = None,
+                 summarize: bool = False, initial_messages: Optional[List[LLMMessage]] = None):
+        super().__init__(initial_messages)
+        if summarize and (model_client is None or memory is None):
+            raise ValueError("Summarization requires a model client and a memory")
+        self._window_size = window_size
+        self._token_budget = token_budget
+        self._trim_batch = trim_batch
+        self._model_client = model_client
+        self._memory = memory
+        self._summarize = summarize
+
+    def _count_tokens(self, messages: List[LLMMessage]) -> int:
+        if self._model_client is not None:
+            try:
+                return self._model_client.count_tokens(messages)
+            except Exception:
+                pass
+        return sum(len(str(message.content)) // 4 for message in messages)
+
+    def _split_index(self) -> int:
+        """Return the number of oldest messages to remove from the context."""
+        remove = 0
+        if self._window_size is not None and len(self._messages) > self._window_size + self._trim_batch:
+            remove = len(self._messages) - self._window_size
+        if self._token_budget is not None:
+            tokens = [self._count_tokens([message]) for message in self._messages]
+            remaining = sum(tokens[remove:])
+            if remaining > self._token_budget:
+                # trim below the budget, so trimming does not happen on every call
+                target = self._token_budget * 0.8
+                while remove < len(self._messages) - 1 and remaining > target:
+                    remaining -= tokens[remove]
+                    remove += 1
+        # never start the context with tool results whose tool call was removed
+        while 0 < remove < len(self._messages) - 1 and isinstance(self._messages[remove], FunctionExecutionResultMessage):
+            remove += 1
+        return remove
+
+    async def _summarize_messages(self, messages: List[LLMMessage]):
+        transcript = "\n".join(line for line in map(_format_message, messages) if line)
+        if not transcript:
+            return
+        try:
+            result = await self._model_client.create([
+                SystemMessage(content=SUMMARY_INSTRUCTIONS),
+                UserMessage(content=transcript, source="user"),
+            ])
+        except Exception as e:
+            logging.error(f"Failed to summarize {len(messages)} messages, dropping them: {e}")
+            return
+        if isinstance(result.content, str):
+            await self._memory.add(MemoryContent(
+                content=f"Summary of an earlier conversation: {result.content}",
+                mime_type=MemoryMimeType.TEXT,
+            ))
+
+    async def get_messages(self) -> List[LLMMessage]:
+        remove = self._split_index()
+        if remove > 0:
+            removed, self._messages = self._messages[:remove], self._messages[remove:]
+            if self._summarize:
+                # memory contents injected as system messages are already in memory
+                await self._summarize_messages([message for message in removed if not isinstance(message, SystemMessage)])
+        return list(self._messages)
+
+
+def create_model_context(policy: ContextPolicy, model_client: Optional[ChatCompletionClient] = None,
+                         memory: Optional[Memory] = None) -> ChatCompletionContext:
+    """Create the model context for an agent according to the policy."""
+    if policy.strategy == "unbounded":
+        return UnboundedChatCompletionContext()
+    return BoundedChatCompletionContext(
+        window_size=policy.window_size if policy.strategy != "token_budget" else None,
+        token_budget=policy.token_budget,
+        trim_batch=policy.trim_batch,
+        model_client=model_client,
+        memory=memory,
+        summarize=policy.strategy == "summarize" and memory is not None,
+    )
@@ -0,0 +1,386 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, AsyncGenerator, Optional, Sequence, Union
+
+import httpx
+import openai
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+
+
+class DelegatingChatCompletionClient(ChatCompletionClient):
+    """Base class for clients that wrap another `ChatCompletionClient`.
+
+    All calls are forwarded to the wrapped client. Usage is counted per wrapper, so
+    several wrappers can share one underlying client while reporting their own usage.
+    The wrapped client is only closed if the wrapper owns it.
+    """
+
+    def __init__(self, client: ChatCompletionClient, owns_client: bool = False):
+        self._client = client
+        self._owns_client = owns_client
+        self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    @property
+    def inner_client(self) -> ChatCompletionClient:
+        return self._client
+
+    def _record_usage(self, usage: Optional[RequestUsage]):
+        if usage is None:
+            return
+        self._actual_usage = RequestUsage(
+            prompt_tokens=self._actual_usage.prompt_tokens + usage.prompt_tokens,
+            completion_tokens=self._actual_usage.completion_tokens + usage.completion_tokens,
+        )
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + usage.prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + usage.completion_tokens,
+        )
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        result = await self._create(messages, **kwargs)
+        self._record_usage(result.usage)
+        return result
+
+    async def _create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        return await self._client.create(messages, **kwargs)
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async for chunk in self._create_stream(messages, **kwargs):
+            if isinstance(chunk, CreateResult):
+                self._record_usage(chunk.usage)
+            yield chunk
+
+    async def _create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async for chunk in self._client.create_stream(messages, **kwargs):
+            yield chunk
+
+    async def close(self) -> None:
+        if self._owns_client:
+            await self._client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._actual_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return self._client.count_tokens(messages, **kwargs)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs: Any) -> int:
+        return self._client.remaining_tokens(messages, **kwargs)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+
+class SwitchableChatCompletionClient(DelegatingChatCompletionClient):
+    """Forwards to a client that can be switched, so a long-lived agent can count its calls on the client of a date.
+
+    Give the same instance to the agent and to its model context, then `switch` redirects both.
+    """
+
+    def switch(self, client: ChatCompletionClient) -> ChatCompletionClient:
+        """Forward to `client` from now on and return the previous client."""
+        previous, self._client = self._client, client
+        return previous
+
+
+class ConcurrencyLimitedClient(DelegatingChatCompletionClient):
+    """Limits the number of in-flight requests, the semaphore can be shared between wrappers."""
+
+    def __init__(self, client: ChatCompletionClient, semaphore: asyncio.Semaphore | int, owns_client: bool = False):
+        super().__init__(client, owns_client=owns_client)
+        self.semaphore = asyncio.Semaphore(semaphore) if isinstance(semaphore, int) else semaphore
+
+    async def _create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        async with self.semaphore:
+            return await self._client.create(messages, **kwargs)
+
+    async def create_admitted(self, messages: Sequence[LLMMessage], admitted: asyncio.Event, **kwargs: Any) -> CreateResult:
+        """Like `create`, and sets `admitted` once the request holds a slot."""
+        async with self.semaphore:
+            admitted.set()
+            result = await self._client.create(messages, **kwargs)
+        self._record_usage(result.usage)
+        return result
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a new request would have to wait for a slot."""
+        return self.semaphore.locked()
+
+    async def _create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async with self.semaphore:
+            async for chunk in self._client.create_stream(messages, **kwargs):
+                yield chunk
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the model while the circuit breaker of the model is open."""
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Timeouts, connection errors, rate limits and server errors are worth retrying, invalid requests are not."""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Return the delay requested by the provider with a Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Fails fast once a model keeps failing.
+
+    After `failure_threshold` consecutive retryable failures the circuit opens and calls fail
+    with `CircuitOpenError` for `reset_timeout` seconds. Then a single trial call is let through,
+    which closes the circuit again on success.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def before_call(self) -> bool:
+        """Raise `CircuitOpenError` if the call is not let through, return whether it is the trial call."""
+        if self.state == "closed":
+            return False
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        raise CircuitOpenError(f"Circuit of {self.name} is open after {self.consecutive_failures} consecutive failures")
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logging.warning(f"Opening circuit of {self.name} after {self.consecutive_failures} consecutive failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Let the next call be the trial, for a trial call that was cancelled before it had a result."""
+        if self.state == "half_open":
+            self._trial_in_flight = False
+
+
+class ModelCallStats:
+    """Counters of the calls to one model, shared by all clients of the model."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        # hedges not sent because all slots of the concurrency limit were taken
+        self.hedges_skipped = 0
+        self.rejected = 0
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class ResilientChatCompletionClient(DelegatingChatCompletionClient):
+    """Retries retryable errors with jittered exponential backoff, hedges slow calls and fails fast when the model is down.
+
+    Args:
+        max_retries: Number of retries after the first attempt.
+        base_delay, max_delay: Backoff bounds, the delay before retry n is uniform in [0, min(max_delay, base_delay * 2**n)].
+        hedge_after: If set, a duplicate request is sent when the first one has not returned after this many
+            seconds, and the first result wins. The time counts from when the request holds a slot of a
+            wrapped `ConcurrencyLimitedClient`, and no duplicate is sent while all slots are taken.
+            Streaming calls are not hedged.
+        breaker: Circuit breaker of the model, shared by all clients of the model.
+        stats: Call counters of the model, shared by all clients of the model.
+    """
+
+    def __init__(self, client: ChatCompletionClient, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 hedge_after: Optional[float] = None, breaker: Optional[CircuitBreaker] = None,
+                 stats: Optional[ModelCallStats] = None, owns_client: bool = False):
+        super().__init__(client, owns_client=owns_client)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+        self.stats = stats or ModelCallStats()
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    async def _tracked_create(self, messages: Sequence[LLMMessage], admitted: Optional[asyncio.Event] = None, **kwargs: Any) -> CreateResult:
+        self.stats.in_flight += 1
+        self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+        try:
+            if admitted is not None and isinstance(self._client, ConcurrencyLimitedClient):
+                return await self._client.create_admitted(messages, admitted, **kwargs)
+            if admitted is not None:
+                admitted.set()
+            return await self._client.create(messages, **kwargs)
+        finally:
+            self.stats.in_flight -= 1
+
+    async def _hedged_create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        if not self.hedge_after:
+            return await self._tracked_create(messages, **kwargs)
+        admitted = asyncio.Event()
+        first = asyncio.create_task(self._tracked_create(messages, admitted, **kwargs))
+        admission = asyncio.create_task(admitted.wait())
+        tasks = {first}
+        try:
+            # time spent waiting for a slot is not slowness of the model, the hedge timer starts after it
+            await asyncio.wait({first, admission}, return_when=asyncio.FIRST_COMPLETED)
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if first in done:
+                return first.result()
+            if isinstance(self._client, ConcurrencyLimitedClient) and self._client.saturated:
+                # a hedge would queue for a slot and add load while the model is busiest
+                self.stats.hedges_skipped += 1
+                return await first
+            self.stats.hedges += 1
+            tasks.add(asyncio.create_task(self._tracked_create(messages, **kwargs)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            admission.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def _create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        attempt = 0
+        while True:
+            trial = False
+            if self.breaker is not None:
+                try:
+                    trial = self.breaker.before_call()
+                except CircuitOpenError:
+                    self.stats.rejected += 1
+                    raise
+            self.stats.calls += 1
+            try:
+                result = await self._hedged_create(messages, **kwargs)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    if self.breaker is not None:
+                        # the model answered, the request was the problem
+                        self.breaker.record_success()
+                    raise
+                self.stats.failures += 1
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.stats.retries += 1
+                logging.warning(f"Model call failed with {type(e).__name__}: {e}, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # a cancelled trial has no outcome, without the release the circuit would stay half open
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    async def _create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+        attempt = 0
+        while True:
+            trial = False
+            if self.breaker is not None:
+                try:
+                    trial = self.breaker.before_call()
+                except CircuitOpenError:
+                    self.stats.rejected += 1
+                    raise
+            self.stats.calls += 1
+            self.stats.in_flight += 1
+            self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+            yielded = False
+            # whether the breaker got the outcome of the call, a trial without one is released
+            recorded = False
+            try:
+                async for chunk in self._client.create_stream(messages, **kwargs):
+                    yielded = True
+                    yield chunk
+                if self.breaker is not None:
+                    self.breaker.record_success()
+                recorded = True
+            except Exception as e:
+                retryable = is_retryable_error(e)
+                if retryable:
+                    self.stats.failures += 1
+                if self.breaker is not None:
+                    if retryable:
+                        self.breaker.record_failure()
+                    else:
+                        # the model answered, the request was the problem
+                        self.breaker.record_success()
+                recorded = True
+                # a stream can only be retried before anything was passed on
+                if yielded or not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.stats.retries += 1
+                logging.warning(f"Model stream failed with {type(e).__name__}: {e}, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                self.stats.in_flight -= 1
+                # e.g. cancelled or closed by the consumer, without the release the circuit would stay half open
+                if trial and not recorded:
+                    self.breaker.release_trial()
+            return
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.memory import Memory, MemoryContent, MemoryMimeType, MemoryQueryResult, UpdateContextResult
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import SystemMessage, UserMessage
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its me my of on or our she so that the "
+    "their them they this to was we were what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+def _content_text(content: MemoryContent) -> str:
+    if isinstance(content.content, str):
+        return content.content
+    return json.dumps(content.content, sort_keys=True, default=str)
+
+
+class BM25Memory(Memory):
+    """Memory with a local BM25 keyword index that only injects the items relevant to the current turn.
+
+    Instead of adding every stored item to each model call like `ListMemory`, `update_context` queries the
+    index with the latest user message and adds the `top_k` best matching items. Items with
+    `metadata["pinned"]` are always added, e.g. the user profile.
+
+    Adding an item whose text is already stored is a no-op. Items with `metadata["key"]` replace the stored
+    item with the same key, so updated facts do not pile up.
+    """
+
+    def __init__(self, name: Optional[str] = None, top_k: int = 5, k1: float = 1.5, b: float = 0.75):
+        self._name = name or "bm25_memory"
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+        self._contents: List[MemoryContent] = []
+        self._terms: List[Counter] = []
+        self._hashes: List[str] = []
+        self._document_frequency: Counter = Counter()
+        self._total_length = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def content(self) -> List[MemoryContent]:
+        return list(self._contents)
+
+    def _index(self, content: MemoryContent):
+        text = _content_text(content)
+        terms = Counter(tokenize(text))
+        self._contents.append(content)
+        self._terms.append(terms)
+        self._hashes.append(hashlib.sha1(" ".join(text.split()).lower().encode()).hexdigest())
+        self._document_frequency.update(terms.keys())
+        self._total_length += sum(terms.values())
+
+    def _remove(self, index: int):
+        terms = self._terms.pop(index)
+        self._contents.pop(index)
+        self._hashes.pop(index)
+        self._document_frequency.subtract(terms.keys())
+        self._document_frequency += Counter()  # drop terms that no longer occur
+        self._total_length -= sum(terms.values())
+
+    def _score(self, query_terms: List[str]) -> List[float]:
+        num_documents = len(self._contents)
+        average_length = self._total_length / num_documents if num_documents else 0.0
+        scores = []
+        for terms in self._terms:
+            length = sum(terms.values())
+            score = 0.0
+            for term in query_terms:
+                frequency = terms.get(term, 0)
+                if not frequency:
+                    continue
+                document_frequency = self._document_frequency[term]
+                idf = math.log(1 + (num_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+                normalization = self.k1 * (1 - self.b + self.b * length / average_length) if average_length else self.k1
+                score += idf * frequency * (self.k1 + 1) / (frequency + normalization)
+            scores.append(score)
+        return scores
+
+    async def add(self, content: MemoryContent, cancellation_token: CancellationToken | None = None) -> None:
+        key = (content.metadata or {}).get("key")
+        if key is not None:
+            for index, stored in enumerate(self._contents):
+                if (stored.metadata or {}).get("key") == key:
+                    self._remove(index)
+                    break
+        text = _content_text(content)
+        if hashlib.sha1(" ".join(text.split()).lower().encode()).hexdigest() in self._hashes:
+            return
+        self._index(content)
+
+    def remove_where(self, predicate: Callable[[MemoryContent], bool]) -> int:
+        """Remove the stored items the predicate is true for and return how many were removed."""
+        indexes = [index for index, content in enumerate(self._contents) if predicate(content)]
+        for index in reversed(indexes):
+            self._remove(index)
+        return len(indexes)
+
+    async def query(self, query: str | MemoryContent = "", cancellation_token: CancellationToken | None = None,
+                    top_k: Optional[int] = None, **kwargs: Any) -> MemoryQueryResult:
+        """Return the stored items best matching the query, most relevant first."""
+        text = _content_text(query) if isinstance(query, MemoryContent) else query
+        query_terms = tokenize(text)
+        if not query_terms:
+            return MemoryQueryResult(results=[])
+        scores = self._score(query_terms)
+        ranked = sorted((index for index, score in enumerate(scores) if score > 0), key=lambda index: -scores[index])
+        results = []
+        for index in ranked[:top_k or self.top_k]:
+            content = self._contents[index]
+            results.append(content.model_copy(update={"metadata": {**(content.metadata or {}), "score": round(scores[index], 4)}}))
+        return MemoryQueryResult(results=results)
+
+    async def update_context(self, model_context: ChatCompletionContext) -> UpdateContextResult:
+        messages = await model_context.get_messages()
+        last_user_message = next((message for message in reversed(messages) if isinstance(message, UserMessage)), None)
+        pinned = [content for content in self._contents if (content.metadata or {}).get("pinned")]
+        relevant = []
+        if last_user_message is not None and isinstance(last_user_message.content, str):
+            relevant = [
+                content for content in (await self.query(last_user_message.content)).results
+                if not content.metadata.get("pinned")
+            ]
+        memories = pinned + relevant
+        if memories:
+            memory_strings = [f"{i}. {_content_text(memory)}" for i, memory in enumerate(memories, 1)]
+            await model_context.add_message(SystemMessage(content="\nRelevant memory content:\n" + "\n".join(memory_strings) + "\n"))
+        return UpdateContextResult(memories=MemoryQueryResult(results=memories))
+
+    async def clear(self) -> None:
+        self._contents, self._terms, self._hashes = [], [], []
+        self._document_frequency = Counter()
+        self._total_length = 0
+
+    async def close(self) -> None:
+        pass
+
+    def dump_contents(self) -> List[Dict[str, Any]]:
+        """Return the stored items in a JSON serializable form, for `load_contents`."""
+        return [
+            {"content": content.content, "mime_type": MemoryMimeType(content.mime_type).value, "metadata": content.metadata}
+            for content in self._contents
+        ]
+
+    async def load_contents(self, contents: List[Dict[str, Any]]):
+        for content in contents:
+            await self.add(MemoryContent(
+                content=content["content"],
+                mime_type=MemoryMimeType(content.get("mime_type", MemoryMimeType.TEXT.value)),
+                metadata=content.get("metadata"),
+            ))
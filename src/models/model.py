@@ -1,8 +1,11 @@
-from typing import Optional, List
+from collections import OrderedDict
+from typing import Dict, Optional, List
 from pydantic import BaseModel
 import enum
+import hashlib
 import pathlib
 import random
+import string
 import uuid
 from pydantic import Field
 from src.storage.manager import StorageManager
@@ -52,6 +55,44 @@ class StoreableBaseModel(BaseModel):
         with open(path, 'r') as file:
             return cls.model_validate_json(file.read())
 
+class PromptTemplate:
+    """A prompt template that is read from disk once and validated on load."""
+    
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.fields = {field for _, field, _, _ in string.Formatter().parse(text) if field}
+        
+    def render(self, **sections: str) -> str:
+        missing = self.fields - sections.keys()
+        if missing:
+            raise KeyError(f"Missing sections for template {self.name!r}: {', '.join(sorted(missing))}")
+        return self.text.format(**sections)
+
+
+class PromptTemplateRegistry:
+    """Process-wide registry of the prompt templates in the `prompts` folder."""
+    _templates: Dict[str, PromptTemplate] = {}
+    
+    @classmethod
+    def get(cls, name: str) -> PromptTemplate:
+        template = cls._templates.get(name)
+        if template is None:
+            text = pathlib.Path(f"prompts/{name}.txt").read_text()
+            template = cls._templates[name] = PromptTemplate(name, text)
+        return template
+    
+    @classmethod
+    def clear(cls):
+        cls._templates.clear()
+        _rendered_prompts.clear()
+
+
+# memoized output of `Agent.get_full_system_prompt`, keyed by agent, content hash, template, seed and sample size
+MAX_RENDERED_PROMPTS = 256
+_rendered_prompts: "OrderedDict[tuple, str]" = OrderedDict()
+
+
 class SimpleUser(StoreableBaseModel):
     id: int
     name: str
@@ -111,18 +152,21 @@ class Agent(StoreableBaseModel):
     system_prompt: Optional[str] = None
     character: Optional[Character] = None
     user_profile: Optional[UserProfile] = None
+    # networks (NETWORK_ID) on which the Starknet account of the agent is deployed, so it is not checked
+    # on chain again there. The seed gives the same address on every network, the deployment does not carry over
+    starknet_deployed_networks: List[str] = Field(default_factory=list)
 
-    def _format_list_items(self, items: List[str], num_items: int = 3) -> str:
+    def _format_list_items(self, items: List[str], num_items: int = 3, rng: Optional[random.Random] = None) -> str:
         """Format a list of items as a bullet-point string, selecting random items."""
-        selected_items = random.sample(items, min(num_items, len(items)))
+        selected_items = (rng or random).sample(items, min(num_items, len(items)))
         return "\n".join(f"- {item}" for item in selected_items)
     
-    def _format_conversation_examples(self, examples: List[List[Message]], num_examples: int = 2) -> str:
+    def _format_conversation_examples(self, examples: List[List[Message]], num_examples: int = 2, rng: Optional[random.Random] = None) -> str:
         """Format conversation examples, selecting random examples."""
         if not examples:
             return ""
             
-        selected_examples = random.sample(examples, min(num_examples, len(examples)))
+        selected_examples = (rng or random).sample(examples, min(num_examples, len(examples)))
         formatted_examples = []
         
         for i, example in enumerate(selected_examples, 1):
@@ -133,19 +177,27 @@ class Agent(StoreableBaseModel):
         return "\n\n".join(formatted_examples)
     
     def get_full_system_prompt(self, seed: Optional[int] = None, num_examples: int = 10) -> str:
-        """Generate a full system prompt using the template and character information."""
-        if seed is not None:
-            random.seed(seed)
+        """Generate a full system prompt using the template and character information.
+        
+        The random selection of character details uses a local RNG seeded with `seed`, or with
+        the agent id if no seed is given, so the same agent always gets the same prompt and
+        provider-side prompt caching can reuse it. Rendered prompts are memoized."""
+        if seed is None:
+            seed = self.id.int
             
         # Determine which template to use
         if self.role == AgentRole.PARTICIPANT and self.character:
-            template_path = pathlib.Path("prompts/character_template.txt")
+            template_name = "character_template"
         else:
-            template_path = pathlib.Path("prompts/agent_template.txt")
-            
-        # Load the template
-        with open(template_path, "r") as f:
-            template = f.read()
+            template_name = "agent_template"
+        
+        cache_key = (self.id, hashlib.sha1(self.model_dump_json().encode()).hexdigest(), template_name, seed, num_examples)
+        cached = _rendered_prompts.get(cache_key)
+        if cached is not None:
+            _rendered_prompts.move_to_end(cache_key)
+            return cached
+        
+        rng = random.Random(seed)
             
         # Prepare sections
         sections = {
@@ -157,15 +209,19 @@ class Agent(StoreableBaseModel):
         # Add character information if available and if it's a participant
         if self.role == AgentRole.PARTICIPANT and self.character:
             sections.update({
-                "bio_section": self._format_list_items(self.character.bio, num_examples),
-                "lore_section": self._format_list_items(self.character.lore, num_examples),
-                "knowledge_section": self._format_list_items(self.character.knowledge, num_examples),
+                "bio_section": self._format_list_items(self.character.bio, num_examples, rng),
+                "lore_section": self._format_list_items(self.character.lore, num_examples, rng),
+                "knowledge_section": self._format_list_items(self.character.knowledge, num_examples, rng),
                 "style_section": "\n".join(f"- {item}" for item in self.character.style),
                 "adjectives_section": "\n".join(f"- {item}" for item in self.character.adjectives),
-                "topics_section": self._format_list_items(self.character.topics, num_examples),
-                "conversation_examples": self._format_conversation_examples(self.character.conversation_examples, num_examples),
-                "quotes_section": self._format_list_items(self.character.quotes, num_examples) if self.character.quotes else ""
+                "topics_section": self._format_list_items(self.character.topics, num_examples, rng),
+                "conversation_examples": self._format_conversation_examples(self.character.conversation_examples, num_examples, rng),
+                "quotes_section": self._format_list_items(self.character.quotes, num_examples, rng) if self.character.quotes else ""
             })
             
         # Format the template
-        return template.format(**sections)
+        prompt = PromptTemplateRegistry.get(template_name).render(**sections)
+        _rendered_prompts[cache_key] = prompt
+        if len(_rendered_prompts) > MAX_RENDERED_PROMPTS:
+            _rendered_prompts.popitem(last=False)
+        return prompt
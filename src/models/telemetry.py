@@ -0,0 +1,227 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Sequence, Union
+
+from autogen_agentchat.base import TaskResult
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from pydantic import BaseModel, Field
+
+from src.models.llm_client import DelegatingChatCompletionClient
+from src.storage.manager import StorageManager
+
+
+class LLMCallRecord(BaseModel):
+    """Usage and latency of a single model call."""
+    agent: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float
+    # seconds since the recorder was created, e.g. since the start of the date
+    started_at: float
+    error: Optional[str] = None
+
+
+class AgentUsage(BaseModel):
+    """Aggregated model usage of one agent."""
+    calls: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_latency: float = 0.0
+    p50_latency: float = 0.0
+    max_latency: float = 0.0
+
+
+class UsageReport(BaseModel):
+    """Model usage of a date or a chat, per agent and in total."""
+    agents: Dict[str, AgentUsage] = Field(default_factory=dict)
+    total: AgentUsage = Field(default_factory=AgentUsage)
+    calls: List[LLMCallRecord] = Field(default_factory=list)
+
+
+def aggregate_usage(records: Iterable[LLMCallRecord]) -> AgentUsage:
+    records = list(records)
+    latencies = sorted(record.latency for record in records)
+    return AgentUsage(
+        calls=len(records),
+        errors=sum(record.error is not None for record in records),
+        prompt_tokens=sum(record.prompt_tokens for record in records),
+        completion_tokens=sum(record.completion_tokens for record in records),
+        total_latency=round(sum(latencies), 4),
+        p50_latency=round(latencies[len(latencies) // 2], 4) if latencies else 0.0,
+        max_latency=round(latencies[-1], 4) if latencies else 0.0,
+    )
+
+
+class UsageRecorder:
+    """Collects the model calls of a date simulation or a chat.
+
+    With `max_records` only the latest calls are kept, for long-lived agents like the date manager.
+    """
+
+    def __init__(self, max_records: Optional[int] = None):
+        self.records: List[LLMCallRecord] = []
+        self.max_records = max_records
+        # number of calls recorded so far, including the ones no longer kept
+        self.num_recorded = 0
+        self._started = time.perf_counter()
+
+    def record(self, record: LLMCallRecord):
+        self.records.append(record)
+        self.num_recorded += 1
+        if self.max_records is not None and len(self.records) > self.max_records:
+            del self.records[:len(self.records) - self.max_records]
+        ProcessUsageStats().add(record)
+
+    def calls_since(self, num_recorded: int) -> List[LLMCallRecord]:
+        """Return the calls recorded after `num_recorded` calls, e.g. the calls of a chat turn."""
+        new_calls = self.num_recorded - num_recorded
+        return self.records[-new_calls:] if new_calls > 0 else []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def report(self, include_calls: bool = True) -> UsageReport:
+        by_agent = defaultdict(list)
+        for record in self.records:
+            by_agent[record.agent].append(record)
+        return UsageReport(
+            agents={agent: aggregate_usage(records) for agent, records in by_agent.items()},
+            total=aggregate_usage(self.records),
+            calls=list(self.records) if include_calls else [],
+        )
+
+
+class ProcessUsageStats:
+    """Aggregated model usage of all recorders of the process, by agent."""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ProcessUsageStats, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        # a bounded number of latest calls per agent, for the latency percentiles
+        self.max_records_per_agent = 1000
+        self._records: Dict[str, List[LLMCallRecord]] = defaultdict(list)
+        self._initialized = True
+
+    def add(self, record: LLMCallRecord):
+        records = self._records[record.agent]
+        records.append(record)
+        if len(records) > self.max_records_per_agent:
+            del records[:len(records) - self.max_records_per_agent]
+
+    def report(self) -> Dict[str, AgentUsage]:
+        return {agent: aggregate_usage(records) for agent, records in self._records.items()}
+
+
+class DateUsageStats:
+    """Model usage of all stored dates by agent, kept in one rolled-up file.
+
+    `/metrics` reads that file instead of every stored date. Each saved date is added to it, the file is
+    reread for every update, so dates of other processes are not lost. Without a rolled-up file it is
+    built once from the usage files of the stored dates.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(DateUsageStats, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.storage_manager = StorageManager()
+        self._lock: Optional[asyncio.Lock] = None
+        self._initialized = True
+
+    async def _load(self) -> Dict[str, Any]:
+        stored = await self.storage_manager.load_date_usage()
+        if stored is not None:
+            return stored
+        rollup = {"count": 0, "agents": {}}
+        for usage in await self.storage_manager.load_conversation_usages():
+            self._merge(rollup, usage)
+        await self.storage_manager.save_date_usage(rollup)
+        return rollup
+
+    @staticmethod
+    def _merge(rollup: Dict[str, Any], usage: Dict[str, Any]):
+        rollup["count"] += 1
+        for agent, agent_usage in usage.get("agents", {}).items():
+            total = AgentUsage.model_validate(rollup["agents"].get(agent, {}))
+            total.calls += agent_usage["calls"]
+            total.errors += agent_usage["errors"]
+            total.prompt_tokens += agent_usage["prompt_tokens"]
+            total.completion_tokens += agent_usage["completion_tokens"]
+            total.total_latency = round(total.total_latency + agent_usage["total_latency"], 4)
+            total.max_latency = max(total.max_latency, agent_usage["max_latency"])
+            rollup["agents"][agent] = total.model_dump(exclude={"p50_latency"})
+
+    async def add(self, usage: Dict[str, Any]):
+        """Add the usage of a date, before its usage file is saved so a first rollup does not count it twice."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            rollup = await self._load()
+            self._merge(rollup, usage)
+            await self.storage_manager.save_date_usage(rollup)
+
+    async def report(self) -> Dict[str, Any]:
+        return await self._load()
+
+
+class TelemetryClient(DelegatingChatCompletionClient):
+    """Records the usage and latency of every call of one agent to a `UsageRecorder`."""
+
+    def __init__(self, client: ChatCompletionClient, agent: str, recorder: UsageRecorder, model: str = "unknown"):
+        super().__init__(client)
+        self.agent = agent
+        self.recorder = recorder
+        self.model = model
+
+    def _record_call(self, started: float, started_at: float, result: Optional[CreateResult] = None, error: Optional[Exception] = None):
+        self.recorder.record(LLMCallRecord(
+            agent=self.agent,
+            model=self.model,
+            prompt_tokens=result.usage.prompt_tokens if result else 0,
+            completion_tokens=result.usage.completion_tokens if result else 0,
+            latency=time.perf_counter() - started,
+            started_at=round(started_at, 4),
+            error=f"{type(error).__name__}: {error}" if error else None,
+        ))
+
+    async def _create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        started, started_at = time.perf_counter(), self.recorder.elapsed()
+        try:
+            result = await self._client.create(messages, **kwargs)
+        except Exception as e:
+            self._record_call(started, started_at, error=e)
+            raise
+        self._record_call(started, started_at, result)
+        return result
+
+    async def _create_stream(self, messages: Sequence[LLMMessage], **kwargs: Any) -> AsyncGenerator[Union[str, CreateResult], None]:
+        started, started_at = time.perf_counter(), self.recorder.elapsed()
+        try:
+            async for chunk in self._client.create_stream(messages, **kwargs):
+                if isinstance(chunk, CreateResult):
+                    self._record_call(started, started_at, chunk)
+                yield chunk
+        except Exception as e:
+            self._record_call(started, started_at, error=e)
+            raise
+
+
+class DateTaskResult(TaskResult):
+    """The result of a date simulation with the model usage of the date."""
+    telemetry: Optional[UsageReport] = None
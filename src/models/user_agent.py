@@ -26,6 +26,12 @@ class UserAgentWithWallet(AgentWithWallet):
             **kwargs
         )
     
+    @classmethod
+    def resolve_agent_id(cls, name: str, system_message: str, agent_id=None, user_id: int | None = None, **kwargs) -> uuid.UUID:
+        if user_id is None:
+            return super().resolve_agent_id(name, system_message, agent_id)
+        return cls.get_user_agent_id(user_id)
+
     @staticmethod
     def get_user_agent_id(user_id: int) -> uuid.UUID:
         hash_value = hashlib.md5(str(user_id).encode()).hexdigest()
@@ -35,18 +41,21 @@ class UserAgentWithWallet(AgentWithWallet):
     def get_user_agent_path(user_id: int) -> pathlib.Path:
         return pathlib.Path(f"agents/users/{user_id}.json")
 
+    def _agent_storage_key(self):
+        return self.user_id
+
     async def save_agent_data(self):
         """Save agent data using storage manager"""
         await self.storage_manager.save_user_agent(self.user_id, self.agent_data.model_dump())
 
     @classmethod
-    async def load_or_create(cls, user: SimpleUser):
+    async def load_or_create(cls, user: SimpleUser, **kwargs):
         storage_manager = StorageManager()
         agent_data = await storage_manager.load_user_agent(user.id)
         
         if agent_data:
             agent = Agent.model_validate(agent_data)
-            return await cls.from_agent(agent, user_id=user.id)
+            return await cls.from_agent(agent, user_id=user.id, **kwargs)
 
         user_agent = Agent(
             id=cls.get_user_agent_id(user.id),
@@ -56,4 +65,4 @@ class UserAgentWithWallet(AgentWithWallet):
             role=AgentRole.USER,
         )
         await storage_manager.save_user_agent(user.id, user_agent.model_dump(mode='json'))
-        return await cls.from_agent(user_agent, user_id=user.id)
+        return await cls.from_agent(user_agent, user_id=user.id, **kwargs)
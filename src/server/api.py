@@ -3,7 +3,17 @@ from pydantic import BaseModel
 import uvicorn
 
 from src.agents.date_manager import DateManager
+from src.models.client_registry import ModelClientRegistry
 from src.models.model import SimpleUser
+from src.models.telemetry import DateUsageStats, ProcessUsageStats
+from src.tools.starknet_rpc import close_rpc_clients, rpc_stats
+from src.server.wallet_store import WalletSessionCache
+from src.tools.balance_cache import BalanceCache
+from src.tools.starknet_accounts import StarknetAccountPool
+from src.tools.tool_executor import ToolExecutor
+from src.tools.mint_queue import MintQueue
+from src.tools.starknet_nonce import NonceManager
+from src.tools.starknet_tx import TransactionTracker
 from src.server.token_registry import TokenRegistry, NFTMetadata
 
 app = FastAPI(title="Date Manager API")
@@ -26,6 +36,16 @@ class AutonomeResponse(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the shared model clients and the Starknet RPC sessions."""
+    await ModelClientRegistry().close()
+    await MintQueue().close()
+    await TransactionTracker().close()
+    await ToolExecutor().close()
+    await StarknetAccountPool().close()
+    await close_rpc_clients()
+
 @app.get("/token/{token_id}", response_model=NFTMetadata)
 async def get_token_metadata(token_id: int):
     """Get metadata for a specific token ID."""
@@ -39,6 +59,23 @@ async def list_tokens():
     """List all tokens and their metadata."""
     return {"tokens": token_registry.registry}
 
+@app.get("/metrics")
+async def metrics():
+    """Model usage and latency by agent, of this process and of all stored dates."""
+    return {
+        "process": ProcessUsageStats().report(),
+        "models": ModelClientRegistry().stats(),
+        "starknet_rpc": rpc_stats(),
+        "starknet_transactions": TransactionTracker().metrics(),
+        "starknet_nonces": NonceManager().metrics(),
+        "mints": MintQueue().metrics(),
+        "wallet_sessions": WalletSessionCache().metrics(),
+        "balances": BalanceCache().metrics(),
+        "tools": ToolExecutor().metrics(),
+        "starknet_account_pool": StarknetAccountPool().metrics(),
+        "dates": await DateUsageStats().report(),
+    }
+
 @app.post("/chat", response_model=AutonomeResponse)
 async def chat(request: AutonomeRequest):
     try:
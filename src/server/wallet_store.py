@@ -1,26 +1,108 @@
 import asyncio
-from typing import Optional
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
 from cdp.wallet import Wallet, WalletData
 from src.storage.manager import StorageManager
 from src.config import Config
-import nest_asyncio
+
+
+class WalletSessionCache:
+    """Process-wide LRU cache of hydrated wallets by agent ID.
+
+    Hydrating a CDP wallet calls the CDP API, so the wallet and its tools are kept for the agents of
+    characters and users that take part in many dates. Saving or deleting the wallet of an agent
+    through the `WalletStore` drops its cached session.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(WalletSessionCache, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.max_size = Config.WALLET_SESSION_CACHE_SIZE
+        self.stats = Counter()
+        self._initialized = True
+
+    def get(self, agent_id: str) -> Optional[Any]:
+        session = self._sessions.get(agent_id)
+        if session is not None:
+            self._sessions.move_to_end(agent_id)
+        return session
+
+    def put(self, agent_id: str, session: Any):
+        self._sessions[agent_id] = session
+        self._sessions.move_to_end(agent_id)
+        while len(self._sessions) > self.max_size:
+            self._sessions.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    async def get_or_load(self, agent_id: str, load: Callable[[], Awaitable[Any]], cache: Callable[[Any], bool] = lambda session: True) -> Any:
+        """Return the cached session or load it, concurrent loads of the same agent share one load.
+
+        Loaded sessions are only cached if `cache` returns true for them.
+        """
+        session = self.get(agent_id)
+        if session is not None:
+            self.stats["hits"] += 1
+            return session
+        if agent_id in self._loading:
+            self.stats["shared_loads"] += 1
+            return await asyncio.shield(self._loading[agent_id])
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[agent_id] = future
+        try:
+            session = await load()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # the error is raised here, the waiters retrieve it from the future
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._loading.pop(agent_id, None)
+        if cache(session):
+            self.put(agent_id, session)
+        future.set_result(session)
+        return session
+
+    def invalidate(self, agent_id: str):
+        if self._sessions.pop(agent_id, None) is not None:
+            self.stats["invalidated"] += 1
+
+    def clear(self):
+        self._sessions.clear()
+
+    def metrics(self) -> dict:
+        return {**self.stats, "size": len(self._sessions)}
 
 
 class WalletStore:
     def __init__(self):
         """Initialize wallet store using storage manager"""
         self.storage_manager = StorageManager()
-        # Allow nested event loops for sync operations
-        try:
-            nest_asyncio.apply()
-        except:
-            pass
     
     async def save_wallet(self, agent_id: str, wallet: Wallet) -> None:
         """Save a wallet for an agent"""
         wallet_data = wallet.export_data().to_dict()
         path = Config.get_wallet_path(agent_id)
         await self.storage_manager.storage.write_json(path, wallet_data)
+        WalletSessionCache().invalidate(agent_id)
+    
+    async def save_wallet_data(self, agent_id: str, wallet_data: WalletData) -> None:
+        """Save the exported data of a wallet for an agent"""
+        path = Config.get_wallet_path(agent_id)
+        await self.storage_manager.storage.write_json(path, wallet_data.to_dict())
+        WalletSessionCache().invalidate(agent_id)
     
     async def load_wallet(self, agent_id: str) -> Optional[WalletData]:
         """Load a wallet for an agent if it exists"""
@@ -32,19 +114,19 @@ class WalletStore:
         return None
     
     def load_wallet_sync(self, agent_id: str) -> Optional[WalletData]:
-        """Synchronous version of load_wallet that handles nested event loops"""
+        """Synchronous version of load_wallet, for use outside of an event loop"""
         try:
-            loop = asyncio.get_event_loop()
+            asyncio.get_running_loop()
         except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        return loop.run_until_complete(self.load_wallet(agent_id))
+            return asyncio.run(self.load_wallet(agent_id))
+        raise RuntimeError("load_wallet_sync would block the running event loop, use load_wallet or AgentWithWallet.create")
     
     async def delete_wallet(self, agent_id: str) -> None:
         """Delete a wallet for an agent"""
         path = Config.get_wallet_path(agent_id)
         if await self.storage_manager.storage.exists(path):
             await self.storage_manager.storage.delete(path)
+        WalletSessionCache().invalidate(agent_id)
     
     async def list_wallets(self) -> list[str]:
         """List all wallet agent IDs"""
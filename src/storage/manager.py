@@ -64,6 +64,29 @@ class StorageManager:
             return await self.storage.read_text(path)
         return None
     
+    async def save_conversation_usage(self, conversation_id: int, participants: List[str], usage: Dict[str, Any]) -> None:
+        """Save the model usage of a conversation to storage"""
+        path = Config.get_conversation_usage_path(conversation_id, participants)
+        await self.storage.write_json(path, usage)
+    
+    async def load_conversation_usages(self) -> List[Dict[str, Any]]:
+        """Load the model usage of all stored conversations"""
+        usages = []
+        for name in await self.storage.list_dir(Config.CONVERSATIONS_PATH):
+            if name.endswith(".usage.json"):
+                usages.append(await self.storage.read_json(f"{Config.CONVERSATIONS_PATH}/{name}"))
+        return usages
+    
+    async def save_date_usage(self, usage: Dict[str, Any]) -> None:
+        """Save the rolled-up model usage of all dates to storage"""
+        await self.storage.write_json(Config.DATE_USAGE_PATH, usage)
+    
+    async def load_date_usage(self) -> Optional[Dict[str, Any]]:
+        """Load the rolled-up model usage of all dates from storage"""
+        if await self.storage.exists(Config.DATE_USAGE_PATH):
+            return await self.storage.read_json(Config.DATE_USAGE_PATH)
+        return None
+    
     async def load_prompt(self, prompt_name: str) -> Optional[str]:
         """Load prompt template from storage"""
         path = Config.get_prompt_path(prompt_name)
@@ -79,4 +102,34 @@ class StorageManager:
         """Load token registry from storage"""
         if await self.storage.exists(Config.TOKEN_REGISTRY_PATH):
             return await self.storage.read_json(Config.TOKEN_REGISTRY_PATH)
-        return None 
\ No newline at end of file
+        return None 
+    
+    async def save_token_metadata(self, metadata: Dict[str, Any]) -> None:
+        """Save the metadata of fetched ERC20 tokens to storage"""
+        await self.storage.write_json(Config.TOKEN_METADATA_PATH, metadata)
+    
+    async def load_token_metadata(self) -> Optional[Dict[str, Any]]:
+        """Load the metadata of fetched ERC20 tokens from storage"""
+        if await self.storage.exists(Config.TOKEN_METADATA_PATH):
+            return await self.storage.read_json(Config.TOKEN_METADATA_PATH)
+        return None
+    
+    async def save_mint_queue(self, queue_data: Dict[str, Any]) -> None:
+        """Save the NFT mint queue to storage"""
+        await self.storage.write_json(Config.MINT_QUEUE_PATH, queue_data)
+    
+    async def load_mint_queue(self) -> Optional[Dict[str, Any]]:
+        """Load the NFT mint queue from storage"""
+        if await self.storage.exists(Config.MINT_QUEUE_PATH):
+            return await self.storage.read_json(Config.MINT_QUEUE_PATH)
+        return None
+    
+    async def save_starknet_account_pool(self, pool_data: Dict[str, Any]) -> None:
+        """Save the pool of provisioned Starknet accounts to storage"""
+        await self.storage.write_json(Config.STARKNET_ACCOUNT_POOL_PATH, pool_data)
+    
+    async def load_starknet_account_pool(self) -> Optional[Dict[str, Any]]:
+        """Load the pool of provisioned Starknet accounts from storage"""
+        if await self.storage.exists(Config.STARKNET_ACCOUNT_POOL_PATH):
+            return await self.storage.read_json(Config.STARKNET_ACCOUNT_POOL_PATH)
+        return None
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from src.config import Config
+
+Address = Union[int, str]
+
+
+def _normalize(value: Address) -> str:
+    """Same key for an address or asset given as int, padded or unpadded hex string"""
+    if isinstance(value, int):
+        return f"0x{value:064x}"
+    try:
+        return f"0x{int(value, 16):064x}"
+    except ValueError:
+        return value.lower()
+
+
+class BalanceCache:
+    """Process-wide cache of wallet balances by address and asset, entries expire after `BALANCE_CACHE_TTL` seconds.
+
+    Transfers and mints through our tools invalidate the balances they change, so the TTL only
+    bounds the staleness for transfers made elsewhere. Concurrent reads of the same balance share one fetch.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(BalanceCache, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.ttl = Config.BALANCE_CACHE_TTL
+        self.max_entries = Config.BALANCE_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._fetching: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats = Counter()
+        self._initialized = True
+
+    def get(self, address: Address, asset: Address) -> Optional[Any]:
+        key = (_normalize(address), _normalize(asset))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, balance = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return balance
+
+    def set(self, address: Address, asset: Address, balance: Any):
+        key = (_normalize(address), _normalize(asset))
+        self._entries[key] = (time.monotonic() + self.ttl, balance)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, address: Address, asset: Address, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl <= 0:
+            return await fetch()
+        balance = self.get(address, asset)
+        if balance is not None:
+            self.stats["hits"] += 1
+            return balance
+        key = (_normalize(address), _normalize(asset))
+        if key in self._fetching:
+            self.stats["hits"] += 1
+            return await asyncio.shield(self._fetching[key])
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._fetching[key] = future
+        try:
+            balance = await fetch()
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._fetching.pop(key, None)
+        self.set(address, asset, balance)
+        future.set_result(balance)
+        return balance
+
+    def invalidate(self, address: Address, asset: Optional[Address] = None):
+        """Drop the balance of the asset, or of all assets of the address."""
+        address = _normalize(address)
+        if asset is not None:
+            keys = [(address, _normalize(asset))]
+        else:
+            keys = [key for key in self._entries if key[0] == address]
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self.stats["invalidated"] += 1
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import pathlib
+import time
+from typing import Dict, List, Optional, Tuple
+
+import dotenv
+from autogen_agentchat.messages import TextMessage
+
+from src.models.client_registry import ModelClientRegistry
+from src.models.llm_client import ConcurrencyLimitedClient
+from src.models.model import Agent
+from src.tools.date_simulator import DateSimulator, get_organizer_wallet_address, load_participant_catalog
+from src.tools.date_termination import get_termination_stats
+from src.tools.participant_pool import ParticipantPool
+
+dotenv.load_dotenv()
+
+
+def parse_pairs(pairs: str, catalog: Dict[str, Agent]) -> List[Tuple[str, str]]:
+    """Parse pairs given as "Tesla:Eliza,Trump:Bruce"."""
+    parsed = []
+    for pair in pairs.split(","):
+        names = [name.strip() for name in pair.split(":")]
+        if len(names) != 2:
+            raise ValueError(f"Invalid pair {pair!r}, expected the format 'NameA:NameB'")
+        for name in names:
+            if name not in catalog:
+                raise ValueError(f"Unknown participant {name!r}, available: {', '.join(catalog)}")
+        if names[0] == names[1]:
+            raise ValueError(f"Invalid pair {pair!r}, a participant can not date themselves")
+        parsed.append((names[0], names[1]))
+    return parsed
+
+
+class BatchDateRunner:
+    """Runs many date simulations concurrently and streams the results to a JSONL file.
+
+    `max_llm_calls` bounds the number of in-flight model calls across all dates,
+    `max_dates` bounds the number of dates that are running at the same time.
+    """
+
+    def __init__(self, catalog: Dict[str, Agent], output_path: pathlib.Path, model_name: str = "gpt-4o-mini",
+                 max_messages: Optional[int] = None, max_llm_calls: int = 8, max_dates: Optional[int] = None,
+                 include_transcript: bool = False):
+        self.catalog = catalog
+        self.output_path = output_path
+        self.model_name = model_name
+        self.max_messages = max_messages
+        self.include_transcript = include_transcript
+        self.llm_semaphore = asyncio.Semaphore(max_llm_calls)
+        self.date_semaphore = asyncio.Semaphore(max_dates or max_llm_calls)
+        self.model_client = ModelClientRegistry().get_client(model_name)
+        self.organizer_wallet: Optional[str] = None
+
+    async def run_date(self, date_id: int, pair: Tuple[str, str], repetition: int) -> dict:
+        """Run a single date and return its result record."""
+        async with self.date_semaphore:
+            # one wrapper per date, so the usage of this date is counted separately
+            model_client = ConcurrencyLimitedClient(self.model_client, self.llm_semaphore)
+            record = {"date_id": date_id, "pair": list(pair), "repetition": repetition}
+            started = time.perf_counter()
+            simulator = DateSimulator(model_name=self.model_name, max_messages=self.max_messages, model_client=model_client)
+            try:
+                for name in pair:
+                    await simulator.add_participant_from_agent(self.catalog[name])
+                simulator.set_date_organizer(wallet_address=self.organizer_wallet)
+                result = await simulator.simulate_date()
+                simulated = time.perf_counter()
+                summary = await simulator.summarize_date(result)
+                record.update({
+                    "status": "ok",
+                    "simulate_s": round(simulated - started, 3),
+                    "summary_s": round(time.perf_counter() - simulated, 3),
+                    "num_messages": len([msg for msg in result.messages if isinstance(msg, TextMessage)]),
+                    "stop_reason": result.stop_reason,
+                    "terminated_by": simulator.last_termination_reason,
+                    "summary": summary,
+                    "usage_by_agent": simulator.telemetry.report(include_calls=False).model_dump(mode="json")["agents"],
+                })
+                if self.include_transcript:
+                    record["transcript"] = simulator._format_conversation_history_with_tool_calls(result.messages)
+            except Exception as e:
+                logging.error(f"Date {date_id} between {pair[0]} and {pair[1]} failed: {e}", exc_info=True)
+                record.update({"status": "error", "error": str(e)})
+            finally:
+                await simulator.release_participants()
+            usage = model_client.total_usage()
+            record.update({
+                "latency_s": round(time.perf_counter() - started, 3),
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+            })
+            return record
+
+    async def run(self, pairs: List[Tuple[str, str]], repetitions: int = 1) -> int:
+        """Run all dates and return the number of failed dates."""
+        self.organizer_wallet = await get_organizer_wallet_address(self.model_client)
+        # build one agent per character up front, concurrent dates of a character build more on demand
+        await ParticipantPool().warm({name: self.catalog[name] for pair in pairs for name in pair}.values(), model_client=self.model_client)
+        jobs = [(pair, repetition) for repetition in range(repetitions) for pair in pairs]
+        tasks = [asyncio.create_task(self.run_date(date_id, pair, repetition)) for date_id, (pair, repetition) in enumerate(jobs)]
+        failed = 0
+        with open(self.output_path, "a", encoding="utf-8") as output:
+            for completed, task in enumerate(asyncio.as_completed(tasks), 1):
+                record = await task
+                failed += record["status"] != "ok"
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                logging.info(f"[{completed}/{len(tasks)}] {' & '.join(record['pair'])}: {record['status']} in {record['latency_s']}s")
+        return failed
+
+
+async def main(args: argparse.Namespace):
+    catalog = load_participant_catalog()
+    if args.all_pairs:
+        pairs = list(itertools.combinations(sorted(catalog), 2))
+    elif args.pairs:
+        pairs = parse_pairs(args.pairs, catalog)
+    else:
+        raise ValueError("Either --pairs or --all-pairs is required")
+    runner = BatchDateRunner(
+        catalog=catalog,
+        output_path=pathlib.Path(args.output),
+        model_name=args.model,
+        max_messages=args.max_messages,
+        max_llm_calls=args.max_llm_calls,
+        max_dates=args.max_dates,
+        include_transcript=args.include_transcript,
+    )
+    try:
+        failed = await runner.run(pairs, args.repetitions)
+    finally:
+        await ModelClientRegistry().close()
+    print(f"Finished {len(pairs) * args.repetitions} dates, {failed} failed, results in {args.output}")
+    print(f"Dates ended by: {json.dumps(get_termination_stats())}")
+
+if __name__ == "__main__":
+    # run like this:
+    # python -m src.tools.batch_simulator --all-pairs --repetitions 5 --max-llm-calls 16 --output dates.jsonl
+    # python -m src.tools.batch_simulator --pairs "Tesla:Eliza,Trump:Bruce" --repetitions 3
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--pairs", type=str, help="Comma separated pairs, e.g. 'Tesla:Eliza,Trump:Bruce'")
+    parser.add_argument("-a", "--all-pairs", action="store_true", help="Run all pairs of characters in the catalog")
+    parser.add_argument("-r", "--repetitions", type=int, default=1)
+    parser.add_argument("-c", "--max-llm-calls", type=int, default=8, help="Maximum number of in-flight model calls")
+    parser.add_argument("-d", "--max-dates", type=int, default=None, help="Maximum number of concurrent dates (defaults to --max-llm-calls)")
+    parser.add_argument("-m", "--max-messages", type=int, default=None, help="Defaults to DATE_MAX_MESSAGES")
+    parser.add_argument("-o", "--output", type=str, default="dates.jsonl")
+    parser.add_argument("--model", type=str, default="gpt-4o-mini")
+    parser.add_argument("--include-transcript", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
-import asyncio
 import inspect
-from typing import TYPE_CHECKING, Any, Callable, Dict, Type, cast
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Type, cast
 
 from autogen_core import CancellationToken
 from autogen_core.tools import BaseTool
 from pydantic import BaseModel, Field, create_model
 
+from src.config import Config
+from src.tools.tool_executor import ToolExecutor
+
+# CDP tools that only read, a call that timed out can be repeated. The others move funds or deploy
+# contracts, they go through on-chain even if we stop waiting, so they never get a timeout
+IDEMPOTENT_TOOLS = frozenset({
+    "address_reputation", "get_balance", "get_balance_nft", "get_wallet_details",
+    "pyth_fetch_price", "pyth_fetch_price_feed_id",
+})
+
 if TYPE_CHECKING:
     from langchain_core.tools import BaseTool as LangChainTool
 
@@ -22,6 +31,9 @@ class CDPLangChainToolAdapter(BaseTool[BaseModel, Any]):
 
     Args:
         langchain_tool (LangChainTool): A LangChain tool to wrap
+        timeout (float, optional): Seconds a call may run, defaults to the `TOOL_TIMEOUTS` entry of
+            the tool or `TOOL_TIMEOUT` for the tools in `IDEMPOTENT_TOOLS` and to no timeout for the
+            others. Synchronous tools run on the `ToolExecutor` pool.
 
     Examples:
 
@@ -62,12 +74,15 @@ class CDPLangChainToolAdapter(BaseTool[BaseModel, Any]):
 
     """
 
-    def __init__(self, langchain_tool: LangChainTool):
+    def __init__(self, langchain_tool: LangChainTool, timeout: Optional[float] = None):
         self._langchain_tool: LangChainTool = langchain_tool
 
         # Extract name and description
         name = self._langchain_tool.name
         description = self._langchain_tool.description or ""
+        if timeout is None and name in IDEMPOTENT_TOOLS:
+            timeout = Config.TOOL_TIMEOUTS.get(name, Config.TOOL_TIMEOUT)
+        self.timeout = timeout
 
         # Determine the callable method
         if hasattr(self._langchain_tool, "_run") and callable(self._langchain_tool._run):  # type: ignore
@@ -111,8 +126,10 @@ class CDPLangChainToolAdapter(BaseTool[BaseModel, Any]):
         if inspect.iscoroutinefunction(self._callable):
             result = await self._callable(**kwargs)
         else:
-            # Run in a thread to avoid blocking the event loop
-            result = await asyncio.to_thread(self._call_sync, kwargs)
+            # Run on the tool pool to avoid blocking the event loop and the default executor
+            result = await ToolExecutor().run(
+                self.name, self._call_sync, kwargs, timeout=self.timeout, cancellation_token=cancellation_token
+            )
 
         return result
 
@@ -0,0 +1,72 @@
+import enum
+from typing import Optional, Union
+
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, ToolCallExecutionEvent, ToolCallRequestEvent
+from pydantic import BaseModel, ConfigDict
+
+
+class DateEventKind(str, enum.Enum):
+    MESSAGE = "message"
+    TOOL_CALL = "tool_call"
+    TOOL_RESULT = "tool_result"
+    OTHER = "other"
+
+
+class DateTurnEvent(BaseModel):
+    """A single message or event of a running date, emitted as soon as it happens."""
+    index: int
+    source: str
+    kind: DateEventKind
+    content: str
+    # seconds since the start of the date
+    elapsed: float
+    # seconds since the previous event, i.e. how long this turn took
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @classmethod
+    def from_message(cls, message: Union[BaseAgentEvent, BaseChatMessage], index: int, elapsed: float, latency: float) -> "DateTurnEvent":
+        if isinstance(message, ToolCallRequestEvent):
+            kind = DateEventKind.TOOL_CALL
+            content = ", ".join(f"{call.name}({call.arguments})" for call in message.content)
+        elif isinstance(message, ToolCallExecutionEvent):
+            kind = DateEventKind.TOOL_RESULT
+            content = "; ".join(result.content for result in message.content)
+        else:
+            kind = DateEventKind.MESSAGE if isinstance(message, BaseChatMessage) else DateEventKind.OTHER
+            content = message.to_text()
+        usage = message.models_usage
+        return cls(
+            index=index,
+            source=message.source,
+            kind=kind,
+            content=content,
+            elapsed=elapsed,
+            latency=latency,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+        )
+
+    def render(self) -> str:
+        """Render the event for the console."""
+        return f"{'-' * 10} {self.kind.value} ({self.source}, {self.latency:.2f}s) {'-' * 10}\n{self.content}"
+
+
+class DateFinishedEvent(BaseModel):
+    """The last event of a date, carries the full result."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    result: TaskResult
+    stop_reason: Optional[str] = None
+    # which termination conditions ended the date, e.g. "organizer_ended"
+    terminated_by: Optional[str] = None
+    duration: float
+    num_events: int
+
+    def render(self) -> str:
+        return f"{'-' * 10} date finished after {self.duration:.2f}s ({self.terminated_by}): {self.stop_reason} {'-' * 10}"
+
+
+DateEvent = Union[DateTurnEvent, DateFinishedEvent]
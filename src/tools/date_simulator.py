@@ -1,5 +1,6 @@
-from typing import Optional, List, Dict
-import os
+from typing import AsyncGenerator, Awaitable, Callable, Optional, List, Dict, Tuple
+import inspect
+import logging
 import dotenv
 import pathlib
 import argparse
@@ -8,63 +9,102 @@ import asyncio
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.teams import SelectorGroupChat
 from autogen_agentchat.base import TaskResult
-from autogen_agentchat.conditions import MaxMessageTermination
-from autogen_agentchat.ui import Console
 from autogen_agentchat.messages import TextMessage, AgentEvent, ToolCallRequestEvent, ToolCallExecutionEvent
 from autogen_core import CancellationToken
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from autogen_core.model_context import ChatCompletionContext, HeadAndTailChatCompletionContext
+from autogen_core.models import ChatCompletionClient
 
+from src.config import Config
 from src.models.agent_with_wallet import AgentWithWallet
-from src.models.model import Agent
+from src.models.client_registry import ModelClientRegistry
+from src.models.context import ContextPolicy, create_model_context
+from src.models.model import Agent, AgentRole
 from src.storage.manager import StorageManager
+from src.tools.date_events import DateEvent, DateFinishedEvent, DateTurnEvent
+from src.tools.date_termination import DateTerminationPolicy, record_termination
+from src.tools.participant_pool import ParticipantPool
+from src.models.telemetry import DateTaskResult, DateUsageStats, TelemetryClient, UsageRecorder
 import time
 
 dotenv.load_dotenv()
 
 class DateSimulator:
 
-    def __init__(self, model_name: str = "gpt-4o-mini", max_messages: int = 10):
+    def __init__(self, model_name: str = "gpt-4o-mini", max_messages: Optional[int] = None, model_client: Optional[ChatCompletionClient] = None,
+                 termination_policy: Optional[DateTerminationPolicy] = None, selector_history_window: Optional[int] = None):
         self.model_name = model_name
-        self.max_messages = max_messages
+        # number of latest messages the speaker selector sees besides the scene, 0 for the full history
+        self.selector_history_window = Config.SELECTOR_HISTORY_WINDOW if selector_history_window is None else selector_history_window
+        self.termination_policy = termination_policy or DateTerminationPolicy.from_config(max_messages=max_messages)
+        self.max_messages = self.termination_policy.max_messages
+        # which termination conditions ended the last date, e.g. "organizer_ended"
+        self.last_termination_reason: Optional[str] = None
         self.participants: Dict[str, AssistantAgent] = {}
         self.date_organizer: Optional[AssistantAgent] = None
         self.summary_agent: Optional[AssistantAgent] = None
-        self.model_client: Optional[OpenAIChatCompletionClient] = None
+        self.model_client: Optional[ChatCompletionClient] = model_client
         self.scene_instruction: str = "Date Organizer, please set the scene and start the date."
         self.is_running: bool = False
         self.storage = StorageManager()
+        self._pooled_participants: List[AgentWithWallet] = []
+        # caller-owned participants and the clients to give back to them after the date
+        self._borrowed_participants: List[Tuple[AgentWithWallet, ChatCompletionClient]] = []
+        # model usage of every agent of the date
+        self.telemetry = UsageRecorder()
 
     def initialize_model_client(self):
-        """Initialize the OpenAI model client."""
-        self.model_client = OpenAIChatCompletionClient(
-            model=self.model_name,
-            api_key=os.environ.get("OPENAI_API_KEY"),
-        )
+        """Initialize the model client from the shared client registry."""
+        self.model_client = ModelClientRegistry().get_client(self.model_name)
+        
+    def _client_for(self, agent_name: str) -> ChatCompletionClient:
+        """Get a client for an agent of the date that records its calls to the date telemetry."""
+        return TelemetryClient(self.model_client, agent_name, self.telemetry, model=self.model_name)
     
     async def add_participant_from_agent(self, agent: Agent) -> AgentWithWallet:
         """Add a new participant to the date simulation."""
         if not self.model_client:
             raise RuntimeError("Model client not initialized. Call initialize_model_client() first.")
         
-        self.participants[agent.name] = await AgentWithWallet.from_agent(agent, model_client=self.model_client)
-        await self.participants[agent.name].initialize()
-        return self.participants[agent.name]
+        # character agents come from the pool, return them with release_participants() after the date
+        participant = await ParticipantPool().acquire(agent, self._client_for(agent.name))
+        self.participants[agent.name] = participant
+        self._pooled_participants.append(participant)
+        return participant
     
     async def add_participant(self, name: str, system_message: str) -> AgentWithWallet:
         """Add a new participant to the date simulation."""
         if not self.model_client:
             raise RuntimeError("Model client not initialized. Call initialize_model_client() first.")
             
-        agent = AgentWithWallet(
+        model_client = self._client_for(name)
+        agent = await AgentWithWallet.create(
             name=name,
             system_message=system_message,
-            model_client=self.model_client,
+            model_client=model_client,
+            model_context=create_model_context(ContextPolicy.for_participant(), model_client),
             reflect_on_tool_use=True
         )
         self.participants[name] = agent
-        await agent.initialize()
         return agent
         
+    def add_existing_participant(self, agent: AgentWithWallet):
+        """Add an agent that is owned by the caller, e.g. the avatar of the user.
+
+        The agent is bound to the date telemetry until `release_participants` gives it its own client back.
+        """
+        previous = agent.swap_model_client(self._client_for(agent.name))
+        self._borrowed_participants.append((agent, previous))
+        self.participants[agent.name] = agent
+        
+    async def release_participants(self):
+        """Return the participants taken from the participant pool and unbind the caller-owned ones from the date."""
+        while self._borrowed_participants:
+            agent, previous = self._borrowed_participants.pop()
+            agent.swap_model_client(previous)
+        pool = ParticipantPool()
+        while self._pooled_participants:
+            await pool.release(self._pooled_participants.pop())
+        
     def set_date_organizer(self, system_message: Optional[str] = None, wallet_address: Optional[str] = None):
         """Configure the date organizer with optional custom system message."""
         if not self.model_client:
@@ -75,8 +115,12 @@ class DateSimulator:
             system_message = pathlib.Path("prompts/date_organizer.txt").read_text()
         self.date_organizer = AssistantAgent(
             name="DateOrganizer",
-            system_message=system_message.format(participants=', '.join(self.participants.keys()), wallet_address=wallet_address),
-            model_client=self.model_client,
+            system_message=system_message.format(
+                participants=', '.join(self.participants.keys()),
+                wallet_address=wallet_address,
+                end_phrase=self.termination_policy.end_phrase or "",
+            ),
+            model_client=self._client_for("DateOrganizer"),
         )
         
     def set_summarizer(self, system_message: Optional[str] = None):
@@ -90,7 +134,7 @@ class DateSimulator:
         self.summary_agent = AssistantAgent(
             name="DateSummarizer",
             system_message=system_message,
-            model_client=self.model_client,
+            model_client=self._client_for("DateSummarizer"),
         )
         
     def set_scene(self, scene_instruction: str):
@@ -101,6 +145,13 @@ class DateSimulator:
         """Create the selector prompt for the group chat."""
         return pathlib.Path("prompts/speaker_selector.txt").read_text()
         
+    def _create_selector_context(self) -> Optional[ChatCompletionContext]:
+        """Create the history the speaker selector sees: the task and the scene set by the organizer,
+        followed by the latest messages. Without a window the selector sees the full history."""
+        if not self.selector_history_window:
+            return None
+        return HeadAndTailChatCompletionContext(head_size=Config.SELECTOR_HISTORY_HEAD, tail_size=self.selector_history_window)
+        
     def _format_conversation_history(self, messages: List[TextMessage|AgentEvent]) -> str:
         """Format the conversation history for summary."""
         return "\n\n".join([f"*{msg.source}*: {msg.content}" for msg in messages if isinstance(msg, TextMessage)])
@@ -116,8 +167,9 @@ class DateSimulator:
                     output.append(f"**{msg.source}** used a tool: {tool_call.content}")
         return "\n\n".join(output)
         
-    async def simulate_date(self, scene_instruction: Optional[str] = None) -> TaskResult:
-        """Run the date simulation."""
+    async def stream_date(self, scene_instruction: Optional[str] = None) -> AsyncGenerator[DateEvent, None]:
+        """Run the date simulation and yield a typed event for every message as it happens.
+        The last event is a `DateFinishedEvent` carrying the `TaskResult`."""
         if not self.model_client:
             raise RuntimeError("Model client not initialized. Call initialize_model_client() first.")
         if not self.date_organizer:
@@ -129,16 +181,58 @@ class DateSimulator:
         all_participants = [self.date_organizer] + list(self.participants.values())
         
         # Create and run the group chat
+        termination_condition, conditions = self.termination_policy.build(organizer_name=self.date_organizer.name)
         date_conversation = SelectorGroupChat(
             participants=all_participants,
-            model_client=self.model_client,
+            model_client=self._client_for("SpeakerSelector"),
             selector_prompt=self._create_selector_prompt(),
-            termination_condition=MaxMessageTermination(self.max_messages)
+            termination_condition=termination_condition,
+            model_context=self._create_selector_context(),
         )
         self.is_running = True
-        stream = date_conversation.run_stream(task=scene_instruction or self.scene_instruction)
-        result = await Console(stream)
-        self.is_running = False
+        started = last_event = time.perf_counter()
+        index = 0
+        try:
+            async for message in date_conversation.run_stream(task=scene_instruction or self.scene_instruction):
+                now = time.perf_counter()
+                if isinstance(message, TaskResult):
+                    message = DateTaskResult(messages=message.messages, stop_reason=message.stop_reason, telemetry=self.telemetry.report())
+                    self.last_termination_reason = record_termination(conditions)
+                    logging.info(f"Date ended after {index} messages by {self.last_termination_reason}: {message.stop_reason}")
+                    yield DateFinishedEvent(
+                        result=message,
+                        stop_reason=message.stop_reason,
+                        terminated_by=self.last_termination_reason,
+                        duration=now - started,
+                        num_events=index,
+                    )
+                    continue
+                yield DateTurnEvent.from_message(message, index=index, elapsed=now - started, latency=now - last_event)
+                index += 1
+                last_event = now
+        finally:
+            self.is_running = False
+        
+    async def simulate_date(self, scene_instruction: Optional[str] = None, on_event: Optional[Callable[[DateEvent], Awaitable[None] | None]] = None, console: bool = False) -> TaskResult:
+        """Run the date simulation.
+        
+        Args:
+            scene_instruction: Optional instruction for the date organizer.
+            on_event: Optional callback, called with every event of the date as it happens.
+            console: Render the events to stdout, for the CLI.
+        """
+        result: Optional[TaskResult] = None
+        async for event in self.stream_date(scene_instruction):
+            if console:
+                print(event.render(), flush=True)
+            if on_event is not None:
+                callback_result = on_event(event)
+                if inspect.isawaitable(callback_result):
+                    await callback_result
+            if isinstance(event, DateFinishedEvent):
+                result = event.result
+        if result is None:
+            raise RuntimeError("Date simulation ended without a result")
         return result
         
     async def summarize_date(self, conversation_result: TaskResult):
@@ -147,7 +241,7 @@ class DateSimulator:
         summarizer = AssistantAgent(
             name="DateSummarizer",
             system_message=pathlib.Path("prompts/date_summarizer.txt").read_text(),
-            model_client=self.model_client,
+            model_client=self._client_for("DateSummarizer"),
         )   
         conversation_history = self._format_conversation_history_with_tool_calls(conversation_result.messages)
         summary_response = await summarizer.on_messages(
@@ -157,9 +251,11 @@ class DateSimulator:
             )],
             cancellation_token=CancellationToken(),
         )
+        if isinstance(conversation_result, DateTaskResult):
+            conversation_result.telemetry = self.telemetry.report()
         return summary_response.chat_message.content
 
-    async def save_conversation(self, result: TaskResult, summary: str):
+    async def save_conversation(self, result: TaskResult, summary: Optional[str]):
         # Get next conversation number
         conversation_id = int(time.time())
         content = []
@@ -167,37 +263,63 @@ class DateSimulator:
         content.append(f"# Conversation between {'_'.join(self.participants.keys())}\n")
         content.append(conversation)
         content.append(f"\n# Summary\n")
-        content.append(summary)
+        content.append(summary if summary is not None else "Summary unavailable")
         # Join the content list into a string before saving
         content_str = "\n".join(content)
         await self.storage.save_conversation(conversation_id, self.participants.keys(), content_str)
+        # model usage of the date next to the conversation
+        usage = self.telemetry.report().model_dump(mode="json")
+        usage.update({"conversation_id": conversation_id, "participants": list(self.participants.keys())})
+        await DateUsageStats().add(usage)
+        await self.storage.save_conversation_usage(conversation_id, self.participants.keys(), usage)
+
+
+async def get_organizer_wallet_address(model_client: ChatCompletionClient) -> str:
+    """Get the wallet address of the date manager, the organizer asks participants to pay to it."""
+    manager = await AgentWithWallet.from_json(
+        path=pathlib.Path("agents/date_manager.json"),
+        system_message=pathlib.Path("prompts/date_manager.txt").read_text(),
+        model_client=model_client,
+    )
+    return manager.get_address()
+
+
+def load_participant_catalog() -> Dict[str, Agent]:
+    """Load all participant characters from the agents folder."""
+    participants = {}
+    for file in pathlib.Path("agents").glob("*.json"):
+        if file.name == "template.json":
+            continue
+        agent = Agent.load_from_file(file)
+        if agent.role == AgentRole.PARTICIPANT:
+            participants[agent.name] = agent
+    return participants
 
 
 async def main(args: argparse.Namespace):
-    simulator = DateSimulator()
+    simulator = DateSimulator(max_messages=args.max_messages)
     simulator.initialize_model_client()
-    participants = args.participants.split(",")
-    # load participants from json file
-    available_participants: list[Agent] = []
-    for file in pathlib.Path("agents").glob("*.json"):
-        available_participants.append(Agent.load(file))
+    participants = [name.strip() for name in args.participants.split(",")]
+    available_participants = load_participant_catalog()
     for participant in participants:
-        for available_participant in available_participants:
-            if available_participant.name == participant:
-                simulator.add_participant(available_participant.name, available_participant.get_full_system_prompt(num_examples=4))
-    result = await simulator.simulate_date()
+        if participant not in available_participants:
+            raise ValueError(f"Unknown participant {participant!r}, available: {', '.join(available_participants)}")
+        await simulator.add_participant_from_agent(available_participants[participant])
+    simulator.set_date_organizer(wallet_address=await get_organizer_wallet_address(simulator.model_client))
+    result = await simulator.simulate_date(console=True)
+    await simulator.release_participants()
     summary = await simulator.summarize_date(result)
     print('SUMMARY:\n')
     print(summary)
     await simulator.save_conversation(result, summary)
+    await ModelClientRegistry().close()
 
 if __name__ == "__main__":
     # run like this:
-    # python date_simulator.py --participants "Alice, Bob" --max_messages 10
+    # python -m src.tools.date_simulator --participants "Tesla, Eliza" --max_messages 10
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--participants", type=str, required=True)
-    parser.add_argument("-m", "--max_messages", type=int, required=True)
+    parser.add_argument("-m", "--max_messages", type=int, default=None, help="Defaults to DATE_MAX_MESSAGES")
     args = parser.parse_args()
     
     asyncio.run(main(args))
-    
@@ -0,0 +1,143 @@
+import re
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+from autogen_agentchat.base import TerminatedException, TerminationCondition
+from autogen_agentchat.conditions import MaxMessageTermination, TextMentionTermination, TimeoutTermination, TokenUsageTermination
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, StopMessage
+from pydantic import BaseModel
+
+from src.config import Config
+
+# how often each condition ended a date, across all dates of the process
+termination_stats: Counter = Counter()
+
+
+class RepeatedMessageTermination(TerminationCondition):
+    """Terminate the conversation once the same message was sent `max_repeats` times.
+
+    Messages are compared case and whitespace insensitive, so a date that got stuck
+    in a loop of the same lines ends instead of using up all of its turns.
+    """
+
+    def __init__(self, max_repeats: int):
+        self._max_repeats = max_repeats
+        self._counts: Counter = Counter()
+        self._terminated = False
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return re.sub(r"\s+", " ", text).strip().lower()
+
+    async def __call__(self, messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> StopMessage | None:
+        if self._terminated:
+            raise TerminatedException("Termination condition has already been reached")
+        for message in messages:
+            if not isinstance(message, BaseChatMessage):
+                continue
+            key = (message.source, self._normalize(message.to_text()))
+            if not key[1]:
+                continue
+            self._counts[key] += 1
+            if self._counts[key] >= self._max_repeats:
+                self._terminated = True
+                return StopMessage(
+                    content=f"{message.source} repeated the same message {self._counts[key]} times",
+                    source="RepeatedMessageTermination",
+                )
+        return None
+
+    async def reset(self) -> None:
+        self._counts.clear()
+        self._terminated = False
+
+
+class NamedTermination(TerminationCondition):
+    """Wraps a termination condition and remembers whether it fired, so the reason a date ended can be reported."""
+
+    def __init__(self, name: str, condition: TerminationCondition):
+        self.name = name
+        self.condition = condition
+        self.fired = False
+
+    @property
+    def terminated(self) -> bool:
+        return self.condition.terminated
+
+    async def __call__(self, messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> StopMessage | None:
+        stop_message = await self.condition(messages)
+        if stop_message is not None:
+            self.fired = True
+        return stop_message
+
+    async def reset(self) -> None:
+        # the group chat resets the conditions as soon as one fired, before the reason is recorded, so
+        # `fired` is kept; `DateTerminationPolicy.build` creates fresh conditions for every date
+        await self.condition.reset()
+
+
+class DateTerminationPolicy(BaseModel):
+    """When a date simulation ends. The date ends as soon as any of the enabled conditions is met.
+
+    max_messages: hard cap on the number of messages
+    end_phrase: the date organizer mentions this phrase to wrap up the date
+    max_total_tokens: token budget of the messages of the date
+    timeout_seconds: wall-clock limit of the date
+    max_repeated_messages: end the date once an agent sent the same message this many times
+    """
+    max_messages: int = 20
+    end_phrase: Optional[str] = "END OF DATE"
+    max_total_tokens: Optional[int] = None
+    timeout_seconds: Optional[float] = None
+    max_repeated_messages: Optional[int] = 3
+
+    @classmethod
+    def from_config(cls, **overrides) -> "DateTerminationPolicy":
+        policy = cls(
+            max_messages=Config.DATE_MAX_MESSAGES,
+            end_phrase=Config.DATE_END_PHRASE,
+            max_total_tokens=Config.DATE_MAX_TOTAL_TOKENS,
+            timeout_seconds=Config.DATE_TIMEOUT_SECONDS,
+            max_repeated_messages=Config.DATE_MAX_REPEATED_MESSAGES,
+        )
+        return policy.model_copy(update={key: value for key, value in overrides.items() if value is not None})
+
+    def build(self, organizer_name: str = "DateOrganizer") -> Tuple[TerminationCondition, List[NamedTermination]]:
+        """Build the combined termination condition and the named conditions it consists of."""
+        conditions = [NamedTermination("max_messages", MaxMessageTermination(self.max_messages))]
+        if self.end_phrase:
+            conditions.append(NamedTermination("organizer_ended", TextMentionTermination(self.end_phrase, sources=[organizer_name])))
+        if self.max_total_tokens:
+            conditions.append(NamedTermination("token_budget", TokenUsageTermination(max_total_token=self.max_total_tokens)))
+        if self.timeout_seconds:
+            conditions.append(NamedTermination("timeout", TimeoutTermination(self.timeout_seconds)))
+        if self.max_repeated_messages:
+            conditions.append(NamedTermination("repeated_messages", RepeatedMessageTermination(self.max_repeated_messages)))
+        combined = conditions[0]
+        for condition in conditions[1:]:
+            combined = combined | condition
+        return combined, conditions
+
+
+def record_termination(conditions: List[NamedTermination]) -> Optional[str]:
+    """Return which conditions ended the date, e.g. "organizer_ended", and count them in `termination_stats`."""
+    fired = [condition.name for condition in conditions if condition.fired]
+    if not fired:
+        # cancelled or failed before any condition was met
+        fired = ["none"]
+    reason = "+".join(fired)
+    termination_stats[reason] += 1
+    return reason
+
+
+def get_termination_stats() -> dict:
+    """Return how often each condition ended a date, with the share of all dates."""
+    total = sum(termination_stats.values())
+    return {
+        reason: {"count": count, "share": round(count / total, 3)}
+        for reason, count in termination_stats.most_common()
+    }
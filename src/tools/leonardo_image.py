@@ -35,7 +35,7 @@ class LeonardoImageTool(BaseTool[LeonardoRequest, LeonardoResponse]):
             raise ValueError("LEONARDO_API_KEY environment variable is not set")
         
         # Leonardo API endpoints
-        self.base_url = "https://cloud.leonardo.ai/api/rest/v1"
+        self.base_url = os.getenv("LEONARDO_BASE_URL", "https://cloud.leonardo.ai/api/rest/v1")
         self.generate_url = f"{self.base_url}/generations"
         
         # Default model and settings
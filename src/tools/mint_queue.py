@@ -0,0 +1,358 @@
+import asyncio
+import enum
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.config import Config
+from src.storage.manager import StorageManager
+from starknet_py.transaction_errors import TransactionNotReceivedError, TransactionRevertedError
+
+from src.tools.starknet_nonce import NonceManager
+from src.tools.starknet_toolkit import execute_calls, get_address, get_nft_owner, mint_call
+from src.tools.starknet_tx import wait_for_transaction
+
+
+class MintStatus(str, enum.Enum):
+    PENDING = "pending"
+    SUBMITTED = "submitted"
+    CONFIRMED = "confirmed"
+    FAILED = "failed"
+
+
+class MintProvider(str, enum.Enum):
+    STARKNET = "starknet"
+    CDP = "cdp"
+
+
+class MintJob(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    provider: MintProvider
+    token_id: int
+    recipient: str
+    # the user to notify about the mint
+    user_id: Optional[int] = None
+    prompt: str = ""
+    image_url: str = ""
+    status: MintStatus = MintStatus.PENDING
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+    created_at: float = Field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    tx_hash: Optional[str] = None
+    # a transaction with the mint was sent, it may have landed even if its confirmation failed
+    may_be_minted: bool = False
+    # minted in its own transaction, after a batch with the job reverted
+    solo: bool = False
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (MintStatus.CONFIRMED, MintStatus.FAILED)
+
+
+MintSubscriber = Callable[[MintJob], Awaitable[None]]
+# mints a single job with a CDP wallet and returns the result message of the wallet
+CdpMinter = Callable[[MintJob], Awaitable[str]]
+
+
+class MintQueue:
+    """Process-wide durable queue of NFT mints, worked off by a background task.
+
+    Jobs are stored with the storage manager on every change, so mints survive restarts. Starknet mints
+    that are due within `MINT_BATCH_WINDOW` of each other are sent as one multicall transaction from the
+    minter account and confirmed in the background while the next batch is submitted. A batch is atomic,
+    so when it reverts its jobs are retried in transactions of their own and only the bad one fails.
+    Before a job that was sent before is minted again, the owner of its token is checked. CDP mints are
+    sent one after the other. Failed mints are retried with jittered exponential backoff, after
+    `MINT_MAX_ATTEMPTS` attempts they are marked failed. Subscribers of the user of a job are called
+    when it is confirmed or failed.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MintQueue, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.storage_manager = StorageManager()
+        self.jobs: Dict[str, MintJob] = {}
+        self.starknet_seed: Optional[int] = None
+        self.cdp_minter: Optional[CdpMinter] = None
+        self._subscribers: Dict[Optional[int], MintSubscriber] = {}
+        self._worker: Optional[asyncio.Task] = None
+        self._confirmations: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._save_lock: Optional[asyncio.Lock] = None
+        self._loaded = False
+        self.stats = Counter()
+        self._initialized = True
+
+    async def start(self, starknet_seed: Optional[int] = None, cdp_minter: Optional[CdpMinter] = None):
+        """Set the minters, load the stored jobs and start the worker if it is not running."""
+        if starknet_seed is not None:
+            self.starknet_seed = int(starknet_seed, 16) if isinstance(starknet_seed, str) else starknet_seed
+        if cdp_minter is not None:
+            self.cdp_minter = cdp_minter
+        if not self._loaded:
+            self._save_lock = asyncio.Lock()
+            stored = await self.storage_manager.load_mint_queue() or {}
+            for job_data in stored.get("jobs", []):
+                job = MintJob.model_validate(job_data)
+                self.jobs.setdefault(job.id, job)
+            self._loaded = True
+            pending = sum(not job.finished for job in self.jobs.values())
+            if pending:
+                logging.info(f"Resuming {pending} queued NFT mints")
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def subscribe(self, user_id: Optional[int], subscriber: MintSubscriber):
+        """Call `subscriber` with the jobs of the user once they are confirmed or failed."""
+        self._subscribers[user_id] = subscriber
+
+    def unsubscribe(self, user_id: Optional[int]):
+        self._subscribers.pop(user_id, None)
+
+    async def enqueue(self, job: MintJob) -> MintJob:
+        """Queue the mint and return right away, the job is stored before it is minted."""
+        self.jobs[job.id] = job
+        self.stats["enqueued"] += 1
+        await self._save()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[MintJob]:
+        return self.jobs.get(job_id)
+
+    def jobs_for_user(self, user_id: int) -> List[MintJob]:
+        return [job for job in self.jobs.values() if job.user_id == user_id]
+
+    async def _save(self):
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.finished_at or 0)
+        for job in finished[:max(0, len(finished) - Config.MINT_QUEUE_MAX_FINISHED)]:
+            del self.jobs[job.id]
+        async with self._save_lock:
+            await self.storage_manager.save_mint_queue({"jobs": [job.model_dump(mode="json") for job in self.jobs.values()]})
+
+    def _due(self, provider: MintProvider, now: float) -> List[MintJob]:
+        return sorted(
+            (job for job in self.jobs.values()
+             if job.provider == provider and job.status == MintStatus.PENDING and job.next_attempt_at <= now),
+            key=lambda job: job.created_at,
+        )
+
+    async def _run(self):
+        # transactions that were submitted before a restart are confirmed first
+        for job in self.jobs.values():
+            if job.status == MintStatus.SUBMITTED:
+                job.may_be_minted = True
+            if job.status == MintStatus.SUBMITTED and job.tx_hash:
+                self._confirm_in_background([job], int(job.tx_hash, 16))
+            elif job.status == MintStatus.SUBMITTED:
+                job.status = MintStatus.PENDING
+        while True:
+            try:
+                await self._work()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Mint queue worker failed: {e}", exc_info=True)
+                await asyncio.sleep(Config.MINT_RETRY_BASE_DELAY)
+
+    async def _work(self):
+        now = time.time()
+        starknet_jobs = self._due(MintProvider.STARKNET, now) if self.starknet_seed is not None else []
+        cdp_jobs = self._due(MintProvider.CDP, now) if self.cdp_minter is not None else []
+        if not starknet_jobs and not cdp_jobs:
+            await self._sleep_until_due()
+            return
+        batch = [job for job in starknet_jobs if not job.solo]
+        if batch:
+            if len(batch) < Config.MINT_BATCH_MAX and now - batch[0].created_at < Config.MINT_BATCH_WINDOW:
+                # give mints of dates that end at about the same time the chance to join the batch
+                await asyncio.sleep(Config.MINT_BATCH_WINDOW - (now - batch[0].created_at))
+                batch = [job for job in self._due(MintProvider.STARKNET, time.time()) if not job.solo]
+            await self._mint_starknet(batch[:Config.MINT_BATCH_MAX])
+        for job in starknet_jobs:
+            if job.solo and job.status == MintStatus.PENDING:
+                await self._mint_starknet([job])
+        for job in cdp_jobs:
+            await self._mint_cdp(job)
+
+    async def _sleep_until_due(self):
+        mintable = {MintProvider.STARKNET: self.starknet_seed is not None, MintProvider.CDP: self.cdp_minter is not None}
+        waiting = [job.next_attempt_at for job in self.jobs.values() if job.status == MintStatus.PENDING and mintable[job.provider]]
+        timeout = max(0.0, min(waiting) - time.time()) if waiting else None
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _mint_starknet(self, jobs: List[MintJob]):
+        for job in jobs:
+            job.attempts += 1
+        try:
+            jobs = await self._skip_minted(jobs)
+            if not jobs:
+                return
+            for job in jobs:
+                job.may_be_minted = True
+            # stored before the transaction is sent, so a restart checks the owner before minting again
+            await self._save()
+            tx = await execute_calls(
+                self.starknet_seed,
+                [mint_call(int(job.recipient, 16), job.token_id) for job in jobs],
+                wait=False,
+            )
+        except Exception as e:
+            await self._fail(jobs, e)
+            return
+        self.stats["transactions"] += 1
+        self.stats["batched_mints"] += len(jobs)
+        logging.info(f"Submitted {len(jobs)} NFT mints in transaction {hex(tx.hash)}")
+        for job in jobs:
+            job.status = MintStatus.SUBMITTED
+            job.tx_hash = hex(tx.hash)
+        await self._save()
+        self._confirm_in_background(jobs, tx.hash)
+
+    async def _skip_minted(self, jobs: List[MintJob]) -> List[MintJob]:
+        """Finish the jobs whose token was already minted by an earlier transaction and return the others."""
+        sent = [job for job in jobs if job.may_be_minted]
+        if not sent:
+            return jobs
+        owners = await asyncio.gather(*(get_nft_owner(job.token_id) for job in sent))
+        minted, taken = [], []
+        for job, owner in zip(sent, owners):
+            if owner is None:
+                continue
+            if owner == int(job.recipient, 16):
+                minted.append(job)
+            else:
+                taken.append((job, owner))
+        if minted:
+            logging.info(f"{len(minted)} queued NFT mints already landed in an earlier transaction")
+            await self._succeed(minted, "Minted in an earlier transaction")
+        for job, owner in taken:
+            # retrying can not help, the token belongs to someone else
+            job.attempts = Config.MINT_MAX_ATTEMPTS
+            await self._fail([job], ValueError(f"Token {job.token_id} is already owned by {hex(owner)}"))
+        finished = {job.id for job in minted} | {job.id for job, _ in taken}
+        return [job for job in jobs if job.id not in finished]
+
+    def _confirm_in_background(self, jobs: List[MintJob], tx_hash: int):
+        task = asyncio.create_task(self._confirm(jobs, tx_hash))
+        self._confirmations.add(task)
+        task.add_done_callback(self._confirmations.discard)
+
+    async def _confirm(self, jobs: List[MintJob], tx_hash: int):
+        try:
+            await wait_for_transaction(tx_hash)
+        except TransactionRevertedError as e:
+            if len(jobs) > 1:
+                await self._split(jobs, e)
+            else:
+                await self._fail(jobs, e)
+            self._wakeup.set()
+            return
+        except TransactionNotReceivedError as e:
+            # also for transactions resumed after a restart, which were not sent through `execute_calls`
+            NonceManager().resync(get_address(self.starknet_seed))
+            await self._fail(jobs, e)
+            self._wakeup.set()
+            return
+        except Exception as e:
+            await self._fail(jobs, e)
+            self._wakeup.set()
+            return
+        await self._succeed(jobs, f"Minted in transaction {hex(tx_hash)}")
+
+    async def _split(self, jobs: List[MintJob], error: Exception):
+        """Retry the jobs of a reverted batch right away in transactions of their own, the revert may come from any of them."""
+        logging.warning(f"Batch of {len(jobs)} NFT mints reverted, minting them one by one: {error}")
+        self.stats["split_batches"] += 1
+        for job in jobs:
+            # the attempt says nothing about the job, the batch may have reverted for another one
+            job.attempts -= 1
+            job.solo = True
+            job.status = MintStatus.PENDING
+            job.tx_hash = None
+            job.error = f"{type(error).__name__}: {error}"
+            job.next_attempt_at = 0.0
+        await self._save()
+
+    async def _mint_cdp(self, job: MintJob):
+        job.attempts += 1
+        try:
+            result = await self.cdp_minter(job)
+        except Exception as e:
+            await self._fail([job], e)
+            return
+        self.stats["transactions"] += 1
+        await self._succeed([job], result)
+
+    async def _succeed(self, jobs: List[MintJob], result: str):
+        for job in jobs:
+            job.status = MintStatus.CONFIRMED
+            job.result = result
+            job.error = None
+            job.finished_at = time.time()
+            self.stats["confirmed"] += 1
+        await self._save()
+        await self._notify(jobs)
+
+    async def _fail(self, jobs: List[MintJob], error: Exception):
+        failed = []
+        # the jobs of a batch are retried together
+        jitter = random.uniform(0.5, 1.0)
+        for job in jobs:
+            job.error = f"{type(error).__name__}: {error}"
+            job.tx_hash = None
+            if job.attempts >= Config.MINT_MAX_ATTEMPTS:
+                job.status = MintStatus.FAILED
+                job.finished_at = time.time()
+                self.stats["failed"] += 1
+                failed.append(job)
+                logging.error(f"Minting token {job.token_id} failed after {job.attempts} attempts: {error}")
+            else:
+                delay = min(Config.MINT_RETRY_MAX_DELAY, Config.MINT_RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+                job.status = MintStatus.PENDING
+                job.next_attempt_at = time.time() + delay * jitter
+                self.stats["retries"] += 1
+                logging.warning(f"Minting token {job.token_id} failed, retrying in {delay:.0f}s: {error}")
+        await self._save()
+        await self._notify(failed)
+
+    async def _notify(self, jobs: List[MintJob]):
+        for job in jobs:
+            subscriber = self._subscribers.get(job.user_id)
+            if subscriber is None:
+                continue
+            try:
+                await subscriber(job)
+            except Exception as e:
+                logging.error(f"Failed to notify user {job.user_id} about token {job.token_id}: {e}")
+
+    def metrics(self) -> dict:
+        by_status = Counter(job.status.value for job in self.jobs.values())
+        return {**self.stats, "jobs": dict(by_status)}
+
+    async def close(self):
+        for task in [self._worker, *self._confirmations]:
+            if task is not None and not task.done():
+                task.cancel()
+        self._worker = None
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient
+
+from src.config import Config
+from src.models.agent_with_wallet import AgentWithWallet
+from src.models.client_registry import ModelClientRegistry
+from src.models.context import ContextPolicy, create_model_context
+from src.models.llm_client import SwitchableChatCompletionClient
+from src.models.model import Agent
+
+
+class ParticipantPool:
+    """Process-wide pool of pre-built participant agents.
+
+    Building an `AgentWithWallet` loads the wallet, builds the toolkit and writes the agent to storage,
+    so character agents are built once and reused across dates. An agent is taken from the pool for
+    one date at a time, so concurrent dates with the same character run on separate instances.
+    Released agents have their chat history cleared; the wallet and the tools are kept.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ParticipantPool, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._idle: Dict[uuid.UUID, List[AgentWithWallet]] = {}
+        self.max_idle_per_agent = Config.PARTICIPANT_POOL_MAX_IDLE
+        self.stats = Counter()
+        self._initialized = True
+
+    async def _build(self, agent: Agent, model_client: ChatCompletionClient) -> AgentWithWallet:
+        self.stats["created"] += 1
+        # the agent and its context share the switch, so both are bound to the client of each date
+        model_client = SwitchableChatCompletionClient(model_client)
+        return await AgentWithWallet.from_agent(
+            agent,
+            model_client=model_client,
+            model_context=create_model_context(ContextPolicy.for_participant(), model_client),
+        )
+
+    async def acquire(self, agent: Agent, model_client: ChatCompletionClient) -> AgentWithWallet:
+        """Take an agent for the character out of the pool, or build one if none is idle.
+
+        The agent is bound to `model_client`, so the usage of the date is counted on the client of the date.
+        """
+        idle = self._idle.get(agent.id)
+        if not idle:
+            return await self._build(agent, model_client)
+        instance = idle.pop()
+        self.stats["reused"] += 1
+        # the model context was cleared by the reset on release
+        instance.swap_model_client(model_client)
+        return instance
+
+    async def release(self, instance: AgentWithWallet):
+        """Reset the agent and return it to the pool."""
+        try:
+            await instance.on_reset(CancellationToken())
+        except Exception as e:
+            logging.error(f"Failed to reset participant {instance.name!r}, dropping it from the pool: {e}")
+            return
+        idle = self._idle.setdefault(instance.agent_id, [])
+        if len(idle) >= self.max_idle_per_agent:
+            self.stats["dropped"] += 1
+            return
+        idle.append(instance)
+
+    @asynccontextmanager
+    async def lease(self, agent: Agent, model_client: ChatCompletionClient) -> AsyncIterator[AgentWithWallet]:
+        """Use an agent of the pool for the duration of the block."""
+        instance = await self.acquire(agent, model_client)
+        try:
+            yield instance
+        finally:
+            await self.release(instance)
+
+    async def warm(self, agents: Iterable[Agent], per_agent: int = 1, model_client: Optional[ChatCompletionClient] = None):
+        """Pre-build `per_agent` idle instances of each character."""
+        builds = []
+        for agent in agents:
+            client = model_client or ModelClientRegistry().get_client(agent.model_provider.model, agent.model_provider.provider)
+            missing = min(per_agent, self.max_idle_per_agent) - len(self._idle.get(agent.id, []))
+            builds.extend(self._build(agent, client) for _ in range(missing))
+        for instance in await asyncio.gather(*builds):
+            await self.release(instance)
+        logging.info(f"Participant pool warmed with {len(builds)} agents")
+
+    def idle_count(self, agent: Optional[Agent] = None) -> int:
+        if agent is not None:
+            return len(self._idle.get(agent.id, []))
+        return sum(len(idle) for idle in self._idle.values())
+
+    def clear(self):
+        self._idle.clear()
@@ -0,0 +1,157 @@
+import asyncio
+import enum
+import logging
+import secrets
+import time
+from collections import Counter
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.config import Config
+from src.storage.manager import StorageManager
+from src.tools.starknet_toolkit import fund_and_deploy_account, get_address_str
+
+
+class PooledAccountStatus(str, enum.Enum):
+    PROVISIONING = "provisioning"
+    READY = "ready"
+
+
+class PooledAccount(BaseModel):
+    seed: str
+    address: str
+    status: PooledAccountStatus = PooledAccountStatus.PROVISIONING
+    created_at: float = Field(default_factory=time.time)
+    ready_at: Optional[float] = None
+
+
+class StarknetAccountPool:
+    """Process-wide pool of funded and deployed Starknet accounts for new users.
+
+    Funding and deploying an account takes two transactions and tens of seconds, so a background task
+    keeps `STARKNET_ACCOUNT_POOL_SIZE` accounts ready and onboarding only has to take one and store it
+    as the seed of the user's wallet. The pool is stored with the storage manager before an account is
+    funded, accounts that were being provisioned at a restart are finished, funding is not repeated
+    for accounts that already hold it.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(StarknetAccountPool, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.storage_manager = StorageManager()
+        self.accounts: List[PooledAccount] = []
+        self.funder_seed: Optional[int] = None
+        self.target_size = Config.STARKNET_ACCOUNT_POOL_SIZE
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._save_lock: Optional[asyncio.Lock] = None
+        self._loaded = False
+        self.stats = Counter()
+        self.provision_times: List[float] = []
+        self._initialized = True
+
+    async def start(self, funder_seed: int | str):
+        """Load the stored pool and start refilling it with accounts funded by the funder."""
+        self.funder_seed = int(funder_seed, 16) if isinstance(funder_seed, str) else funder_seed
+        if not self._loaded:
+            self._save_lock = asyncio.Lock()
+            stored = await self.storage_manager.load_starknet_account_pool() or {}
+            self.accounts = [PooledAccount.model_validate(account) for account in stored.get("accounts", [])]
+            self._loaded = True
+        if self.target_size <= 0 and not self._provisioning():
+            return
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def _ready(self) -> List[PooledAccount]:
+        return [account for account in self.accounts if account.status == PooledAccountStatus.READY]
+
+    def _provisioning(self) -> List[PooledAccount]:
+        return [account for account in self.accounts if account.status == PooledAccountStatus.PROVISIONING]
+
+    async def take(self) -> Optional[str]:
+        """Take a ready account out of the pool and return its seed, None if the pool is empty."""
+        ready = self._ready()
+        if not ready:
+            self.stats["misses"] += 1
+            return None
+        account = ready[0]
+        self.accounts.remove(account)
+        # the account is gone from the pool before it is handed out, it can not be given to two users
+        await self._save()
+        self.stats["taken"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return account.seed
+
+    async def give_back(self, seed: str):
+        """Return an account that was taken but not used."""
+        self.accounts.append(PooledAccount(
+            seed=seed, address=get_address_str(seed), status=PooledAccountStatus.READY, ready_at=time.time()
+        ))
+        self.stats["given_back"] += 1
+        await self._save()
+
+    async def _save(self):
+        async with self._save_lock:
+            await self.storage_manager.save_starknet_account_pool(
+                {"accounts": [account.model_dump(mode="json") for account in self.accounts]}
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                await self._refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failures"] += 1
+                logging.error(f"Provisioning a Starknet account failed, retrying in {Config.STARKNET_ACCOUNT_POOL_RETRY_DELAY:.0f}s: {e}")
+                await asyncio.sleep(Config.STARKNET_ACCOUNT_POOL_RETRY_DELAY)
+
+    async def _refill(self):
+        provisioning = self._provisioning()
+        if provisioning:
+            account = provisioning[0]
+        elif len(self._ready()) < self.target_size:
+            seed = secrets.token_hex(32)
+            account = PooledAccount(seed=seed, address=get_address_str(seed))
+            self.accounts.append(account)
+            # stored before it is funded, so the funds are not lost if we stop during provisioning
+            await self._save()
+        else:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+            return
+        started = time.monotonic()
+        await fund_and_deploy_account(account.seed, self.funder_seed)
+        account.status = PooledAccountStatus.READY
+        account.ready_at = time.time()
+        await self._save()
+        self.stats["provisioned"] += 1
+        self.provision_times = self.provision_times[-99:] + [time.monotonic() - started]
+        logging.info(f"Starknet account {account.address} is ready, {len(self._ready())} accounts in the pool")
+
+    def metrics(self) -> dict:
+        times = sorted(self.provision_times)
+        return {
+            **self.stats,
+            "ready": len(self._ready()),
+            "provisioning": len(self._provisioning()),
+            "target_size": self.target_size,
+            "p50_provision_time": round(times[len(times) // 2], 3) if times else 0.0,
+        }
+
+    async def close(self):
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self._worker = None
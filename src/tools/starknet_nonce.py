@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from starknet_py.net.account.account import Account
+from starknet_py.transaction_errors import TransactionNotReceivedError
+
+
+class _AccountNonce:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.next_nonce: Optional[int] = None
+
+
+class NonceManager:
+    """Process-wide allocation of transaction nonces per account.
+
+    Without it every transaction fetches the account nonce from the node, so concurrent transactions of
+    the same account, e.g. the manager account funding users and minting date memories, get the same
+    nonce and all but one fail. The nonce is fetched once and then counted up locally. Submissions of an
+    account are serialized, so they reach the node in nonce order, while the confirmations of the
+    submitted transactions are awaited concurrently. After a failed submission the nonce is fetched again.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(NonceManager, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._accounts: Dict[int, _AccountNonce] = {}
+        self.stats = Counter()
+        self._initialized = True
+
+    def _state(self, address: int) -> _AccountNonce:
+        if address not in self._accounts:
+            self._accounts[address] = _AccountNonce()
+        return self._accounts[address]
+
+    @asynccontextmanager
+    async def submission(self, account: Account) -> AsyncIterator[int]:
+        """Reserve the next nonce of the account for the transaction submitted in the block.
+
+        The nonce is used up when the block succeeds. An exception in the block, or a cancellation
+        after the transaction may already have been sent, makes the next submission fetch the nonce
+        from the node.
+        """
+        state = self._state(account.address)
+        async with state.lock:
+            if state.next_nonce is None:
+                state.next_nonce = await account.get_nonce()
+                self.stats["fetched"] += 1
+            nonce = state.next_nonce
+            try:
+                yield nonce
+            except BaseException:
+                state.next_nonce = None
+                self.stats["resyncs"] += 1
+                raise
+            state.next_nonce = nonce + 1
+            self.stats["allocated"] += 1
+
+    def resync(self, address: int):
+        """Fetch the nonce of the account from the node again, e.g. after a transaction was dropped."""
+        state = self._accounts.get(address)
+        if state is not None and state.next_nonce is not None:
+            logging.info(f"Resyncing the nonce of account {hex(address)}")
+            state.next_nonce = None
+            self.stats["resyncs"] += 1
+
+    def resync_if_dropped(self, address: int, confirmation: asyncio.Future):
+        """Resync the nonce of the account once the tracked transaction turns out to be dropped, whether or not anyone awaits it."""
+
+        def check(future: asyncio.Future):
+            if not future.cancelled() and isinstance(future.exception(), TransactionNotReceivedError):
+                self.resync(address)
+
+        confirmation.add_done_callback(check)
+
+    def metrics(self) -> dict:
+        return {**self.stats, "accounts": len(self._accounts)}
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import dotenv
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.full_node_client import FullNodeClient
+from starknet_py.net.http_client import HttpMethod, RpcHttpClient, ServerError
+
+dotenv.load_dotenv(override=True)
+
+# DEFAULT_NODE_URL = "https://starknet-sepolia.public.blastapi.io" # Sepolia
+DEFAULT_NODE_URL = "https://starknet-mainnet.public.blastapi.io/rpc/v0_7" # Mainnet
+# comma separated, the first reachable node is used and the next ones are failovers
+NODE_URLS = [url.strip() for url in os.environ.get("STARKNET_NODE_URLS", DEFAULT_NODE_URL).split(",") if url.strip()]
+RPC_MAX_CONNECTIONS = int(os.environ.get("STARKNET_RPC_MAX_CONNECTIONS", "32"))
+RPC_TIMEOUT = float(os.environ.get("STARKNET_RPC_TIMEOUT", "30"))
+# concurrent read calls within the window are sent as one JSON-RPC batch request, 0 disables batching
+RPC_BATCH_WINDOW = float(os.environ.get("STARKNET_RPC_BATCH_WINDOW_MS", "5")) / 1000
+RPC_BATCH_MAX = int(os.environ.get("STARKNET_RPC_BATCH_MAX", "50"))
+BATCHABLE_METHODS = frozenset({"call", "getClassHashAt", "getNonce", "getStorageAt", "getTransactionStatus"})
+
+
+class RpcMethodStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float, error: bool):
+        self.calls += 1
+        self.errors += error
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_latency": round(self.total_latency / self.calls, 4) if self.calls else 0.0,
+            "max_latency": round(self.max_latency, 4),
+        }
+
+
+def _is_node_failure(error: BaseException) -> bool:
+    """Errors of the node itself, worth trying the next node for. RPC errors like an unknown contract are not."""
+    if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError, ServerError)):
+        return True
+    return isinstance(error, ClientError) and error.code is not None and str(error.code).isdigit() and int(error.code) >= 500
+
+
+class PooledRpcHttpClient(RpcHttpClient):
+    """RPC client with a shared keep-alive session, per-method latency metrics and failover across nodes.
+
+    An aiohttp session is created lazily for every event loop the client is used on, as a session
+    can only be used and closed on its own loop. It is closed on its loop by `close` or when the loop
+    shuts down, e.g. at the end of `asyncio.run`. Read calls issued
+    within `RPC_BATCH_WINDOW` of each other are coalesced into a single JSON-RPC batch request.
+    `on_failover` is called with the url of the next node when the client switches to it.
+    """
+
+    def __init__(self, urls: Sequence[str], on_failover: Optional[Callable[[str], None]] = None):
+        if not urls:
+            raise ValueError("At least one node url is required")
+        super().__init__(url=urls[0])
+        self.urls = list(urls)
+        self._active = 0
+        self._on_failover = on_failover
+        # per loop, the session and the task that closes it
+        self._sessions: Dict[asyncio.AbstractEventLoop, Tuple[aiohttp.ClientSession, asyncio.Task]] = {}
+        self.stats: Dict[str, RpcMethodStats] = defaultdict(RpcMethodStats)
+        self.failovers = 0
+        self.batches = 0
+        self.batched_calls = 0
+        self._pending: List[Tuple[str, Optional[dict], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # running flushes, referenced so they are not garbage collected while the callers wait
+        self._flushes: set = set()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session, _ = self._sessions.get(loop, (None, None))
+        if session is None or session.closed:
+            for closed_loop in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[closed_loop]
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=RPC_MAX_CONNECTIONS, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=RPC_TIMEOUT),
+            )
+            self._sessions[loop] = (session, loop.create_task(self._close_with_loop(session)))
+        self.session = session
+        return session
+
+    @staticmethod
+    async def _close_with_loop(session: aiohttp.ClientSession):
+        # cancelled by `close`, or with all other tasks when the loop shuts down
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await session.close()
+
+    async def request(self, address, http_method, params=None, payload=None):
+        self._get_session()
+        return await super().request(address=self.url, http_method=http_method, params=params, payload=payload)
+
+    def _failover(self):
+        self._active = (self._active + 1) % len(self.urls)
+        logging.warning(f"Starknet node {self.url} failed, switching to {self.urls[self._active]}")
+        self.url = self.urls[self._active]
+        # the new node may run another spec version
+        self._is_spec_version_verified = False
+        self.failovers += 1
+        if self._on_failover is not None:
+            self._on_failover(self.url)
+
+    async def _with_failover(self, name: str, request):
+        for attempt in range(len(self.urls)):
+            started = time.perf_counter()
+            try:
+                result = await request()
+            except Exception as e:
+                self.stats[name].record(time.perf_counter() - started, error=True)
+                if attempt + 1 < len(self.urls) and _is_node_failure(e):
+                    self._failover()
+                    continue
+                raise
+            self.stats[name].record(time.perf_counter() - started, error=False)
+            return result
+
+    async def call(self, method_name: str, params: Optional[dict] = None):
+        if RPC_BATCH_WINDOW > 0 and method_name in BATCHABLE_METHODS:
+            return await self._batched_call(method_name, params)
+        return await self._with_failover(method_name, lambda: super(PooledRpcHttpClient, self).call(method_name, params))
+
+    async def _batched_call(self, method_name: str, params: Optional[dict]):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((method_name, params, future))
+        if len(self._pending) >= RPC_BATCH_MAX:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(RPC_BATCH_WINDOW)
+        return await future
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        task = asyncio.ensure_future(self._flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self):
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        if len(batch) == 1:
+            method_name, params, future = batch[0]
+            try:
+                result = await self._with_failover(method_name, lambda: super(PooledRpcHttpClient, self).call(method_name, params))
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(result)
+            return
+        payload = [
+            {"jsonrpc": "2.0", "method": f"{self.method_prefix}_{method_name}", "id": index, "params": params or []}
+            for index, (method_name, params, _) in enumerate(batch)
+        ]
+
+        async def send():
+            await self._warn_if_incompatible_rpc_version()
+            return await self.request(address=self.url, http_method=HttpMethod.POST, payload=payload)
+
+        try:
+            responses = await self._with_failover("batch", send)
+            if not isinstance(responses, list):
+                # nodes answer a batch they cannot process with a single error
+                self.handle_rpc_error(responses)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.batched_calls += len(batch)
+        by_id = {response.get("id"): response for response in responses}
+        for index, (method_name, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            response = by_id.get(index)
+            try:
+                if response is None:
+                    raise ServerError(body={"error": f"No response for {method_name} in batch"})
+                if "result" not in response:
+                    self.handle_rpc_error(response)
+                future.set_result(response["result"])
+            except Exception as e:
+                future.set_exception(e)
+
+    async def close(self):
+        """Close the sessions of all loops, the ones of other loops are closed on their own loop."""
+        loop = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for session_loop, (session, closer) in sessions.items():
+            if session_loop is loop:
+                closer.cancel()
+                await asyncio.gather(closer, return_exceptions=True)
+                # a closer cancelled before it started did not close the session
+                await session.close()
+            elif not session_loop.is_closed():
+                session_loop.call_soon_threadsafe(closer.cancel)
+        self.session = None
+
+
+class PooledFullNodeClient(FullNodeClient):
+    """`FullNodeClient` that sends its requests through a `PooledRpcHttpClient`, `url` is the node in use."""
+
+    def __init__(self, node_urls: Sequence[str]):
+        super().__init__(node_url=node_urls[0])
+        if not isinstance(getattr(self, "_client", None), RpcHttpClient):
+            # the pooled client takes the place of the client FullNodeClient creates for itself
+            raise RuntimeError("Unsupported starknet-py version, FullNodeClient has no RpcHttpClient to replace")
+        self._client = PooledRpcHttpClient(node_urls, on_failover=self._use_node)
+
+    def _use_node(self, url: str):
+        self.url = url
+
+    @property
+    def rpc_client(self) -> PooledRpcHttpClient:
+        return self._client
+
+
+_clients: Dict[Tuple[str, ...], PooledFullNodeClient] = {}
+
+
+def get_client(node_urls: Optional[Sequence[str]] = None) -> PooledFullNodeClient:
+    """Get the shared client for the nodes, all accounts and contracts share its connections."""
+    key = tuple(node_urls or NODE_URLS)
+    if key not in _clients:
+        _clients[key] = PooledFullNodeClient(key)
+    return _clients[key]
+
+
+def rpc_stats() -> Dict[str, dict]:
+    """Per-method call counts and latencies of the shared clients."""
+    return {
+        client.url: {
+            "failovers": client.rpc_client.failovers,
+            "batches": client.rpc_client.batches,
+            "batched_calls": client.rpc_client.batched_calls,
+            "methods": {method: stats.as_dict() for method, stats in client.rpc_client.stats.items()},
+        }
+        for client in _clients.values()
+    }
+
+
+async def close_rpc_clients():
+    """Close the sessions of the shared clients."""
+    for client in _clients.values():
+        await client.rpc_client.close()
+    _clients.clear()
@@ -6,20 +6,28 @@ from starknet_py.net.account.account import Account
 from starknet_py.net.models import StarknetChainId
 from starknet_py.net.signer.stark_curve_signer import KeyPair
 from starknet_py.hash.address import compute_address
-from starknet_py.net.full_node_client import FullNodeClient
 from starknet_py.net.client_errors import ClientError
-from starknet_py.net.client_models import ResourceBounds
+from starknet_py.net.client_models import Call, ResourceBounds
+from starknet_py.hash.selector import get_selector_from_name
 from starknet_py.contract import Contract
+from starknet_py.cairo.felt import decode_shortstring
+from starknet_py.transaction_errors import TransactionNotReceivedError, TransactionRevertedError
 import asyncio
-import asyncio
-from typing import List, Optional, Any
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Any, Tuple
 from autogen_core import CancellationToken
 import dotenv
 import os
 
+from src.storage.manager import StorageManager
+from src.tools.balance_cache import BalanceCache
+from src.tools.starknet_rpc import NODE_URLS, get_client
+from src.tools.starknet_nonce import NonceManager
+from src.tools.starknet_tx import TransactionTracker, track_transaction, wait_for_transaction
+
 dotenv.load_dotenv(override=True)
-# NODE_URL = "https://starknet-sepolia.public.blastapi.io" # Sepolia
-NODE_URL = "https://starknet-mainnet.public.blastapi.io/rpc/v0_7" # Mainnet
+NODE_URL = NODE_URLS[0]
 P = 3618502788666131213697322783095070105623107215331596699973092056135872020481 # starknet curve prime field
 OZ_ACCOUNT_CLASS_HASH = 0x00e2eb8f5672af4e6a4e8a8f1b44989685e668489b0a25437733756c5a34a1d6
 STRK = 0x04718f5a0fc34cc1af16a1cdee98ffb20c31f5cd61d6ab07201858f4287c938d
@@ -39,31 +47,72 @@ SIMPLE_ABI_ERC20 = [
     {'type': 'function', 'name': 'transfer', 'inputs': [{'name': 'recipient', 'type': 'core::starknet::contract_address::ContractAddress'}, {'name': 'amount', 'type': 'core::integer::u256'}], 'outputs': [{'type': 'core::bool'}], 'state_mutability': 'external'},
     {'type': 'function', 'name': 'transfer_from', 'inputs': [{'name': 'sender', 'type': 'core::starknet::contract_address::ContractAddress'}, {'name': 'recipient', 'type': 'core::starknet::contract_address::ContractAddress'}, {'name': 'amount', 'type': 'core::integer::u256'}], 'outputs': [{'type': 'core::bool'}], 'state_mutability': 'external'}
 ]
+# minimal ABI of the OpenZeppelin ERC721 mintable contract behind DATE_MEMORIES, so minting needs no ABI fetch
+SIMPLE_ABI_DATE_MEMORIES = [
+    {'type': 'function', 'name': 'safe_mint', 'inputs': [{'name': 'recipient', 'type': 'core::starknet::contract_address::ContractAddress'}, {'name': 'token_id', 'type': 'core::integer::u256'}, {'name': 'data', 'type': 'core::array::Span::<core::felt252>'}], 'outputs': [], 'state_mutability': 'external'},
+    {'type': 'function', 'name': 'owner_of', 'inputs': [{'name': 'token_id', 'type': 'core::integer::u256'}], 'outputs': [{'type': 'core::starknet::contract_address::ContractAddress'}], 'state_mutability': 'view'},
+    {'type': 'function', 'name': 'balance_of', 'inputs': [{'name': 'account', 'type': 'core::starknet::contract_address::ContractAddress'}], 'outputs': [{'type': 'core::integer::u256'}], 'state_mutability': 'view'},
+]
+KNOWN_ABIS = {
+    STRK: SIMPLE_ABI_ERC20,
+    USDC: SIMPLE_ABI_ERC20,
+    DATE_MEMORIES_SEPOLIA: SIMPLE_ABI_DATE_MEMORIES,
+    DATE_MEMORIES_MAINNET: SIMPLE_ABI_DATE_MEMORIES,
+}
 FUNDER_SEED = os.environ.get("FUNDER_SEED")
+MAX_CACHED_CONTRACTS = 1024
+MAX_CACHED_SEEDS = 4096
+
+
+class TokenMetadata(BaseModel):
+    address: str
+    decimals: int
+    symbol: str
+    name: str
+
+# token metadata never changes, known tokens need no RPC call at all
+KNOWN_TOKENS = {
+    STRK: TokenMetadata(address=hex(STRK), decimals=18, symbol="STRK", name="Starknet Token"),
+    USDC: TokenMetadata(address=hex(USDC), decimals=6, symbol="USDC", name="USD Coin"),
+}
+_token_metadata: Dict[int, TokenMetadata] = dict(KNOWN_TOKENS)
+_token_metadata_loaded = False
+_contracts: "OrderedDict[Tuple[int, int], Contract]" = OrderedDict()
 
 def get_salt(seed: int):
     if isinstance(seed, str):
         seed = int(seed, 16)
     return (seed // 2 ** 8) % 2 ** 251
 
-def get_key_pair(seed: int):
-    if isinstance(seed, str):
-        seed = int(seed, 16)
+# deriving the public key and the address is EC math, every wallet operation needs them several times
+@lru_cache(maxsize=MAX_CACHED_SEEDS)
+def _key_pair(seed: int) -> KeyPair:
     return KeyPair.from_private_key(seed % P)
 
-def get_address(seed: int):
+@lru_cache(maxsize=MAX_CACHED_SEEDS)
+def _address(seed: int) -> int:
     return compute_address(
         salt=get_salt(seed),
         class_hash=OZ_ACCOUNT_CLASS_HASH,
-        constructor_calldata=[get_key_pair(seed).public_key],
+        constructor_calldata=[_key_pair(seed).public_key],
         deployer_address=0,
     )
+
+def get_key_pair(seed: int):
+    if isinstance(seed, str):
+        seed = int(seed, 16)
+    return _key_pair(seed)
+
+def get_address(seed: int):
+    if isinstance(seed, str):
+        seed = int(seed, 16)
+    return _address(seed)
     
 def get_address_str(seed: int):
     return f'0x{get_address(seed):064x}'
 
 def get_account(seed: int):
-    client = FullNodeClient(node_url=NODE_URL)
+    client = get_client()
     return Account(
         address=get_address(seed),
         key_pair=get_key_pair(seed),
@@ -71,7 +120,7 @@ def get_account(seed: int):
         chain=StarknetChainId.SEPOLIA if IS_SEPOLIA else StarknetChainId.MAINNET)
     
 async def is_deployed(address: int):
-    client = FullNodeClient(node_url=NODE_URL)
+    client = get_client()
     try:
         class_hash = await client.get_class_hash_at(address)
         return True
@@ -83,7 +132,7 @@ async def is_deployed(address: int):
 async def get_or_deploy_account(seed: int):
     if await is_deployed(get_account(seed).address):
         return get_account(seed)
-    client = FullNodeClient(node_url=NODE_URL) 
+    client = get_client()
     account_deployment_result = await Account.deploy_account_v3(
         address=get_address(seed),
         class_hash=OZ_ACCOUNT_CLASS_HASH,
@@ -94,36 +143,112 @@ async def get_or_deploy_account(seed: int):
             max_amount=MAX_GAS, max_price_per_unit=int(1e15)
         ),
     )
-    await asyncio.sleep(0.5)
-    # TODO check transaction status
-    # await account_deployment_result.wait_for_acceptance() # fails with `ValidationError: {'execution_resources': {'data_availability': ['Missing data for required field.']}}` atm
+    # the account is only usable once the deployment is accepted
+    await wait_for_transaction(account_deployment_result.hash)
+    BalanceCache().invalidate(get_address(seed), STRK)
     return account_deployment_result.account
 
-async def transfer_token(seed: int, recipient_address: int, amount: float, token_address: int):
-    # token = await Contract.from_address(token_address, get_account(seed))
-    token = Contract(token_address, SIMPLE_ABI_ERC20, get_account(seed))
-    decimals, = await token.functions['decimals'].call()
-    transfer_tx = await token.functions['transfer'].invoke_v3(
-        recipient=recipient_address,
-        amount=int(amount * 10 ** decimals),
-        l1_resource_bounds=ResourceBounds(
-            max_amount=MAX_GAS, max_price_per_unit=int(1e15)
-        ),  
+async def get_contract(address: int, account: Account) -> Contract:
+    """Get the contract bound to the account, with the shipped ABI if the contract is known.
+
+    Contracts are cached per contract and account address, so unknown contracts fetch their ABI only once.
+    """
+    key = (address, account.address)
+    if key in _contracts:
+        _contracts.move_to_end(key)
+        return _contracts[key]
+    if address in KNOWN_ABIS:
+        contract = Contract(address, KNOWN_ABIS[address], account)
+    else:
+        contract = await Contract.from_address(address, account)
+    _contracts[key] = contract
+    if len(_contracts) > MAX_CACHED_CONTRACTS:
+        _contracts.popitem(last=False)
+    return contract
+
+async def get_token_metadata(token_address: int, account: Account, persist: bool = True) -> TokenMetadata:
+    """Get decimals, symbol and name of an ERC20 token, unknown tokens are fetched once and stored."""
+    global _token_metadata_loaded
+    if token_address in _token_metadata:
+        return _token_metadata[token_address]
+    if persist and not _token_metadata_loaded:
+        stored = await StorageManager().load_token_metadata() or {}
+        for metadata in stored.values():
+            _token_metadata.setdefault(int(metadata["address"], 16), TokenMetadata.model_validate(metadata))
+        _token_metadata_loaded = True
+        if token_address in _token_metadata:
+            return _token_metadata[token_address]
+    token = Contract(token_address, SIMPLE_ABI_ERC20, account)
+    (decimals,), (symbol,), (name,) = await asyncio.gather(
+        token.functions['decimals'].call(),
+        token.functions['symbol'].call(),
+        token.functions['name'].call(),
     )
-    await asyncio.sleep(1)
-    return transfer_tx
+    metadata = TokenMetadata(address=hex(token_address), decimals=decimals, symbol=decode_shortstring(symbol), name=decode_shortstring(name))
+    _token_metadata[token_address] = metadata
+    if persist:
+        unknown = {hex(address): m.model_dump() for address, m in _token_metadata.items() if address not in KNOWN_TOKENS}
+        await StorageManager().save_token_metadata(unknown)
+    return metadata
+
+def _invalidate_balances(balances: Iterable[Tuple[int, int]]):
+    for address, token_address in balances:
+        BalanceCache().invalidate(address, token_address)
+
+async def _confirm(tx, account: Account, wait: bool, balances: Iterable[Tuple[int, int]] = ()):
+    """Wait for or track the transaction, the (address, token) `balances` it changes are dropped from the cache.
+
+    The sender always pays the fee in STRK. The balances are dropped when the transaction is submitted and
+    again when it is accepted, as a read in between still returns the old balance.
+    """
+    balances = [(account.address, STRK), *balances]
+    _invalidate_balances(balances)
+    confirmation = TransactionTracker().track(tx.hash)
+    confirmation.add_done_callback(lambda _: _invalidate_balances(balances))
+    # a dropped transaction does not use up its nonce
+    NonceManager().resync_if_dropped(account.address, confirmation)
+    if not wait:
+        track_transaction(tx.hash)
+        return tx
+    await wait_for_transaction(tx.hash)
+    return tx
+
+async def transfer_token(seed: int, recipient_address: int, amount: float, token_address: int, wait: bool = True):
+    """Transfer tokens, with `wait` until the transaction is accepted, otherwise it is tracked in the background."""
+    account = get_account(seed)
+    token = await get_contract(token_address, account)
+    decimals = (await get_token_metadata(token_address, account)).decimals
+    async with NonceManager().submission(account) as nonce:
+        transfer_tx = await token.functions['transfer'].invoke_v3(
+            recipient=recipient_address,
+            amount=int(amount * 10 ** decimals),
+            l1_resource_bounds=ResourceBounds(
+                max_amount=MAX_GAS, max_price_per_unit=int(1e15)
+            ),
+            nonce=nonce,
+        )
+    return await _confirm(transfer_tx, account, wait, [(account.address, token_address), (recipient_address, token_address)])
 
-async def transfer_usdc(seed: int, recipient_address: int, amount: float):
-    return await transfer_token(seed, recipient_address, amount, USDC)
+async def transfer_usdc(seed: int, recipient_address: int, amount: float, wait: bool = True):
+    return await transfer_token(seed, recipient_address, amount, USDC, wait)
 
-async def transfer_strk(seed: int, recipient_address: int, amount: float):
-    return await transfer_token(seed, recipient_address, amount, STRK)
+async def transfer_strk(seed: int, recipient_address: int, amount: float, wait: bool = True):
+    return await transfer_token(seed, recipient_address, amount, STRK, wait)
 
 async def get_token_balance(seed: int, token_address: int):
-    token = Contract(token_address, SIMPLE_ABI_ERC20, get_account(seed))
-    balance, = await token.functions['balance_of'].call(get_address(seed))
-    decimals, = await token.functions['decimals'].call()
-    return balance / 10 ** decimals
+    async def fetch():
+        account = get_account(seed)
+        token = await get_contract(token_address, account)
+        decimals = (await get_token_metadata(token_address, account)).decimals
+        balance, = await token.functions['balance_of'].call(get_address(seed))
+        return balance / 10 ** decimals
+    return await BalanceCache().get_or_fetch(get_address(seed), token_address, fetch)
+
+async def get_token_balances(seed: int, token_addresses: Iterable[int]) -> Dict[int, float]:
+    """Get the balances of several tokens, the concurrent reads go out as one JSON-RPC batch request."""
+    token_addresses = list(token_addresses)
+    balances = await asyncio.gather(*(get_token_balance(seed, token_address) for token_address in token_addresses))
+    return dict(zip(token_addresses, balances))
 
 async def get_usdc_balance(seed: int):
     return await get_token_balance(seed, USDC)
@@ -131,33 +256,102 @@ async def get_usdc_balance(seed: int):
 async def get_strk_balance(seed: int):
     return await get_token_balance(seed, STRK)
 
+def _u256(value: int) -> List[int]:
+    return [value % 2 ** 128, value // 2 ** 128]
+
+async def transfer_call(token_address: int, recipient_address: int, amount: float, account: Account) -> Call:
+    """Build the call of an ERC20 transfer, to execute it together with other calls in `execute_calls`."""
+    decimals = (await get_token_metadata(token_address, account)).decimals
+    return Call(
+        to_addr=token_address,
+        selector=get_selector_from_name("transfer"),
+        calldata=[recipient_address, *_u256(int(amount * 10 ** decimals))],
+    )
+
+def mint_call(recipient: int, token_id: int, token_address: int = DATE_MEMORIES) -> Call:
+    """Build the call of a `safe_mint` without data, to execute it together with other calls in `execute_calls`."""
+    return Call(
+        to_addr=token_address,
+        selector=get_selector_from_name("safe_mint"),
+        calldata=[recipient, *_u256(token_id), 0],
+    )
+
+async def execute_calls(seed: int, calls: List[Call], wait: bool = True):
+    """Execute several transfers and mints of the account as one multicall transaction."""
+    if not calls:
+        raise ValueError("At least one call is required")
+    account = get_account(seed)
+    async with NonceManager().submission(account) as nonce:
+        tx = await account.execute_v3(
+            calls,
+            l1_resource_bounds=ResourceBounds(
+                max_amount=MAX_GAS * len(calls), max_price_per_unit=int(1e15)
+            ),
+            nonce=nonce,
+        )
+    transfer = get_selector_from_name("transfer")
+    transfers = [(call.to_addr, call.calldata[0]) for call in calls if call.selector == transfer]
+    balances = [(address, token_address) for token_address, recipient in transfers for address in (account.address, recipient)]
+    return await _confirm(tx, account, wait, balances)
+
 async def fund_and_deploy_account(seed: int, funder_seed: int):
     deployed = await is_deployed(get_address(seed))
     if deployed:
         return get_account(seed)
+    funder = get_account(funder_seed)
     strk_amount = 0.2 if IS_SEPOLIA else 10.1
-    await transfer_strk(funder_seed, get_address(seed), strk_amount)
-    if IS_SEPOLIA:
-        await transfer_usdc(funder_seed, get_address(seed), 10)
+    # an account whose funding went through before a restart is only deployed
+    if await get_strk_balance(seed) < strk_amount:
+        # one multicall transaction instead of a transaction per token
+        calls = [await transfer_call(STRK, get_address(seed), strk_amount, funder)]
+        if IS_SEPOLIA:
+            calls.append(await transfer_call(USDC, get_address(seed), 10, funder))
+        # the deployment fee is paid with the funds, so the funding has to be accepted first
+        await execute_calls(funder_seed, calls, wait=True)
     account = await get_or_deploy_account(seed)
     logging.info(f"Funded and deployed account {get_address_str(seed)}")
     return account
 
-async def mint_nft(seed: int, recipient: int, token_id: int, token_address: int):
-    nft = await Contract.from_address(token_address, get_account(seed))
-    tx = await nft.functions['safe_mint'].invoke_v3(
-        recipient=recipient,
-        token_id=token_id,
-        data=b'',
-        l1_resource_bounds=ResourceBounds(
-            max_amount=MAX_GAS, max_price_per_unit=int(1e15)
-        ), 
-    )
-    await asyncio.sleep(1)
-    return tx
+async def mint_nft(seed: int, recipient: int, token_id: int, token_address: int, wait: bool = True):
+    account = get_account(seed)
+    nft = await get_contract(token_address, account)
+    async with NonceManager().submission(account) as nonce:
+        tx = await nft.functions['safe_mint'].invoke_v3(
+            recipient=recipient,
+            token_id=token_id,
+            data=[],
+            l1_resource_bounds=ResourceBounds(
+                max_amount=MAX_GAS, max_price_per_unit=int(1e15)
+            ),
+            nonce=nonce,
+        )
+    return await _confirm(tx, account, wait)
+
+async def mint_date_memory(seed: int, recipient: int, token_id: int, wait: bool = True):
+    return await mint_nft(seed, recipient, token_id, DATE_MEMORIES, wait)
 
-async def mint_date_memory(seed: int, recipient: int, token_id: int):
-    return await mint_nft(seed, recipient, token_id, DATE_MEMORIES)
+CONTRACT_ERROR = 40
+
+async def get_nft_owner(token_id: int, token_address: int = DATE_MEMORIES) -> Optional[int]:
+    """Owner of the token, None if it is not minted. Reads the contract directly, so no ABI is needed."""
+    try:
+        owner, = await get_client().call_contract(Call(
+            to_addr=token_address,
+            selector=get_selector_from_name("owner_of"),
+            calldata=_u256(token_id),
+        ))
+    except ClientError as e:
+        # `owner_of` panics for a token that does not exist
+        if str(e.code) == str(CONTRACT_ERROR):
+            return None
+        raise
+    return owner
+
+def date_memory_link(token_id: int) -> str:
+    """Marketplace link of a minted date memory"""
+    if IS_SEPOLIA:
+        return f"https://starknet-sepolia.openmark.io/nft/{hex(DATE_MEMORIES)}:{token_id}"
+    return f"https://voyager.online/nft/{hex(DATE_MEMORIES)}/{token_id}"
 
 
 
@@ -254,31 +448,70 @@ class MintNFTTool(BaseTool[NFTMintInput, str]):
 class StarknetToolkit:
     def __init__(
         self,
-        seed: int | str
+        seed: int | str,
+        deployed: bool = False,
+        on_deployed: Optional[Callable[[], Awaitable[None]]] = None,
     ):
-        """Initialize StarkNet toolkit with account details and contracts"""
+        """Initialize StarkNet toolkit with account details and contracts
+
+        `deployed` is the stored deployment state of the account, `on_deployed` is called once the
+        account was found or made deployed, to store it.
+        """
         self.provider_url = NODE_URL
         self._seed = seed
         self.account = get_account(seed)
         self.explorer_url = "https://sepolia.voyager.online" if IS_SEPOLIA else "https://voyager.online"
         
         self.nft_contract = None
-        self._account_deployed = False
+        self._account_deployed = deployed
+        self._on_deployed = on_deployed
+
+    @property
+    def deployed(self) -> bool:
+        return self._account_deployed
+
+    @deployed.setter
+    def deployed(self, deployed: bool):
+        """Restore the stored deployment state, unlike a deployment it is not passed to `on_deployed`"""
+        self._account_deployed = deployed
+
+    async def _mark_deployed(self):
+        self._account_deployed = True
+        if self._on_deployed is not None:
+            try:
+                await self._on_deployed()
+            except Exception as e:
+                logging.error(f"Failed to store the deployment of account {self.get_address()}: {e}")
         
     async def deploy_user_account(self):
         strk_balance = await get_strk_balance(self._seed)
         if strk_balance < 1:
             return "Please fund your account with at least 1 STRK so it can be deployed"
         self.account = await get_or_deploy_account(self._seed)
-        self._account_deployed = True
+        await self._mark_deployed()
         return "Your account was successfully deployed"
     
     async def setup_account_if_needed(self, funder_seed: Optional[int] = None):
         if not self._account_deployed:
             self.account = await fund_and_deploy_account(self._seed, funder_seed)
-            self._account_deployed = True
+            await self._mark_deployed()
         return self.account
     
+    async def is_in_use(self) -> bool:
+        """Whether the account is deployed or holds funds, such an account must not be replaced"""
+        if self._account_deployed:
+            return True
+        deployed, balances = await asyncio.gather(
+            is_deployed(get_address(self._seed)), get_token_balances(self._seed, [STRK, USDC])
+        )
+        return deployed or any(balance > 0 for balance in balances.values())
+
+    async def use_account(self, seed: int | str):
+        """Switch to another funded and deployed account, e.g. one from the `StarknetAccountPool`"""
+        self._seed = seed
+        self.account = get_account(seed)
+        await self._mark_deployed()
+
     def get_address(self):
         return get_address_str(self._seed)
 
@@ -295,13 +528,27 @@ class StarknetToolkit:
         """Get STRK balance for the account"""
         return f"Wallet Address: {get_address_str(self._seed)}\nSTRK Balance: {await get_strk_balance(self._seed)} STRK"
 
+    async def _confirmation_failure(self, tx) -> Optional[str]:
+        """Wait until the transaction is accepted, returns the reason if it was not"""
+        try:
+            await wait_for_transaction(tx.hash)
+        except TransactionRevertedError as e:
+            return f"Transaction {hex(tx.hash)} reverted: {e}"
+        except TransactionNotReceivedError:
+            NonceManager().resync(self.account.address)
+            return f"Transaction {hex(tx.hash)} was not accepted yet, check {self.explorer_url}/tx/{hex(tx.hash)}"
+        return None
+
     async def transfer_usdc(self, recipient: str, amount: float) -> str:
         """Transfer USDC to recipient"""
         await self.setup_account_if_needed(FUNDER_SEED)
         balance = await get_usdc_balance(self._seed)
         if balance < amount:
             return f"You do not have enough USDC to transfer. Your balance is {balance:.2f} USDC, you are missing {amount - balance:.2f} USDC"
-        tx = await transfer_usdc(self._seed, int(recipient, 16), amount)
+        tx = await transfer_usdc(self._seed, int(recipient, 16), amount, wait=False)
+        failure = await self._confirmation_failure(tx)
+        if failure:
+            return failure
         tx_hash = hex(tx.hash)
         explorer_link = f"{self.explorer_url}/tx/{tx_hash}"
         
@@ -317,7 +564,10 @@ class StarknetToolkit:
         balance = await get_strk_balance(self._seed)
         if balance < amount:
             return f"You do not have enough STRK to transfer. Your balance is {balance:.2f} STRK, you are missing {amount - balance:.2f} STRK"
-        tx = await transfer_strk(self._seed, int(recipient, 16), amount)
+        tx = await transfer_strk(self._seed, int(recipient, 16), amount, wait=False)
+        failure = await self._confirmation_failure(tx)
+        if failure:
+            return failure
         tx_hash = hex(tx.hash)
         explorer_link = f"{self.explorer_url}/tx/{tx_hash}"
         
@@ -331,13 +581,13 @@ class StarknetToolkit:
         """Mint NFT with given token ID, you need to be the owner of the NFT contract to mint"""
         await self.setup_account_if_needed(FUNDER_SEED)
         logging.info(f"Minting NFT with token ID: {token_id} on STARKNET to {recipient}")
-        tx = await mint_date_memory(self._seed, int(recipient, 16), token_id)        
+        tx = await mint_date_memory(self._seed, int(recipient, 16), token_id, wait=False)
+        failure = await self._confirmation_failure(tx)
+        if failure:
+            return failure
         tx_hash = hex(tx.hash)
         #explorer_link = f"{self.explorer_url}/tx/{tx_hash}"
-        if IS_SEPOLIA:
-            marketplace_link = f"https://starknet-sepolia.openmark.io/nft/{hex(DATE_MEMORIES)}:{token_id}"
-        else:
-            marketplace_link = f"{self.explorer_url}/nft/{hex(DATE_MEMORIES)}/{token_id}"
+        marketplace_link = date_memory_link(token_id)
         
         return (
             f"Minted NFT with token ID: {token_id}\n"
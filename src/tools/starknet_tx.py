@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import dotenv
+from pydantic import BaseModel
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.client_models import TransactionExecutionStatus, TransactionStatus
+from starknet_py.transaction_errors import TransactionNotReceivedError, TransactionRevertedError
+
+from src.tools.starknet_rpc import get_client
+
+dotenv.load_dotenv(override=True)
+
+TX_POLL_MIN_INTERVAL = float(os.environ.get("STARKNET_TX_POLL_MIN_INTERVAL", "0.25"))
+TX_POLL_MAX_INTERVAL = float(os.environ.get("STARKNET_TX_POLL_MAX_INTERVAL", "4"))
+TX_CONFIRMATION_TIMEOUT = float(os.environ.get("STARKNET_TX_CONFIRMATION_TIMEOUT", "180"))
+TX_HASH_NOT_FOUND = 29
+ACCEPTED = (TransactionStatus.ACCEPTED_ON_L2, TransactionStatus.ACCEPTED_ON_L1)
+
+
+class TransactionConfirmation(BaseModel):
+    tx_hash: str
+    status: str
+    # seconds from tracking the transaction until it was seen accepted
+    latency: float
+
+
+class _PendingTransaction:
+    def __init__(self, tx_hash: int, future: asyncio.Future, timeout: float):
+        self.tx_hash = tx_hash
+        self.future = future
+        self.tracked_at = time.monotonic()
+        self.deadline = self.tracked_at + timeout
+        self.interval = TX_POLL_MIN_INTERVAL
+        self.next_check = self.tracked_at + self.interval
+
+
+class TransactionTracker:
+    """Process-wide tracker of submitted transactions until they are accepted on L2.
+
+    One poller task checks the status of all pending transactions, each with its own backoff: the
+    first check is after `TX_POLL_MIN_INTERVAL` and the interval grows up to `TX_POLL_MAX_INTERVAL`
+    while the transaction is pending, so fast blocks are noticed quickly and slow ones cost few
+    requests. The status requests of one round are sent together and go out as one RPC batch.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TransactionTracker, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._pending: Dict[int, _PendingTransaction] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = Counter()
+        self.latencies: List[float] = []
+        self._initialized = True
+
+    def track(self, tx_hash: int, timeout: Optional[float] = None) -> asyncio.Future:
+        """Start tracking the transaction, the returned future resolves with its `TransactionConfirmation`.
+
+        The future fails with `TransactionRevertedError` if the transaction reverts and with
+        `TransactionNotReceivedError` if it is not accepted within `timeout` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # transactions of a closed loop can not be awaited anymore
+            self._pending.clear()
+            self._poller = None
+            self._wakeup = asyncio.Event()
+            self._loop = loop
+        if tx_hash in self._pending:
+            return self._pending[tx_hash].future
+        self._pending[tx_hash] = _PendingTransaction(tx_hash, loop.create_future(), timeout or TX_CONFIRMATION_TIMEOUT)
+        self.stats["tracked"] += 1
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll())
+        self._wakeup.set()
+        return self._pending[tx_hash].future
+
+    async def wait(self, tx_hash: int, timeout: Optional[float] = None) -> TransactionConfirmation:
+        """Wait until the transaction is accepted on L2."""
+        return await asyncio.shield(self.track(tx_hash, timeout))
+
+    def track_in_background(self, tx_hash: int, timeout: Optional[float] = None):
+        """Track the transaction without waiting for it, failures are logged."""
+        future = self.track(tx_hash, timeout)
+
+        def log_failure(future: asyncio.Future):
+            if not future.cancelled() and future.exception() is not None:
+                logging.error(f"Transaction {hex(tx_hash)} failed: {future.exception()}")
+
+        future.add_done_callback(log_failure)
+
+    async def _poll(self):
+        while self._pending:
+            now = time.monotonic()
+            due = [pending for pending in self._pending.values() if pending.next_check <= now]
+            if due:
+                await asyncio.gather(*(self._check(pending) for pending in due))
+                continue
+            self._wakeup.clear()
+            next_check = min(pending.next_check for pending in self._pending.values())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_check - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _check(self, pending: _PendingTransaction):
+        self.stats["status_requests"] += 1
+        try:
+            status = await get_client().get_transaction_status(pending.tx_hash)
+        except ClientError as e:
+            # the node may not know a just submitted transaction yet
+            if str(e.code) != str(TX_HASH_NOT_FOUND):
+                logging.warning(f"Failed to get the status of transaction {hex(pending.tx_hash)}: {e}")
+            status = None
+        except Exception as e:
+            logging.warning(f"Failed to get the status of transaction {hex(pending.tx_hash)}: {e}")
+            status = None
+
+        if status is not None and status.execution_status == TransactionExecutionStatus.REVERTED:
+            self.stats["reverted"] += 1
+            self._resolve(pending, error=TransactionRevertedError(
+                message=status.failure_reason or "Transaction reverted with unknown reason."
+            ))
+        elif status is not None and status.finality_status in ACCEPTED:
+            latency = time.monotonic() - pending.tracked_at
+            self.stats["confirmed"] += 1
+            self.latencies = self.latencies[-999:] + [latency]
+            self._resolve(pending, result=TransactionConfirmation(
+                tx_hash=hex(pending.tx_hash), status=status.finality_status.value, latency=round(latency, 3)
+            ))
+        elif time.monotonic() >= pending.deadline:
+            self.stats["timeouts"] += 1
+            self._resolve(pending, error=TransactionNotReceivedError())
+        else:
+            pending.interval = min(pending.interval * 1.5, TX_POLL_MAX_INTERVAL)
+            pending.next_check = time.monotonic() + pending.interval
+
+    def _resolve(self, pending: _PendingTransaction, result: Optional[TransactionConfirmation] = None, error: Optional[Exception] = None):
+        self._pending.pop(pending.tx_hash, None)
+        if pending.future.done():
+            return
+        if error is not None:
+            pending.future.set_exception(error)
+        else:
+            pending.future.set_result(result)
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "p50_confirmation_latency": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+            "max_confirmation_latency": round(latencies[-1], 3) if latencies else 0.0,
+        }
+
+    async def close(self):
+        if self._poller is not None and not self._poller.done():
+            self._poller.cancel()
+        for pending in self._pending.values():
+            if not pending.future.done():
+                pending.future.cancel()
+        self._pending.clear()
+        self._poller = None
+
+
+async def wait_for_transaction(tx_hash: int, timeout: Optional[float] = None) -> TransactionConfirmation:
+    return await TransactionTracker().wait(tx_hash, timeout)
+
+
+def track_transaction(tx_hash: int, timeout: Optional[float] = None):
+    TransactionTracker().track_in_background(tx_hash, timeout)
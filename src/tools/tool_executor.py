@@ -0,0 +1,140 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from autogen_core import CancellationToken
+
+from src.config import Config
+
+
+def _summary(latencies: List[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+        "max": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+class ToolExecutor:
+    """Process-wide bounded thread pool for synchronous tools, e.g. the CDP wallet tools.
+
+    Before, they ran on the default executor of the event loop, which `aiofiles` and `asyncio.to_thread`
+    use too, so a few slow wallet calls could hold up storage. Calls wait in the queue of the pool until
+    one of `TOOL_EXECUTOR_WORKERS` threads is free, more than `TOOL_EXECUTOR_MAX_QUEUE` waiting calls
+    are rejected. The timeout of a call counts from when it starts running. A call that is cancelled
+    before it started is dropped, a running call can not be interrupted, it finishes in its thread but
+    its result is discarded. So only calls that are safe to repeat should get a timeout.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ToolExecutor, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.max_workers = Config.TOOL_EXECUTOR_WORKERS
+        self.max_queue = Config.TOOL_EXECUTOR_MAX_QUEUE
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        # counters and latencies are updated from the worker threads
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.stats = Counter()
+        self.queue_times: List[float] = []
+        self.run_times: Dict[str, List[float]] = defaultdict(list)
+        self._initialized = True
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._executor
+
+    async def run(self, name: str, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None,
+                  cancellation_token: Optional[CancellationToken] = None) -> Any:
+        """Run `func(*args)` on the pool and return its result.
+
+        Raises `RuntimeError` if the queue is full and `asyncio.TimeoutError` if the call runs longer than
+        `timeout` seconds, the time it waited in the queue does not count.
+        """
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise RuntimeError(f"Too many pending tool calls, {name} was rejected")
+            self._queued += 1
+        submitted_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def set_started():
+            if not started.done():
+                started.set_result(None)
+
+        def call():
+            started_at = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self.queue_times = self.queue_times[-999:] + [started_at - submitted_at]
+            try:
+                loop.call_soon_threadsafe(set_started)
+            except RuntimeError:
+                # the loop is closed, nobody waits for the result
+                pass
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.run_times[name] = self.run_times[name][-999:] + [time.monotonic() - started_at]
+
+        def release_if_dropped(future: concurrent.futures.Future):
+            # a call cancelled before it started never runs `call`
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+
+        future = self._get_executor().submit(call)
+        future.add_done_callback(release_if_dropped)
+        wrapped = asyncio.wrap_future(future)
+        if cancellation_token is not None:
+            cancellation_token.link_future(wrapped)
+        try:
+            if timeout:
+                # the timeout starts once a thread runs the call
+                await asyncio.wait([wrapped, started], return_when=asyncio.FIRST_COMPLETED)
+            result = await asyncio.wait_for(wrapped, timeout=timeout or None)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise asyncio.TimeoutError(f"Tool {name} did not finish within {timeout:g}s")
+        except asyncio.CancelledError:
+            wrapped.cancel()
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        self.stats["completed"] += 1
+        return result
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "queue_time": _summary(self.queue_times),
+                "run_time": {name: _summary(latencies) for name, latencies in self.run_times.items()},
+            }
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
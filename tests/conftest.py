@@ -0,0 +1,8 @@
+import os
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# prompts and agents are loaded relative to the repository root
+os.chdir(ROOT)
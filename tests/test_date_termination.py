@@ -0,0 +1,28 @@
+import asyncio
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from src.tools.date_events import DateFinishedEvent
+from src.tools.date_simulator import DateSimulator
+from src.tools.date_termination import DateTerminationPolicy, termination_stats
+
+
+def test_organizer_end_phrase_is_reported_after_the_group_chat_reset():
+    async def run():
+        policy = DateTerminationPolicy(max_messages=20, end_phrase="END OF DATE", max_repeated_messages=None)
+        simulator = DateSimulator(model_client=ReplayChatCompletionClient(["DateOrganizer"]), termination_policy=policy)
+        simulator.date_organizer = AssistantAgent(
+            name="DateOrganizer",
+            model_client=ReplayChatCompletionClient(["Thank you both, that was lovely. END OF DATE"]),
+        )
+        for name in ("Alice", "Bob"):
+            simulator.participants[name] = AssistantAgent(name=name, model_client=ReplayChatCompletionClient(["Hi!"]))
+        return [event async for event in simulator.stream_date("Set the scene.")]
+
+    before = termination_stats["organizer_ended"]
+    events = asyncio.run(run())
+    finished = events[-1]
+    assert isinstance(finished, DateFinishedEvent)
+    assert finished.terminated_by == "organizer_ended"
+    assert termination_stats["organizer_ended"] == before + 1
@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from src.models.llm_client import CircuitBreaker, ResilientChatCompletionClient
+
+
+class FailingStreamClient(ReplayChatCompletionClient):
+    """Streams one chunk and then fails with `error`, once; later streams succeed."""
+
+    def __init__(self, error: Exception):
+        super().__init__(["hello"])
+        self.error = error
+
+    async def create_stream(self, messages, **kwargs):
+        if self.error is not None:
+            error, self.error = self.error, None
+            yield "hel"
+            raise error
+        async for chunk in super().create_stream(messages, **kwargs):
+            yield chunk
+
+
+def _half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+
+async def _consume(client: ResilientChatCompletionClient) -> list:
+    return [chunk async for chunk in client.create_stream([UserMessage(content="hi", source="user")])]
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ReadTimeout("timed out"),
+    openai.BadRequestError("bad request", response=httpx.Response(400, request=httpx.Request("POST", "http://test")), body=None),
+])
+def test_trial_stream_failing_after_a_chunk_does_not_block_the_circuit(error):
+    async def run():
+        breaker = _half_open_breaker()
+        client = ResilientChatCompletionClient(FailingStreamClient(error), max_retries=0, breaker=breaker)
+        with pytest.raises(type(error)):
+            await _consume(client)
+        chunks = await _consume(client)
+        assert chunks[-1].content == "hello"
+        assert breaker.state == "closed"
+
+    asyncio.run(run())